@@ -29,6 +29,17 @@
       14-MAY-2021 nelsonj
       Migration to new apphub and updating to python 2.7
 
+      19-Oct-2026 ilsdev  user-037
+      Build the case zips in one pass with ASAPZipBuilder.
+
+      19-Oct-2026 ilsdev  user-039
+      Failed uploads are queued in ASAPOutbox and retried with backoff.
+
+      19-Oct-2026 ilsdev  user-039
+      Queued uploads are retried as they come due within the run.  A zip is only
+      moved to the outbox folder once it is queued; if the outbox cannot be used,
+      it is left in the zip folder for the next run as before.
+
 """
 
 import DevInstance
@@ -39,6 +50,7 @@ devState = DevInstance.devInstance()
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
 from ILS.ASAP.Utility import ASAP_UTILITY
+from ILS.ASAP.ZipBuilder import ASAPZipBuilder
 import CRLUtility
 import datetime
 import glob
@@ -164,8 +176,8 @@ class AGLiteTransmitHandler(ASAPTransmitHandler):
                 asapZipFile = os.path.join(xmitZipPath, zipFileName)
                 retransTifFile = os.path.splitext(retransIdxFile)[0] + '.tif'
                 print((retransTifFile, retransIdxFile))
-                CRLUtility.CRLAddToZIPFile(str(retransIdxFile), asapZipFile, True)
-                CRLUtility.CRLAddToZIPFile(str(retransTifFile), asapZipFile, True)
+                with ASAPZipBuilder(asapZipFile, self._getLogger()) as zipBuilder:
+                    zipBuilder.addFiles([str(retransIdxFile), str(retransTifFile)], True)
 
         except:
             self._getLogger().warn(
@@ -262,8 +274,11 @@ class AGLiteTransmitHandler(ASAPTransmitHandler):
             print(zipFileName)
         if zipFileName != '':
             asapZipFile = os.path.join(xmitZipPath, zipFileName)
-            for asapFile in asapToXmitFiles:
-                CRLUtility.CRLAddToZIPFile(str(asapFile.getFullPath()), asapZipFile, True)
+            try:
+                with ASAPZipBuilder(asapZipFile, self._getLogger()) as zipBuilder:
+                    zipBuilder.addFiles([str(asapFile.getFullPath()) for asapFile in asapToXmitFiles], True)
+            except:
+                self._getLogger().warn('Failed to write {asapZipFile!s:s}:'.format(asapZipFile=asapZipFile), exc_info=True)
 
             if os.path.exists(asapZipFile):
                 self._getLogger().info(
@@ -294,6 +309,9 @@ class AGLiteTransmitHandler(ASAPTransmitHandler):
         print(xmitStagingPath)
         xmitZipPath = os.path.join(xmitStagingPath, 'zip')
         xmitSentPath = os.path.join(xmitStagingPath, 'sent')
+        # failed uploads waiting for a retry
+        xmitOutboxPath = os.path.join(xmitStagingPath, 'outbox')
+        outbox = ASAP_UTILITY.getOutbox()
         fm = ASAP_UTILITY.getASAPFileManager(contact)
         # now FTP all zip files AGLite
         asapZipFiles = fm.glob(os.path.join(xmitZipPath, '*.*'))
@@ -309,11 +327,47 @@ class AGLiteTransmitHandler(ASAPTransmitHandler):
                 # Move the zip files to sent folder
                 CRLUtility.CRLCopyFile(asapZipFile.getFullPath(),
                                        os.path.join(xmitSentPath, asapZipFile.fileName), True)
-            except:
-                fSuccess = False
+            except Exception as e:
                 self._getLogger().warn(
-                    'Failed to FTP file {path!s:s} to AG (leaving original zip to be uploaded in the next run):'
+                    'Failed to FTP file {path!s:s} to AG:'
                     .format(path=asapZipFile.getFullPath()), exc_info=True)
+                outboxZipFile = os.path.join(xmitOutboxPath, asapZipFile.fileName)
+                try:
+                    outbox.enqueue(contact.contact_id, outboxZipFile, serverPath, e)
+                except Exception:
+                    fSuccess = False
+                    self._getLogger().warn(
+                        'Unable to queue {path!s:s} for retry (leaving original zip to be uploaded in the next run):'
+                        .format(path=asapZipFile.getFullPath()), exc_info=True)
+                else:
+                    CRLUtility.CRLCopyFile(asapZipFile.getFullPath(), outboxZipFile, True)
+
+        # retry the uploads that failed, in this run or an earlier one, as they come due
+        def retryUpload(item):
+            CRLUtility.CRLFTPPut(CRL_FTP_SERVER, item.filePath, item.remotePath, 'b',
+                                 CRL_FTP_USER, CRL_FTP_USER_PASSWORD)
+
+        try:
+            sentItems, abandonedItems = outbox.process(contact.contact_id, retryUpload)
+            fPending = bool(outbox.getPending(contact.contact_id))
+        except Exception:
+            # the queued zips stay in the outbox folder until the outbox can be read again
+            self._getLogger().warn('Unable to retry the queued uploads for {contact_id!s:s}:'
+                                   .format(contact_id=contact.contact_id), exc_info=True)
+            sentItems, abandonedItems, fPending = [], [], True
+        for item in sentItems:
+            CRLUtility.CRLCopyFile(item.filePath,
+                                   os.path.join(xmitSentPath, os.path.basename(item.filePath)), True)
+        for item in abandonedItems:
+            # back to the zip folder, to be uploaded in the next run
+            fSuccess = False
+            CRLUtility.CRLCopyFile(item.filePath,
+                                   os.path.join(xmitZipPath, os.path.basename(item.filePath)), True)
+            self._getLogger().warn(
+                'Failed to FTP file {path!s:s} to AG after {attempts:d} attempts (leaving zip to be uploaded in the next run)'
+                .format(path=item.filePath, attempts=item.attempts))
+        if fPending:
+            fSuccess = False
 
         print('In AGLiteTransmitHandler _transmitStagedCases AGLite is done')
         return fSuccess
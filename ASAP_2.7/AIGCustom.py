@@ -53,6 +53,27 @@
      14-MAY-2021 nelsonj
          Migration to new apphub and updating to python 2.7
 
+     19-Oct-2026  ilsdev    user-028
+         Look up 103 elements through the index handler's path index, and drop
+         the cached 103 after rewriting UserLoginName.
+
+     19-Oct-2026  ilsdev    user-035
+         Upload through the shared SFTP session pool.
+
+     19-Oct-2026  ilsdev    user-045
+         Append the document lines to the index before it is written.
+
+     19-Oct-2026  ilsdev    user-047
+         Always rebuild the index (_getFingerprintInputs returns None): the
+         file names carry the date and AppRight cases rewrite the 103.
+
+     19-Oct-2026  ilsdev    user-027
+         Change UserLoginName in a private copy of the 103 (getMutableHandler)
+         instead of in the shared cached handler.
+
+     19-Oct-2026  ilsdev    user-035
+         Cap the SFTP sessions open at once to the AIG host.
+
 """
 
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
@@ -112,11 +133,20 @@ class AIGIndexHandler(ASAPIndexHandler):
 
     QC_USER_AUTOUSER = 'AUTOUSER'
 
+    def __init__(self):
+        ASAPIndexHandler.__init__(self)
+        # the last 103 changed to MatrixASAP; the case's shared handler still has
+        # the old login name, so its other documents must not change it again
+        self.__matrixAsapXmlPath = None
+
+    def _getFingerprintInputs(self):
+        # the index has the date in its file names, and AppRight cases rewrite the 103
+        return None
+
     def _processDerivedFields(self):
         case = self._getCase()
         index = case.contact.index
-        handler = self._getAcordHandler()
-        txLifeElem = handler.txList[0]
+        txLifeElem = self._getAcordPathIndex()
         # birth state logic: if birth jurisdiction is a valid state, use two
         # character state code (see above), else use the tc value of the birth
         # country
@@ -205,7 +235,10 @@ class AIGIndexHandler(ASAPIndexHandler):
         # update XML file
         mgaid = ''
         loginNameElem = txLifeElem.getElement('UserAuthRequest.UserLoginName')
-        if loginNameElem and loginNameElem.value == self.APPRIGHT_MATRIX:
+        xmlPath = os.path.join(case.contact.acord103_dir,
+                               '{trackingId!s:s}.XML'.format(trackingId=case.trackingId))
+        if (loginNameElem and loginNameElem.value == self.APPRIGHT_MATRIX and
+                xmlPath != self.__matrixAsapXmlPath):
             # confirm AppRight by checking if there's a Term Application or Application
             # uploaded by APPS using the AUTOUSER userid
             qcDocFact = ASAP_UTILITY.getQCDocumentFactory()
@@ -225,11 +258,14 @@ class AIGIndexHandler(ASAPIndexHandler):
                 mgaid = self.APPRIGHT_MATRIX
                 index.setValue('PROVIDER', self.APPRIGHT_MATRIX)
             else:
-                loginNameElem.value = self.LOGIN_NAME_MATRIX_ASAP
-                xmlPath = os.path.join(case.contact.acord103_dir,
-                                       '{trackingId!s:s}.XML'.format(trackingId=case.trackingId))
+                # the cached handler is shared, so change and write a private copy
+                acordCache = ASAP_UTILITY.getAcordDocumentCache()
+                mutableHandler = acordCache.getMutableHandler(xmlPath)
                 self._getLogger().info('AppRight->standard case, updating {xmlPath!s:s}.'.format(xmlPath=xmlPath))
-                handler.writeXML(xmlPath)
+                mutableHandler.txList[0].getElement('UserAuthRequest.UserLoginName').value = self.LOGIN_NAME_MATRIX_ASAP
+                mutableHandler.writeXML(xmlPath)
+                acordCache.invalidate(xmlPath)
+                self.__matrixAsapXmlPath = xmlPath
         if case.contact.contact_id == 'agiefinapps':
             mgaid = self.EFIN_MGAID
             index.setValue('PROVIDER', self.EFIN_PROVIDER_ID)
@@ -237,12 +273,13 @@ class AIGIndexHandler(ASAPIndexHandler):
         index.setValue('MGAID', mgaid)
         return True
 
-    def _postProcessIndex(self):
-        # open index file for appending, and write
-        # the client doc types and image file names:
+    def _processIndexText(self, idxPath, idxText):
+        # append the client doc types and image file names to the index:
         # APPII,00000050.TIF
         # last line would be the 103 file:
         # XML,AIG002299999.XML
+        if idxPath != self._getIndexPaths()[0]:
+            return idxText
         now = datetime.datetime.today()
         case = self._getCase()
         docs = list(case.getDocuments().values())
@@ -256,12 +293,7 @@ class AIGIndexHandler(ASAPIndexHandler):
             appendlines.append('XML,{fileName!s:s}\n'
                                .format(fileName=buildAIGFileName('{trackingId!s:s}.XML'
                                                                  .format(trackingId=case.trackingId), now)))
-        paths = self._getIndexPaths()
-        if paths and os.path.isfile(paths[0]):
-            filePtr = open(paths[0], 'a')
-            filePtr.writelines(appendlines)
-            filePtr.close()
-        return True
+        return idxText + ''.join(appendlines)
 
 
 class AIGTransmitHandler(ASAPTransmitHandler):
@@ -270,6 +302,7 @@ class AIGTransmitHandler(ASAPTransmitHandler):
     """
     AIG_FTP_HOSTNAME = 'AIG ASAP SFTP-263'
     AIG_FTP_PORT = 9022
+    AIG_FTP_MAX_SESSIONS = 2
 
     def _preStage(self):
         fSuccess = True
@@ -419,6 +452,7 @@ class AIGTransmitHandler(ASAPTransmitHandler):
     def _transmitStagedCases(self):
         fSuccess = True
         sServer, sUser, sPassword = get_host_info(self.AIG_FTP_HOSTNAME)
+        ASAP_UTILITY.getTransportPool().setHostLimit(sServer, self.AIG_FTP_MAX_SESSIONS)
         contact = self._getContact()
         if contact.contact_id == 'agiampcapps':
             agency = 'AMPAC'
@@ -461,12 +495,8 @@ class AIGTransmitHandler(ASAPTransmitHandler):
             else:
                 serverPath = '/home/eid1esub/test/' + asapZipFile.fileName
             try:
-                import paramiko
-                # noinspection PyTypeChecker
-                transport = paramiko.Transport((sServer, self.AIG_FTP_PORT))
-                transport.connect(username=sUser, password=sPassword)
-                sftpClient = paramiko.SFTPClient.from_transport(transport)
-                info = sftpClient.put(asapZipFile.getFullPath(), serverPath)
+                with ASAP_UTILITY.getTransportPool().session(sServer, sUser, sPassword, self.AIG_FTP_PORT) as session:
+                    info = session.put(asapZipFile.getFullPath(), serverPath)
                 self._getLogger().info("{fileName!s:s} Transmission info: {info!s:s}"
                                        .format(fileName=asapZipFile.fileName, info=str(info)))
                 CRLUtility.CRLCopyFile(asapZipFile.getFullPath(),
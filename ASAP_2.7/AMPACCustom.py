@@ -19,6 +19,8 @@
       01-Mar-2007
 
   Modification History:
+      19-Oct-2026   ilsdev  user-045
+          Append the document lines to the index before it is written.
 
 """
 from ILS import ASAP
@@ -40,10 +42,11 @@ class AMPACIndexHandler( ASAPIndexHandler ):
     """
     Custom handler for building indexes for AMPAC.
     """
-    def _postProcessIndex( self ):
-        # open index file for appending, and write
-        # the client doc types and special name format for AMPAC:
+    def _processIndexText( self, idxPath, idxText ):
+        # append the client doc types and special name format for AMPAC:
         # APPII,APPIIAIG002999999.PDF
+        if idxPath != self._getIndexPaths()[0]:
+            return idxText
         case = self._getCase()
         docs = list(case.getDocuments().values())
         appendlines = []
@@ -53,12 +56,7 @@ class AMPACIndexHandler( ASAPIndexHandler ):
                                 % (clientDocType,
                                    clientDocType,
                                    case.trackingId) )
-        paths = self._getIndexPaths()
-        if paths and os.path.isfile(paths[0]):
-            filePtr = open( paths[0], 'a' )
-            filePtr.writelines( appendlines )
-            filePtr.close()
-        return True
+        return idxText + ''.join( appendlines )
 
 
 class AMPACTransmitHandler( ASAPTransmitHandler ):
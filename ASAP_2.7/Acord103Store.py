@@ -12,7 +12,8 @@
   Abstract:
       This script contains the ASAPAcord103Store class that wraps the
       asap_acord103 table.  Also included is the ASAPAcord103Record class
-      that is returned by accessors.
+      that is returned by accessors, and the ASAPAcord103IngestReport class
+      returned by bulk ingestion.
 
   Author:
       Jarrod Wild
@@ -35,26 +36,87 @@
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
 
+      19-Oct-2026   ilsdev  user-029
+          Queries select only the metadata columns unless fWithXml is set, and
+          records read their XML on first access.  The connection is reset
+          only when reading the Acord103 field fails.
+
+      19-Oct-2026   ilsdev  user-030
+          Added zlib-compressed storage in the acord103_zip column, chosen by
+          the acord103_storage setting, and a migration for existing records
+          (python -m ILS.ASAP.Acord103Store migrate [batch size]).
+
+      19-Oct-2026   ilsdev  user-031
+          Added add103Directory for bulk ingestion of a folder of 103 files,
+          returning an ASAPAcord103IngestReport.
+
+      19-Oct-2026   ilsdev  user-049
+          Import the ACORD parser when a 103 file is first read, so loading
+          ILS.ASAP does not load ILS.AcordXML.
+
+      19-Oct-2026   ilsdev  user-031
+          add103Directory parses the files in turn (a thread pool gained
+          nothing, since parsing holds the GIL), and gives each inserted row
+          its own datereceived.
+
 """
 
 import base64
+import binascii
 import datetime
+import glob
 import os
-from ILS.AcordXML import AcordXMLParser
+import time
+import zlib
 
 
 class ASAPAcord103Record(object):
+    """
+    A row of asap_acord103.  Records returned by the store carry only the
+    metadata columns; the XML is read from the database the first time
+    xmlData is used.
+    """
 
-    def __init__(self):
+    def __init__(self, xmlLoader=None):
+        """
+
+        :param xmlLoader: callable taking this record and returning its XML,
+                          used to load xmlData on first access
+        """
+        self.__xmlData = None
+        self.__xmlLoader = xmlLoader
         self.trackingId = ''
         self.policyNumber = ''
-        self.xmlData = ''
         self.trackingId103 = ''
         self.transRefGuid = ''
         self.dateReceived = None  # type: datetime.datetime|None
         self.retrieve = 0         # bit flag
         self.active = 1           # bit flag
 
+    @property
+    def xmlData(self):
+        """
+        The 103 XML, read from the database on first access if needed.
+        """
+        if self.__xmlData is None:
+            xmlData = ''
+            if self.__xmlLoader:
+                xmlData = self.__xmlLoader(self)
+            self.__xmlData = xmlData
+            self.__xmlLoader = None
+        return self.__xmlData
+
+    @xmlData.setter
+    def xmlData(self, value):
+        self.__xmlData = value
+        self.__xmlLoader = None
+
+    def isXmlLoaded(self):
+        """
+        True if the XML is already in memory.
+        """
+        return self.__xmlData is not None
+
     def __repr__(self):
         sNot = ''
         if self.retrieve:
@@ -71,7 +133,51 @@ class ASAPAcord103Record(object):
                         sNot=sNot))
 
 
+class ASAPAcord103IngestReport(object):
+    """
+    Outcome of ASAPAcord103Store.add103Directory: one entry per file with
+    its status, the seconds spent reading and parsing it, and a message.
+    """
+    STATUS_ADDED = 'added'
+    STATUS_DUPLICATE = 'duplicate'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self):
+        self.files = []   # type: list[tuple[str, str, float, str]]
+        self.added = []   # type: list[ASAPAcord103Record]
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return ('<{added:d} added / {duplicates:d} duplicate / {failed:d} failed in {elapsed:5.3f} seconds>'
+                .format(added=len(self.getFiles(self.STATUS_ADDED)),
+                        duplicates=len(self.getFiles(self.STATUS_DUPLICATE)),
+                        failed=len(self.getFiles(self.STATUS_FAILED)),
+                        elapsed=self.elapsed))
+
+    def addFile(self, path, status, seconds, message='', acordRec=None):
+        self.files.append((path, status, seconds, message))
+        if acordRec:
+            self.added.append(acordRec)
+
+    def getFiles(self, status):
+        """
+        Return the (path, status, seconds, message) entries with the given status.
+        """
+        return [entry for entry in self.files if entry[1] == status]
+
+    def getFailures(self):
+        return self.getFiles(self.STATUS_FAILED)
+
+
 class ASAPAcord103Store(object):
+    # storage modes for the XML, chosen by the acord103_storage setting:
+    # base64 text in acord103, or zlib-compressed binary in acord103_zip
+    STORAGE_BASE64 = 'base64'
+    STORAGE_ZLIB = 'zlib'
+    # rows per insert statement (SQL Server allows up to 1000) and
+    # values per lookup query for bulk ingestion
+    BULK_INSERT_SIZE = 100
+    BULK_LOOKUP_SIZE = 500
 
     def __init__(self, logger=None):
         if not logger:
@@ -81,6 +187,7 @@ class ASAPAcord103Store(object):
             self._logger = logger
         self.__xmitConfig = None
         self.__cursor = None
+        self.__fHasZipColumn = None
 
     def _getXmitConfig(self):
         if not self.__xmitConfig:
@@ -94,71 +201,246 @@ class ASAPAcord103Store(object):
             self.__cursor = config.getCursor(config.DB_NAME_XMIT)
         return self.__cursor
 
-    def __getRecords(self, whereClause, fActive=True):
+    def _getStorageMode(self):
         """
+        Return the storage mode used for new records.
+        """
+        config = self._getXmitConfig()
+        mode = (config.getSetting(config.SETTING_ACORD103_STORAGE) or self.STORAGE_BASE64).strip().lower()
+        if mode not in (self.STORAGE_BASE64, self.STORAGE_ZLIB):
+            self._logger.warn('Unknown ACORD 103 storage mode {mode!s:s}, using {default!s:s}.'
+                              .format(mode=mode, default=self.STORAGE_BASE64))
+            mode = self.STORAGE_BASE64
+        return mode
+
+    def _hasZipColumn(self):
+        """
+        True if asap_acord103 has the acord103_zip column for compressed XML.
+        """
+        if self.__fHasZipColumn is None:
+            rec = self.__fetch("select col_length('asap_acord103', 'acord103_zip')", True)
+            self.__fHasZipColumn = bool(rec and rec[0])
+        return self.__fHasZipColumn
+
+    def __getXmlColumns(self):
+        if self._hasZipColumn():
+            return 'acord103, acord103_zip'
+        return 'acord103, null'
+
+    def __getRecords(self, whereClause, fActive=True, fWithXml=False):
+        """ Select records that match whereClause.  Only the metadata columns
+        are selected unless fWithXml is set; otherwise each record reads its
+        XML on first access of xmlData.
 
         :param str whereClause:
         :param bool fActive:
+        :param bool fWithXml: read the XML along with the metadata
         :rtype: list[ASAPAcord103Record]
         """
         acordRecs = []
         active = 0
         if fActive:
             active = 1
+        sXmlColumn = ''
+        if fWithXml:
+            sXmlColumn = ', ' + self.__getXmlColumns()
         sQuery = '''
-            select trackingid, polnumber, trackingid103, transrefguid, datereceived, retrieve, acord103
+            select trackingid, polnumber, trackingid103, transrefguid, datereceived, retrieve{xmlColumn!s:s}
             from asap_acord103 with (nolock)
             where {whereClause!s:s}
             and active = {active:d}
             order by datereceived desc
-            '''.format(whereClause=whereClause, active=active)
-        xmitConfig = self._getXmitConfig()
-        xmitConfig.reconnect(xmitConfig.DB_NAME_XMIT)  # for some reason, this is necessary to be able to read the Acord103 field
-        cursor = self._getCursor()
+            '''.format(xmlColumn=sXmlColumn, whereClause=whereClause, active=active)
         self._logger.info(sQuery)
-        cursor.execute(sQuery)
-        recs = cursor.fetch()
-        cursor.rollback()
+        try:
+            recs = self.__fetch(sQuery)
+        except Exception:
+            if not fWithXml:
+                raise
+            # reading the Acord103 field sometimes needs a fresh connection
+            self._logger.warn('Query for ACORD 103 records failed, reconnecting:', exc_info=True)
+            self.__reconnect()
+            recs = self.__fetch(sQuery)
         if recs:
             for rec in recs:
-                acordRec = ASAPAcord103Record()
+                acordRec = ASAPAcord103Record(self._loadXmlData)
                 (acordRec.trackingId, acordRec.policyNumber,
                  acordRec.trackingId103, acordRec.transRefGuid,
-                 acordRec.dateReceived, acordRec.retrieve, acordRec.xmlData) = rec
-                acordRec.xmlData = base64.decodestring(acordRec.xmlData)
+                 acordRec.dateReceived, acordRec.retrieve) = rec[:6]
+                if fWithXml:
+                    acordRec.xmlData = self.__decodeXml(rec[6], rec[7])
 
                 acordRec.retrieve = int(acordRec.retrieve)
                 acordRec.active = active
                 acordRecs.append(acordRec)
         return acordRecs
 
-    def getByTrackingId103(self, trackingId103, fActive=True):
+    def __fetch(self, sQuery, fSingle=False):
+        cursor = self._getCursor()
+        try:
+            cursor.execute(sQuery)
+            recs = cursor.fetch(fSingle)
+        finally:
+            cursor.rollback()
+        return recs
+
+    def __reconnect(self):
+        xmitConfig = self._getXmitConfig()
+        xmitConfig.reconnect(xmitConfig.DB_NAME_XMIT)
+        # the old cursor was closed by reconnect
+        self.__cursor = None
+
+    @staticmethod
+    def __decodeXml(xml64, xmlZip=None):
+        """
+        Return the XML from whichever column holds it.
+        """
+        if xmlZip is not None:
+            return zlib.decompress(bytes(xmlZip))
+        return base64.decodestring(xml64)
+
+    @staticmethod
+    def __encodeZip(xmlData):
+        """
+        Return the compressed XML as a SQL Server binary literal.
+        """
+        return '0x' + binascii.hexlify(zlib.compress(xmlData, 9)).decode('ascii')
+
+    def _loadXmlData(self, acord103Record):
+        """ Read the XML for a record returned without it.  If the read fails,
+        the connection is reset and the read is tried once more.
+
+        :param ASAPAcord103Record acord103Record:
+        :rtype: str
+        """
+        for iAttempt in (1, 2):
+            try:
+                sQuery = '''
+                    select {xmlColumns!s:s}
+                    from asap_acord103 with (nolock)
+                    where trackingid = '{trackingId!s:s}' and datereceived = '{date_recd:%d-%b-%Y %H:%M:%S}'
+                    '''.format(xmlColumns=self.__getXmlColumns(),
+                               trackingId=acord103Record.trackingId,
+                               date_recd=acord103Record.dateReceived)
+                rec = self.__fetch(sQuery, True)
+                if not rec:
+                    self._logger.warn('No ACORD 103 data found for {acord103Record!r:s}.'
+                                      .format(acord103Record=acord103Record))
+                    return ''
+                return self.__decodeXml(rec[0], rec[1])
+            except Exception:
+                if iAttempt == 2:
+                    raise
+                # reading the Acord103 field sometimes needs a fresh connection
+                self._logger.warn('Failed to read ACORD 103 data for {acord103Record!r:s}, reconnecting:'
+                                  .format(acord103Record=acord103Record), exc_info=True)
+                self.__reconnect()
+
+    def getByTrackingId103(self, trackingId103, fActive=True, fWithXml=False):
         """
         Return list of ASAPAcord103Record objects for 103 tracking ID,
         if they exist.  List is ordered by date received, most recent first.
+        The XML is read on first use of xmlData, unless fWithXml is set.
         """
-        return self.__getRecords("trackingid103 = '{trackingId103!s:s}'".format(trackingId103=trackingId103), fActive)
+        return self.__getRecords("trackingid103 = '{trackingId103!s:s}'".format(trackingId103=trackingId103), fActive, fWithXml)
 
-    def getByTransRefGuid(self, transRefGuid, fActive=True):
+    def getByTransRefGuid(self, transRefGuid, fActive=True, fWithXml=False):
         """
         Return list of ASAPAcord103Record objects for transRefGuid,
         if they exist.  List is ordered by date received, most recent first.
+        The XML is read on first use of xmlData, unless fWithXml is set.
         """
-        return self.__getRecords("transrefguid = '{transRefGuid!s:s}'".format(transRefGuid=transRefGuid), fActive)
+        return self.__getRecords("transrefguid = '{transRefGuid!s:s}'".format(transRefGuid=transRefGuid), fActive, fWithXml)
 
-    def getByTrackingId(self, trackingId, fActive=True):
+    def getByTrackingId(self, trackingId, fActive=True, fWithXml=False):
         """
         Return list of ASAPAcord103Record objects for tracking ID,
         if they exist.  List is ordered by date received, most recent first.
+        The XML is read on first use of xmlData, unless fWithXml is set.
         """
-        return self.__getRecords("trackingid = '{trackingId!s:s}'".format(trackingId=trackingId), fActive)
+        return self.__getRecords("trackingid = '{trackingId!s:s}'".format(trackingId=trackingId), fActive, fWithXml)
 
-    def getByPolicyNumber(self, policyNumber, fActive=True):
+    def getByPolicyNumber(self, policyNumber, fActive=True, fWithXml=False):
         """
         Return list of ASAPAcord103Record objects that match
         the policy number.  List is ordered by date received, most recent first.
+        The XML is read on first use of xmlData, unless fWithXml is set.
+        """
+        return self.__getRecords("polnumber = '{policyNumber!s:s}'".format(policyNumber=policyNumber), fActive, fWithXml)
+
+    @staticmethod
+    def __read103File(acord103Path):
+        """ Parse a 103 file named "<trackingid>.XML" and return an unsaved
+        record for it.  Raises an exception if the file cannot be parsed.
+
+        :param str acord103Path:
+        :rtype: ASAPAcord103Record
+        """
+        from ILS.AcordXML import AcordXMLParser
+        trackingId = os.path.basename(acord103Path).split('.')[0]
+        parser = AcordXMLParser()
+        handler = parser.parse(acord103Path)
+        errorHandler = parser.getErrorHandler()
+        if errorHandler.errors:
+            raise errorHandler.errors[0]
+        txLifeObject = handler.txList[0]
+
+        policyNumber = txLifeObject.getElement('ACORDInsuredHolding.Policy.PolNumber')
+        if policyNumber:
+            policyNumber = policyNumber.value
+        else:
+            policyNumber = ''
+
+        transRefGuid = txLifeObject.getElement('TXLifeRequest.TransRefGUID')
+        if transRefGuid:
+            transRefGuid = transRefGuid.value
+        else:
+            transRefGuid = ''
+
+        trackingId103 = txLifeObject.getElement('ACORDInsuredHolding.Policy.ApplicationInfo.TrackingID')
+        if trackingId103:
+            trackingId103 = trackingId103.value
+        else:
+            trackingId103 = ''
+
+        ptr = open(acord103Path, 'r')
+        xmlData = ptr.read()
+        ptr.close()
+        acordRec = ASAPAcord103Record()
+        acordRec.trackingId = trackingId
+        acordRec.policyNumber = policyNumber
+        acordRec.trackingId103 = trackingId103
+        acordRec.transRefGuid = transRefGuid
+        acordRec.xmlData = xmlData
+        acordRec.retrieve = 1
+        return acordRec
+
+    def __getInsertSql(self, acordRecs):
+        """ Return one insert statement for all of the records, in the current
+        storage mode.
+
+        :param list[ASAPAcord103Record] acordRecs:
+        :rtype: str
         """
-        return self.__getRecords("polnumber = '{policyNumber!s:s}'".format(policyNumber=policyNumber), fActive)
+        fZip = self._getStorageMode() == self.STORAGE_ZLIB and self._hasZipColumn()
+        values = []
+        for acordRec in acordRecs:
+            if fZip:
+                sXml = "'', {xmlZip!s:s}".format(xmlZip=self.__encodeZip(acordRec.xmlData))
+            else:
+                sXml = "'{xml64!s:s}'".format(xml64=base64.encodestring(acordRec.xmlData))
+            values.append("('{trackingId!s:s}', '{policyNumber!s:s}', '{trackingId103!s:s}', '{transRefGuid!s:s}', {xml!s:s}, "
+                          "'{today:%d-%b-%Y %H:%M:%S}', 1, 1)"
+                          .format(trackingId=acordRec.trackingId, policyNumber=acordRec.policyNumber,
+                                  trackingId103=acordRec.trackingId103, transRefGuid=acordRec.transRefGuid,
+                                  xml=sXml, today=acordRec.dateReceived))
+        sXmlColumns = 'acord103'
+        if fZip:
+            sXmlColumns = 'acord103, acord103_zip'
+        return '''
+            insert into asap_acord103(trackingid, polnumber, TrackingID103, TransRefGuid, {xmlColumns!s:s}, datereceived, retrieve, active) values
+            {values!s:s}
+            '''.format(xmlColumns=sXmlColumns, values=',\n            '.join(values))
 
     def add103File(self, acord103Path):
         """
@@ -167,57 +449,120 @@ class ASAPAcord103Store(object):
         """
         acordRec = None
         try:
-            trackingId = os.path.basename(acord103Path).split('.')[0]
-            parser = AcordXMLParser()
-            handler = parser.parse(acord103Path)
-            errorHandler = parser.getErrorHandler()
-            if errorHandler.errors:
-                raise errorHandler.errors[0]
-            txLifeObject = handler.txList[0]
-
-            policyNumber = txLifeObject.getElement('ACORDInsuredHolding.Policy.PolNumber')
-            if policyNumber:
-                policyNumber = policyNumber.value
-            else:
-                policyNumber = ''
-
-            transRefGuid = txLifeObject.getElement('TXLifeRequest.TransRefGUID')
-            if transRefGuid:
-                transRefGuid = transRefGuid.value
-            else:
-                transRefGuid = ''
-
-            trackingId103 = txLifeObject.getElement('ACORDInsuredHolding.Policy.ApplicationInfo.TrackingID')
-            if trackingId103:
-                trackingId103 = trackingId103.value
-            else:
-                trackingId103 = ''
-
-            ptr = open(acord103Path, 'r')
-            xmlData = ptr.read()
-            ptr.close()
-            xml64 = base64.encodestring(xmlData)
-            today = datetime.datetime.today()
+            newRec = self.__read103File(acord103Path)
+            newRec.dateReceived = datetime.datetime.today()
             cursor = self._getCursor()
-            cursor.execute('''
-                insert into asap_acord103(trackingid, polnumber, TrackingID103, TransRefGuid, acord103, datereceived, retrieve, active) values
-                ('{trackingId!s:s}', '{policyNumber!s:s}', '{trackingId103!s:s}', '{transRefGuid!s:s}', '{xml64!s:s}', '{today:%d-%b-%Y %H:%M:%S}', 1, 1)
-                '''.format(trackingId=trackingId, policyNumber=policyNumber, trackingId103=trackingId103, transRefGuid=transRefGuid, xml64=xml64, today=today))
+            cursor.execute(self.__getInsertSql([newRec]))
             cursor.commit()
-            acordRec = ASAPAcord103Record()
-            acordRec.trackingId = trackingId
-            acordRec.policyNumber = policyNumber
-            acordRec.xmlData = xmlData
-            acordRec.dateReceived = today
-            acordRec.retrieve = 1
+            acordRec = newRec
         except Exception:
             self._logger.warn("Failed to insert record for file {acord103Path!s:s}: ".format(acord103Path=acord103Path), exc_info=True)
         return acordRec
 
+    def __getExistingTransRefGuids(self, transRefGuids):
+        """
+        Return the subset of transRefGuids that already have an active record.
+        """
+        existing = set()
+        transRefGuids = sorted(transRefGuids)
+        for start in range(0, len(transRefGuids), self.BULK_LOOKUP_SIZE):
+            chunk = transRefGuids[start:start + self.BULK_LOOKUP_SIZE]
+            recs = self.__fetch('''
+                select distinct transrefguid
+                from asap_acord103 with (nolock)
+                where transrefguid in ({guids!s:s})
+                and active = 1
+                '''.format(guids=', '.join("'{guid!s:s}'".format(guid=guid) for guid in chunk)))
+            if recs:
+                existing.update(rec[0] for rec in recs)
+        return existing
+
+    def add103Directory(self, dirPath, pattern='*.XML', fSkipExisting=True):
+        """ Add every 103 file in dirPath matching pattern.  Files with the
+        same TransRefGUID as an earlier file (or, if fSkipExisting, as an
+        active record) are skipped, and the rest are inserted with multi-row
+        statements in one transaction.  The files are parsed in turn: the
+        parse holds the GIL, so parsing on threads is no faster.
+
+        Records are keyed by trackingid and datereceived, so each row gets
+        its own datereceived; rows for the same trackingid are a second
+        apart, in file name order, so the last file is the most recent.
+
+        :param str dirPath:
+        :param str pattern: file name pattern, as for glob
+        :param bool fSkipExisting: skip files whose TransRefGUID is already stored
+        :rtype: ASAPAcord103IngestReport
+        """
+        report = ASAPAcord103IngestReport()
+        beginTime = time.time()
+        paths = sorted(glob.glob(os.path.join(dirPath, pattern)))
+
+        toAdd = []
+        seenGuids = {}
+        for acord103Path in paths:
+            fileStart = time.time()
+            acordRec = error = None
+            try:
+                acordRec = self.__read103File(acord103Path)
+            except Exception as e:
+                error = e
+            seconds = time.time() - fileStart
+            if error is not None:
+                self._logger.warn('Failed to parse {acord103Path!s:s}: {error!s:s}'
+                                  .format(acord103Path=acord103Path, error=error))
+                report.addFile(acord103Path, report.STATUS_FAILED, seconds, str(error))
+            elif acordRec.transRefGuid and acordRec.transRefGuid in seenGuids:
+                report.addFile(acord103Path, report.STATUS_DUPLICATE, seconds,
+                               'same TransRefGUID as {other!s:s}'.format(other=seenGuids[acordRec.transRefGuid]))
+            else:
+                if acordRec.transRefGuid:
+                    seenGuids[acordRec.transRefGuid] = os.path.basename(acord103Path)
+                toAdd.append((acord103Path, acordRec, seconds))
+
+        if toAdd and fSkipExisting:
+            existing = self.__getExistingTransRefGuids(seenGuids.keys())
+            if existing:
+                remaining = []
+                for acord103Path, acordRec, seconds in toAdd:
+                    if acordRec.transRefGuid in existing:
+                        report.addFile(acord103Path, report.STATUS_DUPLICATE, seconds, 'TransRefGUID already stored')
+                    else:
+                        remaining.append((acord103Path, acordRec, seconds))
+                toAdd = remaining
+
+        if toAdd:
+            # datereceived is stored to the second
+            lastReceived = {}
+            for acord103Path, acordRec, seconds in toAdd:
+                received = datetime.datetime.today().replace(microsecond=0)
+                last = lastReceived.get(acordRec.trackingId)
+                if last is not None and received <= last:
+                    received = last + datetime.timedelta(seconds=1)
+                acordRec.dateReceived = lastReceived[acordRec.trackingId] = received
+            cursor = self._getCursor()
+            try:
+                for start in range(0, len(toAdd), self.BULK_INSERT_SIZE):
+                    cursor.execute(self.__getInsertSql([acordRec for acord103Path, acordRec, seconds
+                                                        in toAdd[start:start + self.BULK_INSERT_SIZE]]))
+                cursor.commit()
+            except Exception as e:
+                cursor.rollback()
+                self._logger.warn('Failed to insert {count:d} records from {dirPath!s:s}: '
+                                  .format(count=len(toAdd), dirPath=dirPath), exc_info=True)
+                for acord103Path, acordRec, seconds in toAdd:
+                    report.addFile(acord103Path, report.STATUS_FAILED, seconds, 'insert failed: {error!s:s}'.format(error=e))
+            else:
+                for acord103Path, acordRec, seconds in toAdd:
+                    report.addFile(acord103Path, report.STATUS_ADDED, seconds, '', acordRec)
+        report.elapsed = time.time() - beginTime
+        self._logger.info('{dirPath!s:s}: {report!r:s}'.format(dirPath=dirPath, report=report))
+        return report
+
     def writeToFile(self, acord103Record, filePath, fMarkRetrieved=False):
         """
         Writes the XML data in the record to a file named <trackingid>.XML
-        in the path specified by filePath.
+        in the path specified by filePath.  The record holds the decoded XML
+        whichever way it is stored, so the file is the same for both modes.
         """
         xmlFile = os.path.join(filePath, '{trackingid!s:s}.XML'.format(trackingid=acord103Record.trackingId))
         ptr = open(xmlFile, 'w')
@@ -357,3 +702,84 @@ class ASAPAcord103Store(object):
                            date_recd=acord103Record.dateReceived))
             cursor.commit()
             acord103Record.policyNumber = policyNumber
+
+    def addZipColumn(self):
+        """
+        Add the acord103_zip column for compressed XML, if not already there.
+        """
+        if not self._hasZipColumn():
+            cursor = self._getCursor()
+            cursor.execute('alter table asap_acord103 add acord103_zip varbinary(max) null')
+            cursor.commit()
+            self.__fHasZipColumn = True
+
+    def migrateToCompressed(self, batchSize=100):
+        """ Move the XML of existing records from base64 text in acord103 to
+        compressed binary in acord103_zip, committing after each batch.
+        The migration can be stopped and started again at any time.
+
+        :param int batchSize: records converted per batch
+        :returns: a tuple of (records converted, base64 bytes before, compressed bytes after)
+        :rtype: tuple[int, int, int]
+        """
+        self.addZipColumn()
+        iTotal = iBytesBefore = iBytesAfter = 0
+        cursor = self._getCursor()
+        while True:
+            recs = self.__fetch('''
+                select top {batchSize:d} trackingid, datereceived, acord103
+                from asap_acord103
+                where acord103_zip is null and datalength(acord103) > 0
+                order by datereceived
+                '''.format(batchSize=batchSize))
+            if not recs:
+                break
+            iUpdated = 0
+            for trackingId, dateReceived, xml64 in recs:
+                xmlZip = self.__encodeZip(self.__decodeXml(xml64))
+                iUpdated += cursor.execute('''
+                    update asap_acord103 set acord103_zip = {xmlZip!s:s}, acord103 = ''
+                    where trackingid = '{trackingId!s:s}' and datereceived = '{date_recd:%d-%b-%Y %H:%M:%S}'
+                    and acord103_zip is null
+                    '''.format(xmlZip=xmlZip, trackingId=trackingId, date_recd=dateReceived)) or 0
+                iBytesBefore += len(xml64)
+                # the literal is '0x' plus two hex digits per byte
+                iBytesAfter += (len(xmlZip) - 2) // 2
+            cursor.commit()
+            iTotal += iUpdated
+            self._logger.info('Compressed {count:d} ACORD 103 records ({total:d} so far).'
+                              .format(count=iUpdated, total=iTotal))
+            if not iUpdated:
+                # nothing matched, so the same rows would be selected again
+                self._logger.warn('No ACORD 103 records were updated in the last batch, stopping.')
+                break
+        return iTotal, iBytesBefore, iBytesAfter
+
+
+if __name__ == '__main__':
+    import sys
+    import CRLUtility
+    logger = CRLUtility.CRLGetLogger()
+    try:
+        begintime = time.time()
+        args = sys.argv[1:]
+        if args and args[0] == 'ingest' and len(args) > 1:
+            ingestReport = ASAPAcord103Store(logger).add103Directory(args[1])
+            for path, status, seconds, message in ingestReport.files:
+                logger.info('{path!s:s}: {status!s:s} ({seconds:5.3f} seconds) {message!s:s}'
+                            .format(path=path, status=status, seconds=seconds, message=message))
+        elif args and args[0] == 'migrate':
+            iBatchSize = 100
+            if len(args) > 1:
+                iBatchSize = int(args[1])
+            iCount, iBefore, iAfter = ASAPAcord103Store(logger).migrateToCompressed(iBatchSize)
+            logger.info('Compressed {count:d} ACORD 103 records: {before:d} bytes -> {after:d} bytes.'
+                        .format(count=iCount, before=iBefore, after=iAfter))
+        else:
+            logger.warn('Argument(s) not valid. Valid arguments:')
+            logger.warn('ingest <folder>')
+            logger.warn('migrate [batch size]')
+        logger.info('Time to process this pass was {elapsed:5.3f} seconds.'
+                    .format(elapsed=(time.time() - begintime)))
+    except:
+        logger.exception('Error')
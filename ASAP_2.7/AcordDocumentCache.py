@@ -0,0 +1,196 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      AcordDocumentCache
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPAcordDocumentCache class, a process-wide
+      cache of parsed ACORD XML files.  The same 103 is read by the index
+      handler, by custom transmit handlers and by the 103 store; with the
+      cache each file is parsed once per run.  Entries are keyed by the
+      file path, modification time and size, so a file that is rewritten
+      is parsed again on the next request.  Also included is the
+      ASAPAcordDocument class that is returned by accessors.
+
+      The cached handlers are shared and must not be changed.  A caller
+      that changes a document reads it through the shared handler and asks
+      getMutableHandler for a private one only on the path that writes, so
+      the copy is made only when needed.  The private handler is parsed
+      again from the file: copying a parsed tree element by element with
+      deepcopy costs more than the parse.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-027
+          getMutableHandler parses the file again instead of copying the
+          cached handler with deepcopy.
+
+      19-Oct-2026   ilsdev  user-049
+          Import the ACORD parser when a file is first parsed, so loading
+          ILS.ASAP does not load ILS.AcordXML.
+
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from .AcordPathIndex import ASAPAcordPathIndex
+
+
+class ASAPAcordDocument(object):
+    """
+    Result of parsing one ACORD XML file.  The handler is shared by every
+    caller that asks for the same file, so it must be treated as read-only;
+    use ASAPAcordDocumentCache.getMutableHandler for a private one.
+    """
+
+    def __init__(self, path, handler, exception=None, warnings=None, errors=None):
+        self.path = path
+        self.handler = handler
+        self.exception = exception
+        self.warnings = list(warnings or [])
+        self.errors = list(errors or [])
+        self.__pathIndex = None
+
+    def __repr__(self):
+        return '<ASAPAcordDocument {path!s:s} ({warnings:d} warnings, {errors:d} errors)>'.format(
+            path=self.path, warnings=len(self.warnings), errors=len(self.errors))
+
+    def isValid(self):
+        """
+        True if the file parsed without an exception or errors and a handler was returned.
+        """
+        return not self.exception and not self.errors and self.handler is not None
+
+    def getPathIndex(self):
+        """ Return the dotted-path index over the first TXLife element,
+        built on first use (None if there is no handler).
+
+        :rtype: ASAPAcordPathIndex|None
+        """
+        if self.__pathIndex is None and self.handler and self.handler.txList:
+            self.__pathIndex = ASAPAcordPathIndex(self.handler.txList[0])
+        return self.__pathIndex
+
+
+class ASAPAcordDocumentCache(object):
+    """
+    Cache of parsed ACORD XML files, keyed by (path, mtime, size).
+    """
+    DEFAULT_MAX_ENTRIES = 256
+
+    def __init__(self, maxEntries=DEFAULT_MAX_ENTRIES):
+        self.__maxEntries = max(1, int(maxEntries))
+        self.__entries = OrderedDict()  # type: OrderedDict[str, tuple[tuple, ASAPAcordDocument]]
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @staticmethod
+    def __getPathKey(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def __getFileStamp(path):
+        """
+        Return (mtime, size) for the file, or None if it cannot be read.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def __parse(path):
+        from ILS.AcordXML import AcordXMLParser
+        parser = AcordXMLParser()
+        handler = parser.parse(path)
+        exception = parser.getException()
+        errorHandler = parser.getErrorHandler()
+        warnings = errors = None
+        if errorHandler:
+            warnings = errorHandler.warnings
+            errors = errorHandler.errors
+        return ASAPAcordDocument(path, handler, exception, warnings, errors)
+
+    def getDocument(self, path):
+        """ Return the parsed document for path, parsing it only if it is not
+        cached or has changed on disk since it was cached.
+
+        :param str path:
+        :rtype: ASAPAcordDocument
+        """
+        pathKey = self.__getPathKey(path)
+        stamp = self.__getFileStamp(path)
+        if stamp is not None:
+            with self.__lock:
+                entry = self.__entries.get(pathKey)
+                if entry and entry[0] == stamp:
+                    # move to the end so the least recently used entry is dropped first
+                    del self.__entries[pathKey]
+                    self.__entries[pathKey] = entry
+                    self.__hits += 1
+                    return entry[1]
+        # parse outside of the lock, so other files can be served meanwhile
+        document = self.__parse(path)
+        with self.__lock:
+            self.__misses += 1
+            self.__entries.pop(pathKey, None)
+            if stamp is not None:
+                self.__entries[pathKey] = (stamp, document)
+                while len(self.__entries) > self.__maxEntries:
+                    self.__entries.popitem(last=False)
+        return document
+
+    def getHandler(self, path):
+        """ Return the shared, read-only handler for path (None if parsing failed).
+
+        :param str path:
+        """
+        return self.getDocument(path).handler
+
+    def getMutableHandler(self, path):
+        """ Return a private handler for path, parsed from the file, that the
+        caller may change and write back (None if parsing failed).  Call it
+        only when the document is to be changed, and read through the shared
+        handler otherwise.  Writing the file changes its mtime, which drops
+        the cached entry on the next request; call invalidate to drop it
+        right away.
+
+        :param str path:
+        """
+        return self.__parse(path).handler
+
+    def invalidate(self, path):
+        """
+        Drop any cached entry for path.
+        """
+        with self.__lock:
+            self.__entries.pop(self.__getPathKey(path), None)
+
+    def clear(self):
+        """
+        Drop all cached entries.
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def getCacheStats(self):
+        """
+        Return a tuple of (hits, misses, entries) for this cache.
+        """
+        with self.__lock:
+            return self.__hits, self.__misses, len(self.__entries)
@@ -0,0 +1,220 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      AcordPathIndex
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPAcordPathIndex class, which sits in front
+      of a parsed ACORD TXLife element and answers getElement lookups for
+      dotted paths from a dictionary.  Concrete paths that name one element
+      (through prefixes that do too) are recorded in a single walk of the
+      tree; any other path (alias roots such as ACORDInsuredParty, or paths
+      with repeated elements) is resolved once by the element itself and
+      remembered.
+
+      The index only reads the tree.  Trees from the parsed-document cache
+      are shared and must not be changed: a caller that changes a 103 does
+      so in a copy from ASAPAcordDocumentCache.getMutableHandler, and one
+      that rewrites the file calls ASAPAcordDocumentCache.invalidate, which
+      drops the document along with its index.  invalidate on the index
+      itself drops the recorded paths if its tree was changed anyway.
+
+      Run this module directly to compare lookup times with and without
+      the index over a set of ACORD files:
+
+          python AcordPathIndex.py [-n repeat] <file or folder> ...
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-028
+          Only record a path whose prefixes are unique as well, add
+          invalidate, and remember a miss only when the element returns None.
+
+"""
+
+import os
+
+# marks a path that was looked up and not found, so the miss is remembered too
+_MISSING = object()
+
+
+class ASAPAcordPathIndex(object):
+    """
+    Dotted-path index over a parsed ACORD element.  getElement has the same
+    signature and result as the element's own getElement.
+    """
+
+    def __init__(self, element):
+        self.__element = element
+        # None until built, and again after invalidate
+        self.__paths = None
+        if element is not None:
+            self.__paths = self.__indexElement(element)
+
+    def invalidate(self):
+        """
+        Drop the recorded paths, so they are found again on the next lookup
+        (for a tree that was changed after it was indexed).
+        """
+        self.__paths = None
+
+    def __indexElement(self, element):
+        """
+        Return every concrete dotted path below element that names exactly
+        one element, through prefixes that do too.  Other paths are left to
+        the element to resolve, so the result always matches its own getElement.
+        """
+        paths = {}
+        counts = {}
+        found = {}
+        stack = [('', element)]
+        while stack:
+            prefix, parent = stack.pop()
+            for child in parent.getElements():
+                path = prefix + child.name
+                counts[path] = counts.get(path, 0) + 1
+                found.setdefault(path, child)
+                stack.append((path + '.', child))
+        # a path is recorded only if it and each of its prefixes name one element, since
+        # the element resolves each step of the path to the first child with that name
+        for path in sorted(counts.keys(), key=lambda p: p.count('.')):
+            parentPath = path.rpartition('.')[0]
+            if counts[path] == 1 and (not parentPath or parentPath in paths):
+                paths[path] = found[path]
+        return paths
+
+    def getRoot(self):
+        """
+        Return the indexed element.
+        """
+        return self.__element
+
+    def getElement(self, path):
+        """ Return the element for a dotted path relative to the indexed
+        element, or None if there is none.
+
+        :param str path:
+        """
+        if self.__element is None:
+            return None
+        paths = self.__paths
+        if paths is None:
+            paths = self.__paths = self.__indexElement(self.__element)
+        elem = paths.get(path)
+        if elem is None:
+            elem = self.__element.getElement(path)
+            paths[path] = elem if elem is not None else _MISSING
+        elif elem is _MISSING:
+            return None
+        return elem
+
+    def __len__(self):
+        return len(self.__paths or {})
+
+
+def _collectPaths(element):
+    """
+    Return every concrete dotted path below element, in document order.
+    """
+    paths = []
+    stack = [('', element)]
+    while stack:
+        prefix, parent = stack.pop()
+        children = parent.getElements()
+        for child in reversed(children):
+            stack.append((prefix + child.name + '.', child))
+        paths.extend(prefix + child.name for child in children)
+    return paths
+
+
+def _benchmark(acordPaths, repeat):
+    """
+    Parse each file, then time looking up every path it contains (plus
+    the alias paths used by the index configurations) with the element's
+    own getElement and with ASAPAcordPathIndex.
+    """
+    import time
+    from ILS.AcordXML import AcordXMLParser
+    aliasPaths = ['ACORDInsuredHolding.Policy.PolNumber',
+                  'ACORDInsuredHolding.Policy.ApplicationInfo.TrackingID',
+                  'ACORDInsuredHolding.Policy.ApplicationInfo.ApplicationJurisdiction',
+                  'ACORDInsuredParty.Person.BirthJurisdictionTC',
+                  'ACORDInsuredParty.Address.Zip',
+                  'ACORDAgentParty.Producer.CarrierAppointment.CompanyProducerID',
+                  'TXLifeRequest.TransRefGUID']
+    totalParse = totalIndex = totalPlain = totalIndexed = 0.0
+    totalLookups = 0
+    for acordPath in acordPaths:
+        start = time.time()
+        handler = AcordXMLParser().parse(acordPath)
+        parseTime = time.time() - start
+        if not handler or not handler.txList:
+            print('{path!s:s}: no handler returned, skipped'.format(path=acordPath))
+            continue
+        txLife = handler.txList[0]
+        lookups = _collectPaths(txLife) + aliasPaths
+
+        start = time.time()
+        for i in range(repeat):
+            for path in lookups:
+                txLife.getElement(path)
+        plainTime = time.time() - start
+
+        start = time.time()
+        index = ASAPAcordPathIndex(txLife)
+        indexTime = time.time() - start
+        start = time.time()
+        for i in range(repeat):
+            for path in lookups:
+                index.getElement(path)
+        indexedTime = time.time() - start
+
+        for path in lookups:
+            if index.getElement(path) is not txLife.getElement(path):
+                print('{acordPath!s:s}: MISMATCH for {path!s:s}'.format(acordPath=acordPath, path=path))
+
+        print('{path!s:s}: parse {parse:.4f}s, index build {build:.4f}s, {count:d} lookups x {repeat:d}: '
+              'getElement {plain:.4f}s, indexed {indexed:.4f}s'
+              .format(path=os.path.basename(acordPath), parse=parseTime, build=indexTime,
+                      count=len(lookups), repeat=repeat, plain=plainTime, indexed=indexedTime))
+        totalParse += parseTime
+        totalIndex += indexTime
+        totalPlain += plainTime
+        totalIndexed += indexedTime
+        totalLookups += len(lookups) * repeat
+    if totalLookups:
+        print('TOTAL: parse {parse:.4f}s, index build {build:.4f}s, {count:d} lookups: '
+              'getElement {plain:.4f}s, indexed {indexed:.4f}s ({speedup:.1f}x)'
+              .format(parse=totalParse, build=totalIndex, count=totalLookups, plain=totalPlain,
+                      indexed=totalIndexed, speedup=totalPlain / max(totalIndexed + totalIndex, 1e-9)))
+
+
+if __name__ == '__main__':
+    import glob
+    import sys
+    args = sys.argv[1:]
+    iRepeat = 20
+    if len(args) >= 2 and args[0] == '-n':
+        iRepeat = int(args[1])
+        args = args[2:]
+    if not args:
+        print('Usage: python AcordPathIndex.py [-n repeat] <file or folder> ...')
+        sys.exit(1)
+    files = []
+    for arg in args:
+        if os.path.isdir(arg):
+            files.extend(sorted(glob.glob(os.path.join(arg, '*.[xX][mM][lL]'))))
+        else:
+            files.append(arg)
+    _benchmark(files, iRepeat)
@@ -41,19 +41,35 @@
 
       15-Mar-2016   nelsonj    Ticket 68279
             Bugfix for __addAppToImage retry logic
+
+      19-Oct-2026   ilsdev     user-035
+            Upload to Banner through the shared FTP session pool.
+
+      19-Oct-2026   ilsdev     user-038
+            PGP-encrypt each file straight into its upload with ASAPTransmitPipeline.
+
+      19-Oct-2026   ilsdev     user-045
+            Write the updated APP index straight to the transmit folder.
+
+      19-Oct-2026   ilsdev     user-049
+            Import PIL when an APP page count is needed, and open the odbc
+            connections for the reconciliation when it first uses them
+            (getConnection), rather than when the module is loaded.
+
+      19-Oct-2026   ilsdev     user-035
+            Cap the FTP sessions open at once to the Banner host.
 """
 
 from ILS.ASAP.Utility import ASAP_UTILITY
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
+from ILS.ASAP.TransportPool import ASAPTransportSession
+from ILS.ASAP.TransmitPipeline import ASAPTransmitPipeline, ASAPPgpEncryptor
 import CRLUtility
-from PIL import Image
-from PIL import ImageSequence
 import datetime
 import ftplib
 import glob
 import os
 import sys
-import odbc
 import time
 from ILS import ILSIndexCreation
 from .ASAPDocumentBundling import ASAPDocumentBundling
@@ -66,30 +82,23 @@ ILS_CLIENT_DOC_CONNECT_STRING = dsc.getConnString(dsc.DATABASES.ILS_CLIENT_DOCUM
 ILS_CONSENT_CONNECT_STRING = dsc.getConnString(dsc.DATABASES.ILS_CONSENT, ASAP_UTILITY.devState.isDevInstance())
 ILS_QC_CONNECT_STRING = dsc.getConnString(dsc.DATABASES.ILS_QC, ASAP_UTILITY.devState.isDevInstance())
 ILS_CONNECT_STRING = dsc.getConnString(dsc.DATABASES.ILS, ASAP_UTILITY.devState.isDevInstance())
-try:
-    CLIENT_CONN = odbc.odbc(ILS_CLIENT_DOC_CONNECT_STRING)
-#    print 'Connected to CLIENT_CONN'
-#    print CLIENT_CONN
-except:
-    CLIENT_CONN = None
-try:
-    CONSENT_CONN = odbc.odbc(ILS_CONSENT_CONNECT_STRING)
-#    print 'Connected to CONSENT_CONN'
-#    print CONSENT_CONN
-except:
-    CONSENT_CONN = None
-try:
-    QC_CONN = odbc.odbc(ILS_QC_CONNECT_STRING)
-#    print 'Connected to QC_CONN'
-#    print QC_CONN
-except:
-    QC_CONN = None
-try:
-    ILS_CONN = odbc.odbc(ILS_CONNECT_STRING)
-#    print 'Connected to ILS_CONN'
-#    print ILS_CONN
-except:
-    ILS_CONN = None
+# odbc connections by connect string, opened by getConnection when first used
+CONNECTIONS = {}
+
+
+def getConnection(connectString):
+    """
+    Return the odbc connection for the connect string, opening it the first
+    time (None if it cannot be opened).
+    """
+    if connectString not in CONNECTIONS:
+        import odbc
+        try:
+            CONNECTIONS[connectString] = odbc.odbc(connectString)
+        except:
+            CONNECTIONS[connectString] = None
+    return CONNECTIONS[connectString]
+
 
 if ASAP_UTILITY.devState.isDevInstance():
     BAN_OUTBOX_PATH = r'\\ntsys1\ils_appl\log\test'
@@ -220,8 +229,15 @@ class BANTransmitHandler(ASAPTransmitHandler):
             if fBuildApp:
                 case.contact.index.reset()
                 case.contact.index.readFile(fromToMoves[1][0])
+                from PIL import Image
+                from PIL import ImageSequence
                 case.contact.index.setValue('PAGES', str(len(list(ImageSequence.Iterator(Image.open(fromToMoves[0][0]))))))
-                case.contact.index.writeFile(fromToMoves[1][0])
+                # write the updated index to the transmit folder, rather than
+                # rewriting it in place and then moving it
+                idxPath, xmitIdxPath = fromToMoves[1]
+                if case.contact.index.writeFile(xmitIdxPath):
+                    filesToDelete.append(idxPath)
+                    del fromToMoves[1]
             for fromPath, toPath in fromToMoves:
                 CRLUtility.CRLCopyFile(fromPath, toPath, True, 5)
             for fileName in filesToDelete:
@@ -231,58 +247,69 @@ class BANTransmitHandler(ASAPTransmitHandler):
     def _transmitStagedCases(self):
         fSuccess = True
         BAN_FTP_HOSTNAME = 'Banner'
+        BAN_FTP_MAX_SESSIONS = 2
         BAN_REMOTE_USER = 'Legal & General America Operations <oper@lgamerica.com>'
         sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo(BAN_FTP_HOSTNAME)
+        ASAP_UTILITY.getTransportPool().setHostLimit(sServer, BAN_FTP_MAX_SESSIONS)
         contact = self._getContact()
         xmitStagingPath = contact.xmit_dir
         xmitZipPath = os.path.join(xmitStagingPath, 'zip')
         xmitPgpPath = os.path.join(xmitStagingPath, 'pgp')
         xmitSentPath = os.path.join(xmitStagingPath, 'sent')
+        testPath = '.'
+        if ASAP_UTILITY.devState.isDevInstance():
+            testPath = 'TEST'
+        wpPath = ''
+        if contact.client_id == 'WMP':
+            wpPath = 'WP/'
         toXmitFiles = glob.glob(os.path.join(xmitStagingPath, '*.*'))
         if (len(toXmitFiles) > 0):
             self._getLogger().info('There are {toXmitFiles:d} files in the transmit staging folder to process...'
                                    .format(toXmitFiles=len(toXmitFiles)))
+            # encrypt each file straight into its upload, with no PGP file written in between
+            pipeline = ASAPTransmitPipeline(ASAPPgpEncryptor('ILS', BAN_REMOTE_USER), logger=self._getLogger())
             for xmitFile in toXmitFiles:
                 xmitFileName = os.path.basename(xmitFile)
                 pgpFileName = '{xmitFileName!s:s}.pgp'.format(xmitFileName=xmitFileName)
-                iRet = CRLUtility.CRLPGPEncrypt('ILS', BAN_REMOTE_USER, xmitFile, os.path.join(xmitPgpPath, pgpFileName))
-                self._getLogger().debug('PGP encrypt returned {iRet:d}.'.format(iRet=iRet))
-                # if successful, move file to zip path
-                if iRet == 0 and os.path.exists(os.path.join(xmitPgpPath, pgpFileName)):
-                    CRLUtility.CRLCopyFile(xmitFile, os.path.join(xmitZipPath, xmitFileName), True, 5)
-                    self._getLogger().info('PGP file {pgpFileName!s:s} successfully created and ready for transmission.'
-                                           .format(pgpFileName=pgpFileName))
-                else:
+                serverPath = '{testPath!s:s}/{wpPath!s:s}{fileName!s:s}'.format(testPath=testPath, wpPath=wpPath, fileName=pgpFileName)
+                try:
+                    result = pipeline.run([xmitFile], ASAPTransmitPipeline.ftpUploader(ASAP_UTILITY.getTransportPool(),
+                                                                                       sServer, sUser, sPassword, serverPath),
+                                          fZip=False)
+                except:
+                    # the file stays in the staging folder for the next run
                     fSuccess = False
-                    self._getLogger().error('Failed to PGP-encrypt file {xmitFileName!s:s} for BAN.'
-                                            .format(xmitFileName=xmitFileName))
+                    self._getLogger().warn('Failed to PGP-encrypt and upload file {xmitFileName!s:s} to Banner:'
+                                           .format(xmitFileName=xmitFileName), exc_info=True)
+                else:
+                    CRLUtility.CRLCopyFile(xmitFile, os.path.join(xmitZipPath, xmitFileName), True, 5)
+                    self._getLogger().info('PGP file {pgpFileName!s:s} successfully uploaded to Banner ({result!r:s}).'
+                                           .format(pgpFileName=pgpFileName, result=result))
             # zip files in zip path into the sent folder
             today = datetime.datetime.today()
             zipFileName = 'CRL{client_id!s:s}{today:%Y%m%d%H%M%S}.ZIP'.format(client_id=contact.client_id, today=today)
             CRLUtility.CRLZIPFiles(os.path.join(xmitZipPath, '*.*'), os.path.join(xmitSentPath, zipFileName), True)
-        # now FTP any unsent PGP files to BAN
-        testPath = '.'
-        if ASAP_UTILITY.devState.isDevInstance():
-            testPath = 'TEST'
-        wpPath = ''
-        if contact.client_id == 'WMP':
-            wpPath = 'WP/'
+        # now FTP any PGP files left from earlier runs to BAN
         pgpFiles = glob.glob(os.path.join(xmitPgpPath, '*.*'))
-        ftpServer = None
+        transportPool = ASAP_UTILITY.getTransportPool()
+        session = None
         for pgpFile in pgpFiles:
             fileName = os.path.basename(pgpFile)
             serverPath = '{testPath!s:s}/{wpPath!s:s}{fileName!s:s}'.format(testPath=testPath, wpPath=wpPath, fileName=fileName)
             try:
-                if not ftpServer:
-                    ftpServer = ftplib.FTP(sServer, sUser, sPassword)
-                CRLUtility.CRLFTPPut(ftpServer, pgpFile, serverPath, 'b')
+                if not session:
+                    session = transportPool.acquire(sServer, sUser, sPassword, protocol=ASAPTransportSession.PROTOCOL_FTP)
+                CRLUtility.CRLFTPPut(session.ftp, pgpFile, serverPath, 'b')
                 self._getLogger().info('PGP file {pgpFile!s:s} successfully uploaded to Banner'.format(pgpFile=pgpFile))
                 CRLUtility.CRLDeleteFile(pgpFile)
             except:
                 fSuccess = False
                 self._getLogger().warn('Failed to FTP file {pgpFile!s:s} to Banner:'.format(pgpFile=pgpFile))
-        if ftpServer:
-            ftpServer.close()
+                if session:
+                    transportPool.release(session, True)
+                    session = None
+        if session:
+            transportPool.release(session)
         return fSuccess
 
 
@@ -381,7 +408,7 @@ def setReconDateForNonASAPDocs(tifName):
         set dsbi_reconcile_date = current_timestamp
         where dsbi_image_file = '{tifName!s:s}'
     """.format(tifName=tifName)
-    cursor = ILS_CONN.cursor()
+    cursor = getConnection(ILS_CONNECT_STRING).cursor()
     cursor.execute(query)
     data = cursor.fetchone()
     count = 0
@@ -402,7 +429,7 @@ def findDocType(tifName):
         FROM doc_serv_bundle_image
         WHERE lower(dsbi_image_file) = '{tifName!s:s}'
         """.format(tifName=tifName.lower())
-    cursor = ILS_CONN.cursor()
+    cursor = getConnection(ILS_CONNECT_STRING).cursor()
     cursor.execute(query)
     data = cursor.fetchone()
     cursor.close()
@@ -508,7 +535,7 @@ def runReconciliation():
     for eachfile in NonTransmittedFiles:
         doc = docFactory.fromFileName(eachfile)
         if doc:  # ASAP
-            cursor = QC_CONN.cursor()
+            cursor = getConnection(ILS_QC_CONNECT_STRING).cursor()
             # #pageId = eachfile.split('.')[0]
             # #pageId = pageId.lstrip('0')
             # #docId = ILSDocumentBundling.getDocumentIdFromPageId(pageId, QC_CONN)
@@ -556,8 +583,9 @@ def runReconciliation():
             pageId = eachfile[1:9]
             pageId = pageId.lstrip('0')
             if doctype == 'clientdoc':
-                clientCursor = CLIENT_CONN.cursor()
-                docId = ILSDocumentBundling.getDocumentIdFromPageId(pageId, CLIENT_CONN)
+                clientConn = getConnection(ILS_CLIENT_DOC_CONNECT_STRING)
+                clientCursor = clientConn.cursor()
+                docId = ILSDocumentBundling.getDocumentIdFromPageId(pageId, clientConn)
                 if not docId:
                     nonexistingFiles.append(eachfile)
                 else:
@@ -569,8 +597,9 @@ def runReconciliation():
                 clientCursor.close()
                 NonTransmittedFilesDocConsent.append(eachfile)
             elif doctype == 'consent':
-                conCursor = CONSENT_CONN.cursor()
-                docId = ILSDocumentBundling.getDocumentIdFromPageId(pageId, CONSENT_CONN)
+                conConn = getConnection(ILS_CONSENT_CONNECT_STRING)
+                conCursor = conConn.cursor()
+                docId = ILSDocumentBundling.getDocumentIdFromPageId(pageId, conConn)
                 if not docId:
                     nonexistingFiles.append(eachfile)
                 else:
@@ -23,6 +23,18 @@
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
 
+      19-Oct-2026   ilsdev  user-040
+          Added transmitHistory, filled by ASAPDocumentHistory.
+
+      19-Oct-2026   ilsdev  user-041
+          Added limsRecords, filled by ASAPIndexPrefetch.
+
+      19-Oct-2026   ilsdev  user-042
+          Added acord121Document, filled by ASAPIndexPrefetch.
+
+      19-Oct-2026   ilsdev  user-047
+          Added acord121BlobId and indexReused.
+
 """
 
 import os
@@ -50,6 +62,19 @@ class ASAPCase(object):
         self.contact = None  # type: ASAPContact
         # dictionary of ASAPDocument objects using documentid as key
         self.__documents = {}
+        # (documentid, actiondate) tuples tracked as transmitted, loaded once per run
+        # by ASAPDocumentHistory.getTransmitHistory (None until loaded)
+        self.transmitHistory = None  # type: list[(int, datetime.datetime)]
+        # LIMS rows for the index as {table: {column: value}}, read for a batch of
+        # cases by ASAPIndexPrefetch (None if not prefetched)
+        self.limsRecords = None  # type: dict[str, dict[str, object]]
+        # parsed ACORD 121 order, read for a batch of cases by ASAPIndexPrefetch
+        # (None if not prefetched)
+        self.acord121Document = None
+        # blobid of that order, for the index fingerprint (None if not prefetched)
+        self.acord121BlobId = None
+        # True if the last index build reused the indexes built from the same inputs
+        self.indexReused = False
 
     def addDocument(self, document):
         """
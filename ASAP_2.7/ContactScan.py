@@ -0,0 +1,185 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      ContactScan
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPContactScan class, which decides before
+      the contact threads are started which contacts have anything to do,
+      so that MainThread only starts threads (and their main handler, file
+      manager and case queries) for those.
+
+      A contact has work if any of these has a file:
+          its document folder (*.TIF, images to index)
+          its index folder (*.IDX, cases to stage)
+          its transmit folder, or the zip, pgp, unzip, retrans or outbox
+          subfolder (files left to transmit or retry)
+      or if the file manager has files of the contact marked for deletion
+      (which the transmit handler deletes).  Each folder is listed once,
+      even if several contacts share it, and the files marked for deletion
+      are counted for all contacts with one grouped query.
+
+      A transmit handler whose _preStage or _transmitStagedCases has work
+      that does not show in these folders is listed in
+      ALWAYS_PROCESSED_HANDLERS, and its contacts are always processed.
+      The list is checked against the custom module and class configured
+      for the contact, so the scan does not import the carrier modules.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-050
+          Check the always-processed handlers against a table of custom
+          modules and classes instead of importing each contact's module.
+
+"""
+
+import os
+
+import CRLUtility
+from .Contact import ASAPContact
+from .FileManager import ASAPFile
+
+
+class ASAPContactScan(object):
+    """
+    Finds the contacts with pending work.
+    """
+    # transmit subfolders holding files still to be sent (review and sent are not)
+    PENDING_XMIT_SUBDIRS = ('zip', 'pgp', 'unzip', 'retrans', 'outbox')
+    # (custom module, custom class) of the transmit handlers whose contacts
+    # are processed on every run; the module is matched by its last name
+    ALWAYS_PROCESSED_HANDLERS = frozenset([
+        ('TROCustom', 'TROTransmitHandler'),  # _preStage images the text reports
+    ])
+
+    def __init__(self, logger=None, cursor=None):
+        """
+
+        :param logger:
+        :param cursor: cursor for the asap_file_manager table (default is the xmit database)
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__cursor = cursor
+        # folder (normalised): True if it has a matching file
+        self.__folders = {}
+
+    def __getCursor(self):
+        if not self.__cursor:
+            from .Utility import ASAP_UTILITY
+            xmitConfig = ASAP_UTILITY.getXmitConfig()
+            self.__cursor = xmitConfig.getCursor(xmitConfig.DB_NAME_XMIT)
+        return self.__cursor
+
+    def __hasFiles(self, folder, extension=''):
+        """
+        True if the folder has a file with the extension (any file name
+        with an extension if none is given, as glob '*.*' does).
+        """
+        if not folder:
+            return False
+        key = (os.path.normcase(os.path.normpath(folder)), extension.upper())
+        if key not in self.__folders:
+            fFound = False
+            try:
+                fileNames = os.listdir(folder)
+            except OSError:
+                fileNames = []
+            for fileName in fileNames:
+                if extension:
+                    fMatch = os.path.splitext(fileName)[1].upper() == extension.upper()
+                else:
+                    fMatch = '.' in fileName
+                if fMatch and os.path.isfile(os.path.join(folder, fileName)):
+                    fFound = True
+                    break
+            self.__folders[key] = fFound
+        return self.__folders[key]
+
+    def getMarkedForDeletionCounts(self):
+        """ Return the number of files marked for deletion for each contact, with one query.
+
+        :rtype: dict[str, int]
+        """
+        counts = {}
+        cursor = self.__getCursor()
+        cursor.execute('''
+            select m.contact_id, count(*)
+            from asap_file_manager m with (nolock),
+            asap_file_state s with (nolock)
+            where m.state_id = s.state_id
+            and s.state_value = '{state!s:s}'
+            group by m.contact_id
+            '''.format(state=ASAPFile.STATE_MARKED_FOR_DELETION))
+        recs = cursor.fetch()
+        cursor.rollback()
+        if recs:
+            for contactId, count in recs:
+                counts[contactId] = count
+        return counts
+
+    @classmethod
+    def __isAlwaysProcessed(cls, contact):
+        """
+        True if the contact's transmit handler has work outside its folders.
+        """
+        from .MainHandler import ASAPMainHandler
+        customRec = contact.customClasses.get(ASAPMainHandler.BASE_TRANSMITHANDLER)
+        if not customRec:
+            return False
+        customModule, customClass = customRec
+        return (str(customModule).strip().split('.')[-1],
+                str(customClass).strip()) in cls.ALWAYS_PROCESSED_HANDLERS
+
+    def hasWork(self, contact, markedCounts):
+        """ True if the contact has anything to index, stage, transmit or delete.
+
+        :param ASAPContact contact:
+        :param dict[str, int] markedCounts: from getMarkedForDeletionCounts
+        :rtype: bool
+        """
+        if self.__hasFiles(contact.document_dir, '.TIF'):
+            return True
+        if self.__hasFiles(contact.index_dir, '.IDX'):
+            return True
+        if contact.xmit_dir:
+            if self.__hasFiles(contact.xmit_dir):
+                return True
+            for subdir in self.PENDING_XMIT_SUBDIRS:
+                if self.__hasFiles(os.path.join(contact.xmit_dir, subdir)):
+                    return True
+        if markedCounts.get(contact.contact_id):
+            return True
+        return self.__isAlwaysProcessed(contact)
+
+    def getContactsWithWork(self, contacts):
+        """ Return the contacts that have work, in the order given.
+
+        :param list[ASAPContact] contacts:
+        :rtype: list[ASAPContact]
+        """
+        self.__folders.clear()
+        try:
+            markedCounts = self.getMarkedForDeletionCounts()
+        except Exception:
+            # without the counts, process every contact
+            self.__logger.warn('Unable to count the files marked for deletion; processing all contacts:',
+                               exc_info=True)
+            return list(contacts)
+        contactsWithWork = [contact for contact in contacts if self.hasWork(contact, markedCounts)]
+        self.__logger.info('{count:d} of {total:d} contacts have work to process ({folders:d} folders scanned).'
+                           .format(count=len(contactsWithWork), total=len(contacts), folders=len(self.__folders)))
+        return contactsWithWork
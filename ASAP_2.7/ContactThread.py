@@ -25,11 +25,36 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-040
+          Load the transmit history of the cases to index in one query.
+
+      19-Oct-2026   ilsdev  user-041
+          Prefetch the index data for the cases to index.
+
+      19-Oct-2026   ilsdev  user-047
+          Report how many cases reused their indexes because the inputs had
+          not changed, and prune old index fingerprints.
+
+      19-Oct-2026   ilsdev  user-041
+          A failed batch read of the transmit history or index data is
+          logged, and the cases fall back to their own queries, instead of
+          stopping the contact's indexing and transmission.
+
+      19-Oct-2026   ilsdev  user-026
+          Let the index handler finish the work it postponed for the batch
+          (finishIndexBatch) once every case has been indexed.
+
+      19-Oct-2026   ilsdev  user-026
+          Bill the cases and add the 477 only after finishIndexBatch, and not
+          for the cases it failed for, so no case is reported as having images
+          available before its lab report is built.
 """
 
 import CRLUtility
 import threading
 from .MainHandler import ASAPMainHandler
+from .Utility import ASAP_UTILITY
 
 
 class ASAPContactThread(threading.Thread):
@@ -64,17 +89,63 @@ class ASAPContactThread(threading.Thread):
             if exportedCases:
                 self.__logger.info('For contact {contact_id!s:s}, there are {numCases:d} cases to index...'
                                    .format(contact_id=self.__contact.contact_id, numCases=len(exportedCases)))
+                # index handlers ask whether each case was transmitted before; if a batch
+                # read fails, the handlers read what is missing for each case themselves
+                try:
+                    ASAP_UTILITY.getDocumentHistory().loadTransmitHistory(exportedCases)
+                except Exception:
+                    self.__logger.warn('Unable to load the transmit history for contact {contact_id!s:s}; '
+                                       'reading it for each case instead:'
+                                       .format(contact_id=self.__contact.contact_id), exc_info=True)
+                try:
+                    ASAP_UTILITY.getIndexPrefetch().prefetch(exportedCases)
+                except Exception:
+                    self.__logger.warn('Unable to prefetch the index data for contact {contact_id!s:s}; '
+                                       'reading it for each case instead:'
+                                       .format(contact_id=self.__contact.contact_id), exc_info=True)
+                indexedCases = []
                 for exportedCase in exportedCases:
                     try:
-                        if self.__handler.buildIndexesForCase(exportedCase) and self.__handler.billCase(exportedCase):
+                        if self.__handler.buildIndexesForCase(exportedCase):
+                            indexedCases.append(exportedCase)
+                    except:
+                        fError = True
+                        self.__logger.error('Exception in thread building indexes for {contact_id!s:s}. Please correct so transmission can continue for case {sid!s:s}/{trackingId!s:s}.'
+                                            .format(contact_id=exportedCase.contact.contact_id, sid=exportedCase.sid, trackingId=exportedCase.trackingId))
+
+                        fError = self.__handler.getErrorState() or fError
+                # the index handler finishes the work it postponed (such as lab reports)
+                # before the cases are billed and reported as having images available
+                failedCases = []
+                try:
+                    if not self.__handler.finishIndexBatch(self.__contact, failedCases):
+                        fError = True
+                except Exception:
+                    fError = True
+                    self.__logger.error('Exception in thread finishing the indexes for {contact_id!s:s}; '
+                                        'not billing its cases:'
+                                        .format(contact_id=self.__contact.contact_id), exc_info=True)
+                    failedCases = indexedCases
+                for exportedCase in indexedCases:
+                    if exportedCase in failedCases:
+                        continue
+                    try:
+                        if self.__handler.billCase(exportedCase):
                             # add the 477 if indexing and billing are successful
                             self.__handler.addLIMSMessage(exportedCase, self.__handler.MSG_IMAGES_AVAILABLE)
                     except:
                         fError = True
-                        self.__logger.error('Exception in thread building indexes for {contact_id!s:s}. Please correct so transmission can continue for case {sid!s:s}/{trackingId!s:s}.'
+                        self.__logger.error('Exception in thread billing case {sid!s:s}/{trackingId!s:s} for {contact_id!s:s}.'
                                             .format(contact_id=exportedCase.contact.contact_id, sid=exportedCase.sid, trackingId=exportedCase.trackingId))
 
                         fError = self.__handler.getErrorState() or fError
+                iReused = len([exportedCase for exportedCase in exportedCases if exportedCase.indexReused])
+                if iReused:
+                    self.__logger.info('For contact {contact_id!s:s}, {numReused:d} of {numCases:d} cases were unchanged '
+                                       'and reused their indexes.'
+                                       .format(contact_id=self.__contact.contact_id, numReused=iReused,
+                                               numCases=len(exportedCases)))
+            ASAP_UTILITY.getIndexFingerprints().prune(self.__contact)
             # get indexed cases for contact and do transmit processing
             indexedCases = self.__handler.getIndexedCasesForContact(self.__contact)
             fError = self.__handler.getErrorState() or fError
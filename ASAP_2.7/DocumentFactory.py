@@ -28,6 +28,10 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-043
+          Added fromFileNames and fromDocumentIds, which read the Delta QC
+          fields for a batch of documents with grouped queries.
 """
 
 import CRLUtility
@@ -40,6 +44,9 @@ class ASAPDocumentFactory(object):
     This is a factory class for building ASAPDocument objects from
     key values.
     """
+    # pageids or documentids per query for the batch methods
+    BATCH_SIZE = 500
+
     def __init__(self, logger=None):
         self._xmitConfig = None
         if not logger:
@@ -168,6 +175,135 @@ class ASAPDocumentFactory(object):
             self.__logger.warn('No cursor for ILS_QC available.')
         return document
 
+    def __getPageCounts(self, cursor, docIds):
+        """
+        Return {documentid: page count} for the documents, with one grouped query.
+        """
+        pageCounts = {}
+        if docIds:
+            sQuery = '''
+                select documentid, count(*) from tblpages with (nolock)
+                where documentid in ({docids!s:s})
+                group by documentid
+                '''.format(docids=','.join(['{docid:d}'.format(docid=docId) for docId in docIds]))
+            cursor.execute(sQuery)
+            recs = cursor.fetch()
+            cursor.rollback()
+            for docId, pageCount in recs or []:
+                pageCounts[int(docId)] = pageCount
+        return pageCounts
+
+    def fromFileNames(self, fileNames):
+        """
+        Build ASAPDocument objects for a list of image document file names,
+        as fromFileName does, reading the Delta QC fields for BATCH_SIZE
+        files at a time.  Files that are not found are logged and left out.
+
+        :param list[str] fileNames:
+        :rtype: list[ASAPDocument]
+        """
+        documents = []
+        config = self.getXmitConfig()
+        cursor = config.getCursor(config.DB_NAME_DELTA_QC)
+        if not cursor:
+            self.__logger.warn('No cursor for ILS_QC available.')
+            return documents
+        pageFiles = []
+        for fileName in fileNames:
+            try:
+                pageFiles.append((int(fileName.split('.')[0]), fileName))
+            except:
+                self.__logger.warn(
+                    'File name %s is not in proper format.' % fileName)
+        for i in range(0, len(pageFiles), self.BATCH_SIZE):
+            chunk = pageFiles[i:i + self.BATCH_SIZE]
+            sQuery = '''
+                select p.pageid, d.documentid, d.documentdatecreated, dt.documenttypename
+                from tblpages p with (nolock)
+                inner join tbldocuments d with (nolock)
+                on p.documentid = d.documentid
+                inner join tbldocumenttypes dt with (nolock)
+                on d.documenttypeid = dt.documenttypeid
+                where p.pageid in ({pageIds!s:s}) and p.pagesequence =
+                (select min(p2.pagesequence) from tblpages p2 with (nolock)
+                where p2.documentid = p.documentid)
+                '''.format(pageIds=','.join(['{pageId:d}'.format(pageId=pageId) for pageId, fileName in chunk]))
+            cursor.execute(sQuery)
+            recs = cursor.fetch()
+            cursor.rollback()
+            docRecs = {}
+            for pageId, docid, datecreated, typename in recs or []:
+                docRecs[int(pageId)] = (docid, datecreated, typename)
+            pageCounts = self.__getPageCounts(cursor, sorted(set([int(docRec[0]) for docRec in docRecs.values()])))
+            for pageId, fileName in chunk:
+                docRec = docRecs.get(pageId)
+                if docRec:
+                    docid, datecreated, typename = docRec
+                    document = ASAPDocument()
+                    document.fileName = fileName
+                    document.setDocumentId(docid)
+                    document.setDocTypeName(typename)
+                    if datecreated:
+                        document.setDateCreated(datecreated)
+                    if document.getDocumentId() in pageCounts:
+                        document.pageCount = pageCounts[document.getDocumentId()]
+                    documents.append(document)
+                else:
+                    self.__logger.warn(
+                        'Document for file {fileName!s:s} does not exist in ILS_QC drawer.'.format(fileName=fileName))
+        return documents
+
+    def fromDocumentIds(self, docIds):
+        """
+        Build ASAPDocument objects for a list of docids, as fromDocumentId
+        does, reading the Delta QC fields for BATCH_SIZE documents at a
+        time.  Returns a dictionary keyed by documentid; docids that are
+        not found are logged and left out.
+
+        :param list[int] docIds:
+        :rtype: dict[int, ASAPDocument]
+        """
+        documents = {}
+        config = self.getXmitConfig()
+        cursor = config.getCursor(config.DB_NAME_DELTA_QC)
+        if not cursor:
+            self.__logger.warn('No cursor for ILS_QC available.')
+            return documents
+        docIds = sorted(set([int(docId) for docId in docIds]))
+        for i in range(0, len(docIds), self.BATCH_SIZE):
+            chunk = docIds[i:i + self.BATCH_SIZE]
+            sQuery = '''
+                select p.documentid, p.pagefilename, d.documentdatecreated, dt.documenttypename
+                from tblpages p with (nolock)
+                inner join tbldocuments d with (nolock) on p.documentid = d.documentid
+                inner join tbldocumenttypes dt with (nolock) on d.documenttypeid = dt.documenttypeid
+                where p.documentid in ({docids!s:s})
+                and p.pagesequence = (select min(p2.pagesequence)
+                                      from tblpages p2 with (nolock)
+                                      where p2.documentid = p.documentid)
+                '''.format(docids=','.join(['{docid:d}'.format(docid=docId) for docId in chunk]))
+            cursor.execute(sQuery)
+            recs = cursor.fetch()
+            cursor.rollback()
+            pageCounts = self.__getPageCounts(cursor, chunk)
+            for docid, filename, datecreated, typename in recs or []:
+                document = ASAPDocument()
+                document.setDocumentId(docid)
+                if document.getDocumentId() in documents:
+                    continue
+                document.fileName = filename.lstrip('0')
+                document.setDocTypeName(typename)
+                if datecreated:
+                    document.setDateCreated(datecreated)
+                if document.getDocumentId() in pageCounts:
+                    document.pageCount = pageCounts[document.getDocumentId()]
+                documents[document.getDocumentId()] = document
+            for docId in chunk:
+                if docId not in documents:
+                    self.__logger.warn(
+                        'Docid {docid:d} does not exist in ILS_QC drawer.'.format(docid=docId))
+        return documents
+
     def documentsFromSid(self, sid):
         """
         Given a sid, return a list of ASAPDocument objects for that sid.
@@ -189,8 +325,9 @@ class ASAPDocumentFactory(object):
             docIds = cursor.fetch()
             cursor.rollback()
             if docIds:
+                docDict = self.fromDocumentIds([docId for docId, in docIds])
                 for docId, in docIds:
-                    document = self.fromDocumentId(docId)
+                    document = docDict.get(int(docId))
                     if document:
                         documents.append(document)
             else:
@@ -25,6 +25,15 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-040
+          Transmit history is kept on the case.  Added loadTransmitHistory to
+          read it for a batch of cases in one grouped query, and
+          isFirstTransmit/isFullTransmit for the handlers.
+
+      19-Oct-2026   ilsdev  user-040
+          loadTransmitHistory matches the rows to the cases by stripped sid,
+          as ASAPIndexPrefetch does.
 """
 
 import CRLUtility
@@ -47,6 +56,8 @@ class ASAPDocumentHistory(object):
     ACTION_INVOICE = 'invoice'
     ACTION_TRANSMIT = 'transmit'
     ACTION_RECONCILE = 'reconcile'
+    # sids per query when loading history for a batch of cases
+    BATCH_SIZE = 500
 
     def __init__(self, logger=None):
         self._xmitConfig = None
@@ -102,6 +113,9 @@ class ASAPDocumentHistory(object):
                 else:
                     self.__logger.warn("Tried insert query {totalAttempts:d} times and failed: {sInsert!s:s}"
                                        .format(totalAttempts=totalAttempts, sInsert=sInsert))
+        if actionItem == self.ACTION_TRANSMIT:
+            # the case's transmit history is out of date now
+            asapDocument.case.transmitHistory = None
         return fSuccess
 
     def getDateTracked(self, asapDocument, actionItem):
@@ -166,3 +180,83 @@ class ASAPDocumentHistory(object):
             for docid, dateVal in recs:
                 docid_dates.append((docid, dateVal))
         return docid_dates
+
+    def loadTransmitHistory(self, asapCases):
+        """
+        Read the transmit history of every case in the list that does not
+        have it yet, with one grouped query per contact (and per BATCH_SIZE
+        cases), and store it on each case.
+
+        :param list[ASAPCase] asapCases:
+        """
+        casesByContact = {}
+        for asapCase in asapCases:
+            if asapCase.transmitHistory is None and asapCase.contact:
+                # sids are compared stripped, as the database may return them padded
+                casesByContact.setdefault(asapCase.contact.contact_id, {}).setdefault(
+                    str(asapCase.sid).strip(), []).append(asapCase)
+        if not casesByContact:
+            return
+        xmitConfig = self.getXmitConfig()
+        cursor = xmitConfig.getCursor(xmitConfig.DB_NAME_XMIT)
+        for contactId, casesBySid in casesByContact.items():
+            sids = sorted(casesBySid.keys())
+            historyBySid = {}
+            for i in range(0, len(sids), self.BATCH_SIZE):
+                sQuery = '''
+                    select sid, documentid, max(actiondate)
+                    from {table!s:s} with (nolock)
+                    where sid in ({sids!s:s})
+                    and contact_id = '{contact!s:s}'
+                    and actionitem = '{action!s:s}'
+                    group by sid, documentid
+                    order by sid, documentid
+                    '''.format(table=self.TABLE_DOCUMENT_HISTORY,
+                               sids=', '.join(["'{sid!s:s}'".format(sid=sid) for sid in sids[i:i + self.BATCH_SIZE]]),
+                               contact=contactId,
+                               action=self.ACTION_TRANSMIT)
+                cursor.execute(sQuery)
+                recs = cursor.fetch()
+                cursor.rollback()
+                for sid, docid, dateVal in recs or []:
+                    historyBySid.setdefault(str(sid).strip(), []).append((docid, dateVal))
+            for sid, cases in casesBySid.items():
+                for asapCase in cases:
+                    asapCase.transmitHistory = list(historyBySid.get(sid, []))
+        self.__logger.debug('Loaded transmit history for {count:d} cases.'
+                            .format(count=sum([len(casesBySid) for casesBySid in casesByContact.values()])))
+
+    def getTransmitHistory(self, asapCase):
+        """
+        Return the case's transmit history as (documentid, actiondate)
+        tuples, reading it only if it is not already on the case.
+
+        :param ASAPCase asapCase:
+        :rtype: list[(int, datetime.datetime)]
+        """
+        if asapCase.transmitHistory is None:
+            asapCase.transmitHistory = self.getTrackedDocidsForCase(asapCase, self.ACTION_TRANSMIT)
+        return asapCase.transmitHistory
+
+    def isFirstTransmit(self, asapCase):
+        """
+        Check if the case is being transmitted for the first time.
+
+        :param ASAPCase asapCase:
+        :rtype: bool
+        """
+        return not self.getTransmitHistory(asapCase)
+
+    def isFullTransmit(self, asapCase):
+        """
+        Check if the entire case is being transmitted.
+
+        :param ASAPCase asapCase:
+        :rtype: bool
+        """
+        xmitDocids = [docid for docid, auditstamp in self.getTransmitHistory(asapCase)]
+        docids = list(asapCase.getDocuments().keys())
+        for docid in docids:
+            if docid in xmitDocids:
+                xmitDocids.remove(docid)
+        return not xmitDocids
@@ -0,0 +1,306 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      FileContentStore
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the content backends for ASAPFileManager.  The
+      ASAPFileContentStore class defines the interface; ASAPLocalContentStore
+      keeps file bodies in a local folder, addressed by their SHA-1 hash, so
+      the asap_file_manager table only holds the hash and size.  Reads and
+      writes are streamed in chunks, so large files are never held in memory.
+      ASAPFileManager.purgeNullFiles removes a body once no row refers to
+      its hash.  Storing a body that is already there marks it as used, and
+      remove leaves bodies used within minAge seconds, so a body that is
+      being stored again for a new row is not removed before the row is
+      added.
+
+      Also included is the ASAPSqliteCursor class, which gives a sqlite
+      database the cursor interface the ASAP classes use, along with
+      createFileManagerSchema.  Together with ASAPLocalContentStore they
+      stand in for SQL Server when running ASAPFileManager outside of the
+      production environment.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-033
+          Added remove, for the purge to delete bodies no row refers to.
+
+      19-Oct-2026   ilsdev  user-033
+          A content file stored by another thread or process while the same
+          content was being written is used, rather than failing the rename.
+
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+
+class ASAPFileContentStore(object):
+    """
+    Interface for a store of file bodies, addressed by content hash.
+    """
+
+    def put(self, content):
+        """ Store content and return (contentHash, contentSize).
+
+        :param str content:
+        :rtype: tuple[str, int]
+        """
+        raise NotImplementedError
+
+    def putFile(self, filePath):
+        """ Store the body of a file and return (contentHash, contentSize).
+
+        :param str filePath:
+        :rtype: tuple[str, int]
+        """
+        raise NotImplementedError
+
+    def read(self, contentHash):
+        """ Return the content stored under contentHash ('' if there is none).
+
+        :param str contentHash:
+        :rtype: str
+        """
+        raise NotImplementedError
+
+    def copyTo(self, contentHash, filePath):
+        """ Write the content stored under contentHash to filePath.
+        Return True if the content was found.
+
+        :param str contentHash:
+        :param str filePath:
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def exists(self, contentHash):
+        raise NotImplementedError
+
+    def remove(self, contentHash, minAge=0):
+        """ Remove the content stored under contentHash, unless it was stored
+        (or stored again) in the last minAge seconds.  Return True if it was removed.
+
+        :param str contentHash:
+        :param float minAge:
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+
+class ASAPLocalContentStore(ASAPFileContentStore):
+    """
+    Content-addressed store in a local folder.  Each body is kept once,
+    as <rootDir>/<hash[:2]>/<hash[2:4]>/<hash>, so identical files share
+    storage.
+    """
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, rootDir, chunkSize=DEFAULT_CHUNK_SIZE):
+        """
+
+        :param str rootDir:
+        :param int chunkSize: bytes read or written at a time
+        """
+        self.__rootDir = rootDir
+        self.__chunkSize = max(1, int(chunkSize))
+
+    def getRootDir(self):
+        return self.__rootDir
+
+    def getPath(self, contentHash):
+        """
+        Return the path where the content for contentHash is kept.
+        """
+        return os.path.join(self.__rootDir, contentHash[:2], contentHash[2:4], contentHash)
+
+    def __getTempPath(self):
+        return os.path.join(self.__rootDir, 'tmp.{pid:d}.{tid:d}'.format(
+            pid=os.getpid(), tid=threading.current_thread().ident or 0))
+
+    def __store(self, chunks):
+        """
+        Write chunks to a temporary file while hashing them, then move the
+        file into place under its hash.
+        """
+        if not os.path.isdir(self.__rootDir):
+            os.makedirs(self.__rootDir)
+        tmpPath = self.__getTempPath()
+        digest = hashlib.sha1()
+        contentSize = 0
+        ptr = open(tmpPath, 'wb')
+        try:
+            for chunk in chunks:
+                digest.update(chunk)
+                contentSize += len(chunk)
+                ptr.write(chunk)
+        finally:
+            ptr.close()
+        contentHash = digest.hexdigest()
+        finalPath = self.getPath(contentHash)
+        fStored = False
+        if os.path.isfile(finalPath):
+            try:
+                # already stored by an earlier file with the same content; mark
+                # it as used so the purge does not remove it before the new row is added
+                os.utime(finalPath, None)
+                fStored = True
+            except OSError:
+                # removed meanwhile by the purge, so store it again
+                pass
+        if fStored:
+            os.remove(tmpPath)
+        else:
+            finalDir = os.path.dirname(finalPath)
+            if not os.path.isdir(finalDir):
+                try:
+                    os.makedirs(finalDir)
+                except OSError:
+                    # created meanwhile by another thread or process
+                    if not os.path.isdir(finalDir):
+                        raise
+            try:
+                os.rename(tmpPath, finalPath)
+            except OSError:
+                # on Windows the rename fails if another thread or process has
+                # just stored the same content; that copy is used instead
+                if not os.path.isfile(finalPath):
+                    raise
+                os.remove(tmpPath)
+        return contentHash, contentSize
+
+    def __readChunks(self, ptr):
+        while True:
+            chunk = ptr.read(self.__chunkSize)
+            if not chunk:
+                break
+            yield chunk
+
+    def put(self, content):
+        if not isinstance(content, bytes):
+            content = content.encode('latin-1')
+        return self.__store(content[start:start + self.__chunkSize]
+                            for start in range(0, len(content), self.__chunkSize))
+
+    def putFile(self, filePath):
+        ptr = open(filePath, 'rb')
+        try:
+            return self.__store(self.__readChunks(ptr))
+        finally:
+            ptr.close()
+
+    def read(self, contentHash):
+        path = self.getPath(contentHash)
+        if not os.path.isfile(path):
+            return ''
+        ptr = open(path, 'rb')
+        try:
+            return ptr.read()
+        finally:
+            ptr.close()
+
+    def copyTo(self, contentHash, filePath):
+        path = self.getPath(contentHash)
+        if not os.path.isfile(path):
+            return False
+        src = open(path, 'rb')
+        try:
+            dest = open(filePath, 'wb')
+            try:
+                shutil.copyfileobj(src, dest, self.__chunkSize)
+            finally:
+                dest.close()
+        finally:
+            src.close()
+        return True
+
+    def exists(self, contentHash):
+        return os.path.isfile(self.getPath(contentHash))
+
+    def remove(self, contentHash, minAge=0):
+        path = self.getPath(contentHash)
+        try:
+            if minAge and os.path.getmtime(path) > time.time() - minAge:
+                return False
+            os.remove(path)
+        except OSError:
+            # already removed
+            return False
+        return True
+
+
+class ASAPSqliteCursor(object):
+    """
+    Wraps a sqlite3 connection with the cursor interface of CRLDBCursor
+    (execute returning the row count, fetch, commit, rollback), and drops
+    the SQL Server table hints that sqlite does not understand.
+    """
+    _RE_NOLOCK = re.compile(r'\s+with\s*\(\s*nolock\s*\)', re.IGNORECASE)
+
+    def __init__(self, dbPath):
+        import sqlite3
+        self.__conn = sqlite3.connect(dbPath, check_same_thread=False)
+        self.__cursor = self.__conn.cursor()
+
+    def execute(self, sQuery):
+        self.__cursor.execute(self._RE_NOLOCK.sub('', sQuery))
+        return self.__cursor.rowcount
+
+    def fetch(self, fSingle=False):
+        if fSingle:
+            return self.__cursor.fetchone()
+        return self.__cursor.fetchall()
+
+    def commit(self):
+        self.__conn.commit()
+
+    def rollback(self):
+        self.__conn.rollback()
+
+    def close(self):
+        self.__conn.close()
+
+
+def createFileManagerSchema(cursor):
+    """ Create the asap_file_state and asap_file_manager tables used by
+    ASAPFileManager, with the file states it expects.
+
+    :param ASAPSqliteCursor cursor:
+    """
+    cursor.execute('''
+        create table if not exists asap_file_state (
+            state_id integer primary key,
+            state_value varchar(50) not null)
+        ''')
+    cursor.execute('''
+        create table if not exists asap_file_manager (
+            id integer primary key autoincrement,
+            state_id integer not null,
+            contact_id varchar(50) not null,
+            file_name varchar(255) not null,
+            contact_path varchar(255),
+            file_content text,
+            content_hash varchar(40),
+            content_size integer)
+        ''')
+    cursor.execute('''
+        insert or ignore into asap_file_state (state_id, state_value)
+        values (1, 'MARKED_FOR_DELETION')
+        ''')
+    cursor.commit()
@@ -24,13 +24,39 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-032
+          glob looks up the files marked for deletion with one query for all
+          matched folders instead of one query per file, and can cache its
+          listing for the run (fCache).
+
+      19-Oct-2026   ilsdev  user-033
+          File bodies can be kept in a content store (ASAPLocalContentStore when
+          the file_content_dir setting is present), with only content_hash and
+          content_size in the table.  The cursor and content store can be
+          passed in, so a sqlite database can stand in for SQL Server.
+
+      19-Oct-2026   ilsdev  user-034
+          purgeNullFiles works through the table in bounded batches of ids,
+          starting from the mark saved in the file_purge_mark setting, and can
+          run on a background thread (purgeNullFilesInBackground).
+
+      19-Oct-2026   ilsdev  user-033
+          purgeNullFiles removes the bodies in the content store that no row
+          refers to once their rows are deleted.
+
+      19-Oct-2026   ilsdev  user-034
+          Each purge range starts at the lowest null id after the mark, and
+          the mark starts over from the lowest null id instead of from 0.
 """
 
 import base64
 import glob
 import os
+import threading
 
 from .Contact import ASAPContact
+from .FileContentStore import ASAPFileContentStore, ASAPLocalContentStore
 import CRLUtility
 
 
@@ -75,18 +101,33 @@ class ASAPFile(object):
 
 
 class ASAPFileManager(object):
+    # ids covered by each purge batch, and the batches done per call of purgeNullFiles
+    PURGE_BATCH_SIZE = 5000
+    PURGE_MAX_BATCHES = 20
+    # content hashes checked per query when the purge removes unreferenced bodies,
+    # and the seconds a body is kept after it was last stored (see ASAPFileContentStore.remove)
+    PURGE_HASH_BATCH_SIZE = 500
+    PURGE_CONTENT_MIN_AGE = 60 * 60
 
-    def __init__(self, asapContact=None):
+    def __init__(self, asapContact=None, cursor=None, contentStore=None):
         """
 
         :param ASAPContact|None asapContact:
+        :param cursor: cursor for the asap_file_manager table (default is the xmit database)
+        :param ASAPFileContentStore|None contentStore: store for file bodies
+               (default comes from the file_content_dir setting, else the table itself)
         """
         self.__asapContact = asapContact
         self.__xmitConfig = None
-        self.__cursor = None
+        self.__cursor = cursor
+        self.__fOwnCursor = cursor is not None
+        self.__contentStore = contentStore
+        self.__fContentStoreChecked = contentStore is not None
         # self.__xmitConfig = ASAP_UTILITY.getXmitConfig()
         # self.__cursor = self.__xmitConfig.getCursor(self.__xmitConfig.DB_NAME_XMIT)
         self.__stateMap = {}
+        # glob listings kept when glob is called with fCache, keyed by pattern
+        self.__globCache = {}
         self.refreshStates()
 
     def getCursor(self):
@@ -101,6 +142,20 @@ class ASAPFileManager(object):
             self.__xmitConfig = ASAP_UTILITY.getXmitConfig()
         return self.__xmitConfig
 
+    def getContentStore(self):
+        """ Return the store that holds file bodies, or None if they are
+        kept base64-encoded in the file_content column.
+
+        :rtype: ASAPFileContentStore|None
+        """
+        if not self.__fContentStoreChecked:
+            xmitConfig = self.getXmitConfig()
+            contentDir = xmitConfig.getSetting(xmitConfig.SETTING_FILE_CONTENT_DIR)
+            if contentDir:
+                self.__contentStore = ASAPLocalContentStore(contentDir)
+            self.__fContentStoreChecked = True
+        return self.__contentStore
+
     def refreshStates(self):
         self.__stateMap.clear()
         cursor = self.getCursor()
@@ -154,10 +209,20 @@ class ASAPFileManager(object):
         :param ASAPFile asapFile:
         :param bool fUploadContent:
         """
-        fileContent = ''
-        if fUploadContent:
-            fileContent = self.uploadContent(asapFile)
-        self.addFileWithContent(asapFile, fileContent)
+        store = self.getContentStore()
+        if fUploadContent and store:
+            # stream the file into the store rather than reading it into memory
+            contentHash = None
+            contentSize = 0
+            fullPath = asapFile.getFullPath()
+            if fullPath and os.path.isfile(fullPath):
+                contentHash, contentSize = store.putFile(fullPath)
+            self.__insertFile(asapFile, contentHash=contentHash, contentSize=contentSize)
+        else:
+            fileContent = ''
+            if fUploadContent:
+                fileContent = self.uploadContent(asapFile)
+            self.addFileWithContent(asapFile, fileContent)
 
     def addFileWithContent(self, asapFile, fileContent):
         """
@@ -165,6 +230,18 @@ class ASAPFileManager(object):
         :param ASAPFile asapFile:
         :param str fileContent:
         """
+        store = self.getContentStore()
+        if fileContent and store:
+            contentHash, contentSize = store.put(fileContent)
+            self.__insertFile(asapFile, contentHash=contentHash, contentSize=contentSize)
+        else:
+            self.__insertFile(asapFile, fileContent=fileContent)
+
+    def __insertFile(self, asapFile, fileContent='', contentHash=None, contentSize=0):
+        """
+        Insert a row for the file, with either its content (base64-encoded)
+        or the hash and size of its content in the content store.
+        """
         if asapFile.asapContact.contact_id == self.__asapContact.contact_id:
             stateId = self.getStateId(asapFile.state)
             if not stateId:
@@ -178,14 +255,20 @@ class ASAPFileManager(object):
             content64 = "null"
             if fileContent:
                 content64 = "'{fileContent!s:s}'".format(fileContent=base64.encodestring(fileContent))
+            fieldNames = 'state_id, contact_id, file_name, contact_path, file_content'
             fieldList = [stateId, contact_id, fileName, contactPath, content64]
+            if contentHash:
+                fieldNames += ', content_hash, content_size'
+                fieldList += ["'{contentHash!s:s}'".format(contentHash=contentHash),
+                              "{contentSize:d}".format(contentSize=contentSize)]
             cursor = self.getCursor()
             cursor.execute('''
                 insert into asap_file_manager
-                (state_id, contact_id, file_name, contact_path, file_content)
+                ({fieldNames!s:s})
                 values ({fieldList!s:s})
-                '''.format(fieldList=','.join(fieldList)))
+                '''.format(fieldNames=fieldNames, fieldList=','.join(fieldList)))
             cursor.commit()
+            self.clearGlobCache()
         else:
             raise Exception("ASAPFile contact doesn't match ASAPFileManager contact.")
 
@@ -203,14 +286,152 @@ class ASAPFileManager(object):
             '''.format(stateId=self.getStateId(asapFile.state),
                        fileId=asapFile.fileId))
         cursor.commit()
-
-    def purgeNullFiles(self):
+        self.clearGlobCache()
+
+    def purgeNullFiles(self, batchSize=PURGE_BATCH_SIZE, maxBatches=PURGE_MAX_BATCHES):
+        """ Delete rows in the null state, one range of ids at a time.  Each
+        range starts at the lowest null id after the last id covered (saved
+        in the file_purge_mark setting), so ranges without null rows are
+        skipped.  Once there are no null rows after the mark, the next call
+        starts over from the lowest null id, since older rows can be set to
+        the null state at any time.  At most maxBatches ranges of batchSize
+        ids are covered per call (all of them if maxBatches is None).  The
+        bodies of the deleted rows in the content store are removed if no
+        other row refers to them.
+
+        :param int batchSize:
+        :param int|None maxBatches:
+        :returns: number of rows deleted
+        :rtype: int
+        """
+        xmitConfig = self.getXmitConfig()
+        cursor = self.getCursor()
+        stateId = self.getStateId(ASAPFile.STATE_NULL_STATE)
+        try:
+            mark = int(xmitConfig.getSetting(xmitConfig.SETTING_FILE_PURGE_MARK) or 0)
+        except ValueError:
+            mark = 0
+        iDeleted = 0
+        iBatches = 0
+        while maxBatches is None or iBatches < maxBatches:
+            # the lowest null id after the mark
+            cursor.execute('''
+                select min(id)
+                from asap_file_manager with (nolock)
+                where state_id = {stateId:d}
+                and id > {mark:d}
+                '''.format(stateId=stateId, mark=mark))
+            rec = cursor.fetch(True)
+            cursor.rollback()
+            if not rec or rec[0] is None:
+                # no null rows after the mark, so start from the lowest one next time
+                if mark:
+                    xmitConfig.setSetting(xmitConfig.SETTING_FILE_PURGE_MARK, 0, cursor)
+                break
+            lowId = int(rec[0]) - 1
+            # the highest id in the range of batchSize rows from there
+            cursor.execute('''
+                select max(id) from (
+                    select top {batchSize:d} id
+                    from asap_file_manager with (nolock)
+                    where id > {lowId:d}
+                    order by id) ids
+                '''.format(batchSize=batchSize, lowId=lowId))
+            rec = cursor.fetch(True)
+            cursor.rollback()
+            highId = int(rec[0])
+            contentHashes = self.__getNullContentHashes(stateId, lowId, highId)
+            iDeleted += cursor.execute('''
+                delete from asap_file_manager
+                where state_id = {stateId:d}
+                and id > {lowId:d} and id <= {highId:d}
+                '''.format(stateId=stateId, lowId=lowId, highId=highId)) or 0
+            cursor.commit()
+            if contentHashes:
+                self.__removeUnreferencedContent(contentHashes)
+            mark = highId
+            xmitConfig.setSetting(xmitConfig.SETTING_FILE_PURGE_MARK, mark, cursor)
+            iBatches += 1
+        if iDeleted:
+            self.clearGlobCache()
+        return iDeleted
+
+    def __getNullContentHashes(self, stateId, lowId, highId):
+        """
+        Return the content hashes of the null rows with ids in (lowId, highId],
+        if the file bodies are in a content store.
+        """
+        if not self.getContentStore():
+            return []
         cursor = self.getCursor()
         cursor.execute('''
-            delete from asap_file_manager
+            select distinct content_hash
+            from asap_file_manager with (nolock)
             where state_id = {stateId:d}
-            '''.format(stateId=self.getStateId(ASAPFile.STATE_NULL_STATE)))
-        cursor.commit()
+            and id > {lowId:d} and id <= {highId:d}
+            and content_hash is not null
+            '''.format(stateId=stateId, lowId=lowId, highId=highId))
+        recs = cursor.fetch()
+        cursor.rollback()
+        return [contentHash for contentHash, in recs or []]
+
+    def __removeUnreferencedContent(self, contentHashes):
+        """
+        Remove the bodies of contentHashes from the content store that no
+        row refers to.  Return the number removed.
+        """
+        store = self.getContentStore()
+        cursor = self.getCursor()
+        iRemoved = 0
+        for start in range(0, len(contentHashes), self.PURGE_HASH_BATCH_SIZE):
+            chunk = contentHashes[start:start + self.PURGE_HASH_BATCH_SIZE]
+            cursor.execute('''
+                select distinct content_hash
+                from asap_file_manager with (nolock)
+                where content_hash in ({contentHashes!s:s})
+                '''.format(contentHashes=', '.join(["'{contentHash!s:s}'".format(contentHash=contentHash)
+                                                    for contentHash in chunk])))
+            recs = cursor.fetch()
+            cursor.rollback()
+            referenced = set([contentHash for contentHash, in recs or []])
+            for contentHash in chunk:
+                if contentHash not in referenced and store.remove(contentHash, self.PURGE_CONTENT_MIN_AGE):
+                    iRemoved += 1
+        return iRemoved
+
+    def purgeNullFilesInBackground(self, batchSize=PURGE_BATCH_SIZE, maxBatches=PURGE_MAX_BATCHES, logger=None):
+        """ Run purgeNullFiles on a new thread with its own database
+        connection, and return the started thread so the caller can join it.
+
+        :param int batchSize:
+        :param int|None maxBatches:
+        :param logger:
+        :rtype: threading.Thread
+        """
+        if not logger:
+            logger = CRLUtility.CRLGetLogger()
+        xmitConfig = self.getXmitConfig()
+
+        def purge():
+            cursor = None
+            try:
+                cursor = xmitConfig.newCursor(xmitConfig.DB_NAME_XMIT)
+                iDeleted = ASAPFileManager(self.__asapContact, cursor, self.getContentStore()).purgeNullFiles(
+                    batchSize, maxBatches)
+                logger.info('Purged {count:d} null file records.'.format(count=iDeleted))
+            except Exception:
+                logger.warn('Failed to purge null file records:', exc_info=True)
+            finally:
+                if cursor:
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+
+        thread = threading.Thread(target=purge, name='ASAPFilePurge')
+        thread.daemon = True
+        thread.start()
+        return thread
 
     def getMarkedForDeletionId(self, asapFile):
         """
@@ -261,6 +482,7 @@ class ASAPFileManager(object):
                 self.setNullState(asapFile)
         else:
             self.addFile(asapFile)
+        self.clearGlobCache()
 
     def moveFile(self, asapFile, sFullDestPath):
         """
@@ -270,6 +492,7 @@ class ASAPFileManager(object):
         """
         destAsapFile = self.newFile(sFullDestPath, True)
         CRLUtility.CRLCopyFile(asapFile.getFullPath(), destAsapFile.getFullPath(), False, 5)
+        self.clearGlobCache()
         self.deleteFile(asapFile)
         return destAsapFile
 
@@ -327,21 +550,98 @@ class ASAPFileManager(object):
                 asapFiles.append(asapFile)
         return asapFiles
 
-    def glob(self, filePattern):
+    def getMarkedForDeletionIds(self, contactPaths):
+        """ Return the ids of all files marked for deletion in the given
+        contact paths, with one query.  Keys are (contact path, file name)
+        in upper case, since the database compares them without case.
+
+        :param list[str] contactPaths:
+        :rtype: dict[tuple[str, str], int]
         """
+        idMap = {}
+        contactPaths = sorted(set(contactPaths))
+        if contactPaths:
+            cursor = self.getCursor()
+            cursor.execute('''
+                select m.id, m.contact_path, m.file_name
+                from asap_file_manager m with (nolock),
+                asap_file_state s with (nolock)
+                where m.state_id = s.state_id
+                and s.state_value = '{state!s:s}'
+                and m.contact_id = '{contact_id!s:s}'
+                and m.contact_path in ({contactPaths!s:s})
+                '''.format(state=ASAPFile.STATE_MARKED_FOR_DELETION,
+                           contact_id=self.__asapContact.contact_id,
+                           contactPaths=','.join("'{path!s:s}'".format(path=path) for path in contactPaths)))
+            recs = cursor.fetch()
+            cursor.rollback()
+            if recs:
+                for fileId, contactPath, fileName in recs:
+                    # keep the first id found, as getMarkedForDeletionId does
+                    idMap.setdefault((contactPath.upper(), fileName.upper()), fileId)
+        return idMap
+
+    def clearGlobCache(self):
+        """
+        Drop any listings cached by glob.
+        """
+        self.__globCache.clear()
+
+    def glob(self, filePattern, fCache=False):
+        """ Return the files matching filePattern that are not marked for
+        deletion.  With fCache, the listing is kept and reused by later calls
+        with the same pattern until a file is added, deleted or moved through
+        this file manager (or clearGlobCache is called); only use it where no
+        other code changes the folder during the run.
 
         :param filePattern:
+        :param bool fCache:
         :rtype: list[ASAPFile]
         """
+        cacheKey = os.path.normcase(filePattern)
+        listing = None
+        if fCache:
+            listing = self.__globCache.get(cacheKey)
+        if listing is None:
+            files = glob.glob(filePattern)
+            asapFiles = [self.newFile(fullPath, True) for fullPath in files]
+            idMap = self.getMarkedForDeletionIds([asapFile.contactPath for asapFile in asapFiles])
+            listing = [(fullPath, idMap.get((asapFile.contactPath.upper(), asapFile.fileName.upper()), 0))
+                       for fullPath, asapFile in zip(files, asapFiles)]
+            if fCache:
+                self.__globCache[cacheKey] = listing
         asapFiles = []
-        files = glob.glob(filePattern)
-        for fullPath in files:
-            asapFile = self.newFile(fullPath, True)
-            asapFile.fileId = self.getMarkedForDeletionId(asapFile)
-            if not asapFile.fileId:
-                asapFiles.append(asapFile)
+        for fullPath, fileId in listing:
+            if not fileId:
+                asapFiles.append(self.newFile(fullPath, True))
         return asapFiles
 
+    def __getContentRecord(self, asapFile):
+        """
+        Return (file_content, content_hash) for the file's row, or None.
+        """
+        if self.getContentStore():
+            sColumns = 'file_content, content_hash'
+        else:
+            sColumns = 'file_content, null'
+        sQuery = '''
+            select {columns!s:s}
+            from asap_file_manager with (nolock)
+            where id = {fileId:d}
+            '''.format(columns=sColumns, fileId=asapFile.fileId)
+        if self.__fOwnCursor:
+            cursor = self.getCursor()
+        else:
+            # reading the file_content field needs a fresh connection to the xmit database
+            xmitConfig = self.getXmitConfig()
+            cursor = xmitConfig.reconnect(xmitConfig.DB_NAME_XMIT)
+            # the cursor held before was closed by reconnect
+            self.__cursor = None
+        cursor.execute(sQuery)
+        rec = cursor.fetch(True)
+        cursor.rollback()
+        return rec
+
     def getContent(self, asapFile):
         """
 
@@ -349,18 +649,13 @@ class ASAPFileManager(object):
         :rtype: str
         """
         content = ''
-        xmitConfig = self.getXmitConfig()
-        cursor = xmitConfig.reconnect(xmitConfig.DB_NAME_XMIT)
-        cursor.execute('''
-            select id, file_content
-            from asap_file_manager with (nolock)
-            where id = {fileId:d}
-            '''.format(fileId=asapFile.fileId))
-        recs = cursor.fetch()
-        cursor.rollback()
-        if recs:
-            fileId, content64 = recs[0]
-            content = base64.decodestring(content64)
+        rec = self.__getContentRecord(asapFile)
+        if rec:
+            content64, contentHash = rec
+            if contentHash:
+                content = self.getContentStore().read(contentHash)
+            elif content64:
+                content = base64.decodestring(content64)
         return content
 
     def writeFile(self, asapFile):
@@ -369,8 +664,15 @@ class ASAPFileManager(object):
         :param ASAPFile asapFile:
         """
         fullPath = asapFile.getFullPath()
-        content = self.getContent(asapFile)
-        if fullPath and os.path.exists(os.path.dirname(fullPath)) and content:
-            ptr = open(fullPath, 'wb')
-            ptr.write(content)
-            ptr.close()
+        if not fullPath or not os.path.exists(os.path.dirname(fullPath)):
+            return
+        rec = self.__getContentRecord(asapFile)
+        if rec:
+            content64, contentHash = rec
+            if contentHash:
+                # stream from the store straight to the file
+                self.getContentStore().copyTo(contentHash, fullPath)
+            elif content64:
+                ptr = open(fullPath, 'wb')
+                ptr.write(base64.decodestring(content64))
+                ptr.close()
@@ -19,16 +19,21 @@
       25-Oct-2012
 
   Modification History:
-      
+      19-Oct-2026   ilsdev  user-037
+          Write the sent-folder archive in one pass with ASAPZipBuilder.
+
+      19-Oct-2026   ilsdev  user-049
+          Remove the unused AcordXML import.
+
 """
 from ILS import ASAP
-from ILS                        import AcordXML
 from ILS.ASAP.CaseFactory       import ASAPCaseFactory
 from ILS.ASAP.DocumentFactory   import ASAPDocumentFactory
 from ILS.ASAP.DocumentHistory   import ASAPDocumentHistory
 from ILS.ASAP.IndexHandler      import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler   import ASAPTransmitHandler
 from ILS.ASAP.FileManager       import ASAPFileManager
+from ILS.ASAP.ZipBuilder        import ASAPZipBuilder
 import CRLUtility
 import datetime
 import glob
@@ -181,6 +186,9 @@ class GEFTransmitHandler( ASAPTransmitHandler ):
                 work_path = r'\\ntsys1\ils_appl\data\XMIT\FTP\GEF0009\Test\Work'
             else:
                 work_path = r'\\ntsys1\ils_appl\data\XMIT\FTP\GEF0009\Work'
+            # Zip the files and store in sent location for records
+            zipFileName = 'CRLGEFSLQ%s.zip' % today.strftime('%Y%m%d%H%M%S')
+            zipBuilder = ASAPZipBuilder( os.path.join(xmitSentPath,zipFileName), self._getLogger() )
             for asapFile in asapToXmitFiles:
                 try:
                     destFile = os.path.join(work_path,os.path.basename(asapFile.getFullPath()).upper())
@@ -194,15 +202,20 @@ class GEFTransmitHandler( ASAPTransmitHandler ):
                         reconInbox = r'\\ntsys1\ils_appl\data\XMIT\FTP\GEF0009\Recon\Inbox'
                     #Copy the .ndx files with extension .idx for reconciliation of Genworth process.
                     
-                    # Zip the files and store in sent location for records
-                    zipFileName = 'CRLGEFSLQ%s.zip' % today.strftime('%Y%m%d%H%M%S')
-                    zipFilePath = os.path.join(xmitSentPath,zipFileName)
-                    CRLUtility.CRLAddToZIPFile( asapFile.getFullPath(),zipFilePath,True )
+                    zipBuilder.addFile( asapFile.getFullPath(), fDeleteSource=True )
                 except:
                     fSuccess = False
                     destFile = os.path.join(retransPath,os.path.basename(asapFile.getFullPath()))
                     CRLUtility.CRLCopyFile(asapFile.getFullPath(), destFile, True)
                     self._getLogger().info( 'Moved %s file to Genworth Retrans Folder...' % asapFile.getFullPath() )
+            try:
+                zipBuilder.close()
+            except:
+                fSuccess = False
+                self._getLogger().warn( 'Failed to write %s:' % zipBuilder.getZipPath(), exc_info=True )
+                for sourcePath in zipBuilder.getSourcePaths():
+                    CRLUtility.CRLCopyFile(sourcePath, os.path.join(retransPath,os.path.basename(sourcePath)), True)
+                    self._getLogger().info( 'Moved %s file to Genworth Retrans Folder...' % sourcePath )
         return fSuccess
     
     
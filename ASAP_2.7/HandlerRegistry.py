@@ -0,0 +1,149 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      HandlerRegistry
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPHandlerRegistry class, which resolves the
+      custom handler classes configured in asap_contact_custom_py once for
+      the process, instead of each ASAPMainHandler loading the module and
+      checking the class on every call.  A contact's custom module is only
+      loaded when a handler is first needed for it, so the run does not
+      import the carrier modules (and their dependencies) of contacts with
+      nothing to do.  A module or class that cannot be used is logged once,
+      and its lookups return None.
+
+      Each base class is registered with the class to use when a contact
+      has no custom class (if any), and whether its handlers can be reused
+      between calls.  Reusable handlers (index handlers, which reset
+      themselves for each case) are kept per thread, so each contact thread
+      has its own; the others (transmit handlers, which keep the cases they
+      staged) are created for each call.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-049
+          Resolve each contact's classes when they are first needed, rather
+          than every configured contact's on the first lookup.
+
+      19-Oct-2026   ilsdev  user-049
+          Removed load, which had no callers.
+
+"""
+
+import threading
+
+import CRLUtility
+
+
+class ASAPHandlerRegistry(object):
+    """
+    Process-wide map of (base class, contact) to resolved handler class.
+    """
+
+    def __init__(self, logger=None):
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__lock = threading.RLock()
+        # baseName: (baseClass, defaultClass, fReusable)
+        self.__bases = {}
+        # customModule: module, or None if it could not be loaded
+        self.__modules = {}
+        # (customModule, customClass, baseName): class, or None if it cannot be used
+        self.__classes = {}
+        self.__local = threading.local()
+
+    def register(self, baseName, baseClass, defaultClass=None, fReusable=False):
+        """ Register a base class that contacts can configure a custom class for.
+
+        :param str baseName: the base_class name used in asap_contact_custom_py
+        :param type baseClass: custom classes must derive from it
+        :param type defaultClass: class for contacts with no custom class (None for no handler)
+        :param bool fReusable: handlers can be kept and reused between calls
+        """
+        with self.__lock:
+            self.__bases[baseName] = (baseClass, defaultClass, fReusable)
+
+    def __resolve(self, contact, baseName):
+        """
+        Return the custom class configured for the contact and base, or
+        None if there is none or it cannot be used.
+        """
+        customRec = contact.customClasses.get(baseName)
+        if not customRec:
+            return None
+        customModule, customClass = customRec
+        key = (customModule, customClass, baseName)
+        with self.__lock:
+            if key in self.__classes:
+                return self.__classes[key]
+            classObj = None
+            if customModule not in self.__modules:
+                self.__modules[customModule] = CRLUtility.CRLLoadModule(customModule)
+            modObj = self.__modules[customModule]
+            if modObj:
+                try:
+                    classObj = getattr(modObj, customClass)
+                except Exception:
+                    self.__logger.warn('Module {customModule!s:s} does not contain class {customClass!s:s}.'
+                                       .format(customModule=customModule, customClass=customClass))
+                if not (isinstance(classObj, type) and issubclass(classObj, self.__bases[baseName][0])):
+                    self.__logger.warn(
+                        'Class {customClass!s:s} (module {customModule!s:s}) is not a subclass of {baseName!s:s}.'
+                        .format(customClass=customClass, customModule=customModule, baseName=baseName))
+                    classObj = None
+            else:
+                self.__logger.warn('Module {customModule!s:s} does not exist.'.format(customModule=customModule))
+            self.__classes[key] = classObj
+            return classObj
+
+    def isConfigured(self, contact, baseName):
+        """
+        True if the contact has a custom class for the base.
+        """
+        return bool(contact.customClasses.get(baseName))
+
+    def getHandlerClass(self, contact, baseName):
+        """ Return the handler class for the contact: its custom class, or
+        the default class if it has none.  None if there is no handler.
+
+        :param ASAPContact contact:
+        :param str baseName:
+        :rtype: type|None
+        """
+        if self.isConfigured(contact, baseName):
+            return self.__resolve(contact, baseName)
+        return self.__bases[baseName][1]
+
+    def getHandler(self, contact, baseName):
+        """ Return a handler for the contact (see getHandlerClass), reusing
+        this thread's handler of the class if the base is reusable.
+
+        :param ASAPContact contact:
+        :param str baseName:
+        """
+        classObj = self.getHandlerClass(contact, baseName)
+        if classObj is None:
+            return None
+        if not self.__bases[baseName][2]:
+            return classObj()
+        handlers = getattr(self.__local, 'handlers', None)
+        if handlers is None:
+            handlers = self.__local.handlers = {}
+        handler = handlers.get(classObj)
+        if handler is None:
+            handler = handlers[classObj] = classObj()
+        return handler
@@ -31,15 +31,26 @@
         ING wants us to send the documents as Duplicate where policy number starts with AD110 and are for PHI region
       09-Oct-2012  rsu      Ticket 33107
         ING recon should also check missing ING EB (NWN) documents
+      19-Oct-2026  ilsdev   user-028
+        Look up 103 elements through the index handler's path index
+      19-Oct-2026  ilsdev   user-038
+        Zip, PGP-encrypt and upload the batch as one stream with ASAPTransmitPipeline
+      19-Oct-2026  ilsdev   user-047
+        Always rebuild the index, since building it also stamps the applicant's name on PM images
+      19-Oct-2026  ilsdev   user-049
+        Import the ACORD parser when a 103 is first checked
+      19-Oct-2026  ilsdev   user-035
+        Cap the FTP sessions open at once to the ING host (shared with NWN)
 """
 from ILS import ASAP
-from ILS                        import AcordXML
 from ILS.ASAP.CaseFactory       import ASAPCaseFactory
 from ILS.ASAP.DocumentFactory   import ASAPDocumentFactory
 from ILS.ASAP.DocumentHistory   import ASAPDocumentHistory
 from ILS.ASAP.IndexHandler      import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler   import ASAPTransmitHandler
 from ILS.ASAP.FileManager       import ASAPFileManager
+from ILS.ASAP.TransmitPipeline  import ASAPTransmitPipeline, ASAPPgpEncryptor
+from ILS.ASAP.Utility           import ASAP_UTILITY
 import CRLUtility
 import datetime
 import glob
@@ -58,12 +69,16 @@ class INGIndexHandler( ASAPIndexHandler ):
     """
     Custom handler for building indexes for ING.
     """
+    def _getFingerprintInputs( self ):
+        # building the index also stamps the applicant's name on PM images
+        return None
+
     def _processDerivedFields( self ):
         case = self._getCase()
         handler = self._getAcordHandler()
         sCompany = 'RLR'
         if handler:
-            appJuris = handler.txList[0].getElement(
+            appJuris = self._getAcordPathIndex().getElement(
                 'ACORDInsuredHolding.Policy.ApplicationInfo.ApplicationJurisdiction' )
             if appJuris:
                 attrs = appJuris.getAttrs()
@@ -74,7 +89,7 @@ class INGIndexHandler( ASAPIndexHandler ):
             listField = case.contact.index.getField( 'LIST' )
             if listField and listField.getSource() == listField.SRC_DERIVED:
                 sListValue = 'I3'
-                agentNumber = handler.txList[0].getElement(
+                agentNumber = self._getAcordPathIndex().getElement(
                 'ACORDAgentParty.Producer.CarrierAppointment.CompanyProducerID' )
                 if agentNumber and agentNumber.value[:7] in ( '100B00U', '100B02H' ):
                     sListValue = 'I1'
@@ -131,6 +146,7 @@ class INGTransmitHandler( ASAPTransmitHandler ):
         policy number to see if it starts with AD (for Admin Server).
         """
         fSuccess = False
+        from ILS import AcordXML
         parser = AcordXML.AcordXMLParser()
         handler = parser.parse( acord103Path )
         if handler:
@@ -260,6 +276,7 @@ class INGTransmitHandler( ASAPTransmitHandler ):
     def _transmitStagedCases( self ):
         fSuccess = True
         ING_FTP_HOSTNAME = 'ING'
+        ING_FTP_MAX_SESSIONS = 2    # shared with the NWN contacts, which upload to the same host
         ING_PUBLIC_KEY = r'\\Ntsys1\Crl_appl\Data\pgp\ils\ing.asc'
         ING_REMOTE_USER = 'Reliastar lockbox diffie'
         ING_CONTACT_AGENCY_MAP = {
@@ -278,6 +295,7 @@ class INGTransmitHandler( ASAPTransmitHandler ):
             'ingphiapps' : 'PHI'
             }
         sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo( ING_FTP_HOSTNAME )
+        ASAP_UTILITY.getTransportPool().setHostLimit( sServer, ING_FTP_MAX_SESSIONS )
         contact = self._getContact()
         xmitStagingPath = contact.xmit_dir
         xmitZipPath = os.path.join( xmitStagingPath, 'zip' )
@@ -302,31 +320,35 @@ class INGTransmitHandler( ASAPTransmitHandler ):
                     % contact.contact_id )
                 return False
             pgpFileName = zipFileName
-            asapZipFile = fm.newFile( os.path.join(xmitZipPath, zipFileName), True )
-            for asapFile in asapToXmitFiles:
-                CRLUtility.CRLAddToZIPFile( asapFile.getFullPath(),
-                                            asapZipFile.getFullPath(),
-                                            False )
-                fm.deleteFile( asapFile )
-            iRet = CRLUtility.CRLPGPEncrypt( 'ILS', ING_REMOTE_USER,
-                                             asapZipFile.getFullPath(),
-                                             os.path.join(xmitPgpPath, pgpFileName) )
-            self._getLogger().debug( 'PGP encrypt returned %d.' % iRet )
-            # now move the zip file to the sent folder if PGP encryption
-            # was successful
-            if iRet == 0 and os.path.exists( os.path.join(xmitPgpPath, pgpFileName) ):
-                asapSentZipFile = fm.moveFile( asapZipFile,
-                                               os.path.join(xmitSentPath, asapZipFile.fileName) )
-                self._getLogger().info(
-                    'PGP file %s successfully created and ready for transmission.'
-                    % pgpFileName )
+            # zip, encrypt and upload in one stream, keeping the zip in the sent folder;
+            # in test mode the PGP file is only written to the pgp folder
+            sentZipPath = os.path.join( xmitSentPath, zipFileName )
+            if ASAP.devState.isDevInstance():
+                upload = ASAPTransmitPipeline.fileUploader( os.path.join(xmitPgpPath, pgpFileName) )
             else:
+                upload = ASAPTransmitPipeline.ftpUploader( ASAP_UTILITY.getTransportPool(), sServer, sUser, sPassword,
+                                                          '/usr/local/ftp/CRL/' + pgpFileName )
+            pipeline = ASAPTransmitPipeline( ASAPPgpEncryptor('ILS', ING_REMOTE_USER),
+                                             xmitZipPath, logger=self._getLogger() )
+            try:
+                result = pipeline.run( [asapFile.getFullPath() for asapFile in asapToXmitFiles],
+                                       upload, sentZipPath )
+                self._getLogger().info( 'PGP file %s successfully created and transmitted (%r).'
+                                        % (pgpFileName, result) )
+            except:
                 fSuccess = False
-                self._getLogger().warn( 'Failed to PGP-encrypt file %s for ING (extracting zip to retrans folder).'
-                                        % asapZipFile.fileName )
-                CRLUtility.CRLUnzipFile( asapZipFile.getFullPath(), retransPath )
-                fm.deleteFile( asapZipFile )
-        # now FTP any unsent PGP files to ING, only if we're not in test mode
+                self._getLogger().warn( 'Failed to transmit file %s to ING (moving files to retrans folder):'
+                                        % pgpFileName, exc_info=True )
+                if os.path.isfile( sentZipPath ):
+                    CRLUtility.CRLUnzipFile( sentZipPath, retransPath )
+                else:
+                    for asapFile in asapToXmitFiles:
+                        CRLUtility.CRLCopyFile( asapFile.getFullPath(),
+                                                os.path.join(retransPath, asapFile.fileName),
+                                                False, 5 )
+            for asapFile in asapToXmitFiles:
+                fm.deleteFile( asapFile )
+        # now FTP any PGP files left from earlier runs to ING, only if we're not in test mode
         if not ASAP.devState.isDevInstance():
             asapPgpFiles = fm.glob( os.path.join(xmitPgpPath, '*.*') )
             for asapPgpFile in asapPgpFiles:
@@ -0,0 +1,207 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      ImportProfile
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPImportProfile class, which times the
+      first import of each module while it is started, by wrapping the
+      built-in __import__.  report logs the slowest modules with their
+      total time (including the modules they import) and their own time,
+      so a slow start can be traced to the module that causes it.
+
+      MainThread starts it before importing the package and reports at
+      the end of the run, so the carrier modules and dependencies that are
+      only imported when a contact first uses them are included.
+
+      This module must only import from the standard library, so that it
+      can be started before anything else is imported.  The arguments of
+      each import are passed on to __import__ as given, since Python 2
+      leaves out the level for an implicit relative import; running this
+      module checks that imports still work while it is started.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-049
+          Pass the import arguments through unchanged, so implicit relative
+          imports on Python 2 are not made absolute, and report those under
+          the module that was actually imported.
+
+"""
+
+import sys
+import threading
+import time
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+# level used by __import__ when none is given (-1 is the implicit relative import of Python 2)
+_DEFAULT_LEVEL = 0 if sys.version_info[0] >= 3 else -1
+
+
+class ASAPImportProfile(object):
+    """
+    Times module imports between start and stop.
+    """
+    DEFAULT_REPORT_LIMIT = 25
+
+    def __init__(self):
+        self.__import = None
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        # module name: (total seconds, own seconds, thread name)
+        self.__times = {}
+
+    @staticmethod
+    def __resolveName(name, globals, level):
+        """
+        Return the absolute name of the module being imported.  For an
+        implicit relative import (level -1), this is the name within the
+        importing package if that module is loaded, else the name as given.
+        """
+        if not level:
+            return name
+        if level < 0:
+            relative = ASAPImportProfile.__resolveName(name, globals, 1)
+            if relative != name and sys.modules.get(relative) is not None:
+                return relative
+            return name
+        package = (globals or {}).get('__package__')
+        if not package:
+            package = (globals or {}).get('__name__', '')
+            if '__path__' not in (globals or {}):
+                package = package.rpartition('.')[0]
+        if level > 1:
+            package = package.rsplit('.', level - 1)[0]
+        if not package:
+            return name
+        if name:
+            return '{package!s:s}.{name!s:s}'.format(package=package, name=name)
+        return package
+
+    @staticmethod
+    def __getNewNames(key, fromlist):
+        """
+        Return the names of the modules an import of key will load: key
+        itself, or the items of fromlist not yet loaded if key is loaded
+        ('from package import module' loads the module without calling
+        __import__ again).
+        """
+        module = sys.modules.get(key)
+        if module is None:
+            return [key]
+        return ['{key!s:s}.{item!s:s}'.format(key=key, item=item) for item in fromlist or ()
+                if item != '*' and not hasattr(module, item)]
+
+    def __timedImport(self, name, *args, **kwargs):
+        # the arguments are passed on as given: __import__(name, globals, locals, fromlist, level)
+        globals = args[0] if args else kwargs.get('globals')
+        fromlist = args[2] if len(args) > 2 else kwargs.get('fromlist')
+        level = args[3] if len(args) > 3 else kwargs.get('level', _DEFAULT_LEVEL)
+        key = self.__resolveName(name, globals, level)
+        keys = self.__getNewNames(key, fromlist)
+        if not keys:
+            return self.__import(name, *args, **kwargs)
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        stack.append(0.0)
+        beginTime = time.time()
+        try:
+            return self.__import(name, *args, **kwargs)
+        finally:
+            elapsed = time.time() - beginTime
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if level < 0:
+                # only now is it known whether the import was relative
+                resolved = self.__resolveName(name, globals, level)
+                if resolved != key:
+                    keys = [resolved + newKey[len(key):] for newKey in keys]
+            # nothing that can import is called with the lock held
+            threadName = threading.current_thread().name
+            with self.__lock:
+                for newKey in keys:
+                    if newKey not in self.__times:
+                        self.__times[newKey] = (elapsed / len(keys), (elapsed - nested) / len(keys), threadName)
+
+    def start(self):
+        """
+        Start timing imports.
+        """
+        if self.__import is None:
+            self.__import = builtins.__import__
+            builtins.__import__ = self.__timedImport
+
+    def stop(self):
+        """
+        Stop timing imports (the times so far are kept for report).
+        """
+        if self.__import is not None:
+            builtins.__import__ = self.__import
+            self.__import = None
+
+    def getTimes(self):
+        """ Return {module name: (total seconds, own seconds, thread name)}.
+
+        :rtype: dict[str, tuple[float, float, str]]
+        """
+        with self.__lock:
+            return dict(self.__times)
+
+    def report(self, logger, limit=DEFAULT_REPORT_LIMIT):
+        """ Log the modules that took longest to import, slowest (own time) first.
+
+        :param logger:
+        :param int limit: number of modules listed
+        """
+        times = self.getTimes()
+        if not times:
+            return
+        totalOwn = sum([own for total, own, threadName in times.values()])
+        lines = ['Imported {count:d} modules in {totalOwn:.3f} seconds; slowest {limit:d} (total/own ms, thread):'
+                 .format(count=len(times), totalOwn=totalOwn, limit=min(limit, len(times)))]
+        ranked = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (total, own, threadName) in ranked[:limit]:
+            lines.append('  {total:9.1f} {own:9.1f}  {name!s:s} ({threadName!s:s})'
+                         .format(total=total * 1000.0, own=own * 1000.0, name=name, threadName=threadName))
+        logger.info('\n'.join(lines))
+
+
+IMPORT_PROFILE = ASAPImportProfile()
+
+
+if __name__ == '__main__':
+    # check that imports work while the profile is started, including the
+    # implicit relative imports of the Python 2 standard library
+    IMPORT_PROFILE.start()
+    try:
+        import xml.dom.minidom
+        import sqlite3
+        import json
+    finally:
+        IMPORT_PROFILE.stop()
+    profiledTimes = IMPORT_PROFILE.getTimes()
+    for moduleName in ('xml.dom.minidom', 'sqlite3', 'json'):
+        assert moduleName in profiledTimes, moduleName
+    assert not [moduleName for moduleName in profiledTimes if moduleName.startswith('.')]
+    assert xml.dom.minidom.parseString('<a/>').documentElement.tagName == 'a'
+    assert sqlite3.connect(':memory:').execute('select 1').fetchone()[0] == 1
+    assert json.loads('[1]') == [1]
+    assert builtins.__import__ is not IMPORT_PROFILE
+    print('Imported {count:d} modules through the profile.'.format(count=len(profiledTimes)))
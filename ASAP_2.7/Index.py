@@ -10,7 +10,8 @@
       Copyright 2019, Clinical Reference Laboratory.  All Rights Reserved.
 
   Abstract:
-      This script contains the ASAPIndex class.
+      This script contains the ASAPIndex class, and the ASAPIndexTemplate
+      class that holds an index compiled for rendering.
 
   Author:
       Jarrod Wild
@@ -22,6 +23,21 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-044
+          Compile the field order, name/value prefixes and delimiter into an
+          ASAPIndexTemplate once per contact; writeFile renders the index
+          with it in one pass (see render).
+
+      19-Oct-2026   ilsdev  user-045
+          writeFile takes an optional function to change the rendered text
+          before it is written.
+
+      19-Oct-2026   ilsdev  user-047
+          Added getLayout.
+
+      19-Oct-2026   ilsdev  user-044
+          reset only resets the fields set since the last reset.
 """
 
 import os
@@ -29,6 +45,53 @@ import CRLUtility
 from .IndexField import ASAPIndexField
 
 
+class ASAPIndexTemplate(object):
+    """
+    An index's fields compiled for rendering: the fields in order, each
+    with its 'name<subdelim>' prefix, and the delimiter between pairs.
+    Built by ASAPIndex on first use and rebuilt whenever a field or a
+    delimiter is changed.  The fields add themselves to changed when they
+    are set, so reset only has to reset those.
+    """
+
+    def __init__(self, fieldMap, orderMap, delim, subdelim):
+        """
+
+        :param dict[str, ASAPIndexField] fieldMap:
+        :param dict[int, str] orderMap:
+        :param str delim:
+        :param str subdelim:
+        """
+        self.fieldNames = [orderMap[order] for order in sorted(orderMap.keys())]
+        self.fields = [(fieldMap[fieldName], fieldName, fieldName + subdelim) for fieldName in self.fieldNames]
+        self.delim = delim
+        self.changed = []  # type: list[ASAPIndexField]
+        for field in fieldMap.values():
+            field.setChangedList(self.changed)
+
+    def reset(self):
+        """
+        Reset the fields set since the last reset.
+        """
+        for field in self.changed:
+            field.reset()
+        del self.changed[:]
+
+    def render(self):
+        """ Return the index text for the current field values.  Raises if
+        a required field has no value.
+
+        :rtype: str
+        """
+        pairs = []
+        for field, fieldName, prefix in self.fields:
+            value = field.getValue()
+            if not value and field.isRequired():
+                raise Exception('Required field {fieldName!s:s} missing value.'.format(fieldName=fieldName))
+            pairs.append(prefix + value)
+        return self.delim.join(pairs) + '\n'
+
+
 class ASAPIndex(object):
     """
     Wrapper for an index with support for file read/write.  The index
@@ -62,6 +125,7 @@ class ASAPIndex(object):
         # subdelim is delimiter between field and value
         self.__delim = '\n'
         self.__subdelim = '='
+        self.__template = None  # type: ASAPIndexTemplate
 
     def __escapeMap(self, strVal):
         """ Convert all identifiers to their special character counterparts
@@ -74,18 +138,29 @@ class ASAPIndex(object):
                 strVal = strVal.replace(escSeq, self.__ESCAPE_MAP[escSeq])
         return strVal
 
+    def getTemplate(self):
+        """ Return the index compiled for rendering, compiling it if a field
+        or delimiter changed since it was last used.
+
+        :rtype: ASAPIndexTemplate
+        """
+        if self.__template is None:
+            self.__template = ASAPIndexTemplate(self.__fieldMap, self.__orderMap, self.__delim, self.__subdelim)
+        return self.__template
+
     def reset(self):
         """
         Reset all fields
         """
-        for field in list(self.__fieldMap.values()):
-            field.reset()
+        self.getTemplate().reset()
 
     def setDelim(self, delim):
         self.__delim = self.__escapeMap(delim)
+        self.__template = None
 
     def setSubdelim(self, subdelim):
         self.__subdelim = self.__escapeMap(subdelim)
+        self.__template = None
 
     def addField(self, field, iOrder):
         """
@@ -98,6 +173,7 @@ class ASAPIndex(object):
             fieldName = field.getName()
             self.__fieldMap[fieldName] = field
             self.__orderMap[iOrder] = fieldName
+            self.__template = None
             fSuccess = True
         else:
             self.__logger.warn('Field is not an instance of ASAPIndexField.')
@@ -106,16 +182,21 @@ class ASAPIndex(object):
     def getFieldMap(self):
         return self.__fieldMap
 
+    def getLayout(self):
+        """
+        Return the index type, delimiters and the metadata of each field in
+        order, as a tuple (what the index is built to, as opposed to the
+        field values).
+        """
+        template = self.getTemplate()
+        return (self.type, self.__delim, self.__subdelim,
+                tuple([self.__fieldMap[name].getMeta() for name in template.fieldNames]))
+
     def getOrderedFieldNames(self):
         """
         Return list of field names ordered by sequence in index.
         """
-        fieldList = []
-        orderVals = list(self.__orderMap.keys())
-        orderVals.sort()
-        for order in orderVals:
-            fieldList.append(self.__orderMap[order])
-        return fieldList
+        return list(self.getTemplate().fieldNames)
 
     def getField(self, sField):
         """ Get the ASAPIndexField instance with the specified field name
@@ -180,26 +261,17 @@ class ASAPIndex(object):
             self.__logger.warn('File {fileName!s:s} does not exist.'.format(fileName=fileName))
         return fSuccess
 
-    def writeFile(self, fileName):
+    def writeFile(self, fileName, processText=None):
         """ Write index out to file specified by fileName.
 
         :param str|unicode fileName: path to file which will be created
+        :param processText: optional function given the rendered text, returning the text to write
         """
         fSuccess = False
         try:
-            fieldNames = self.getOrderedFieldNames()
-            # print('{fieldNames!s:s}'.format(fieldNames=str(fieldNames)))
-            pairs = []
-            for fieldName in fieldNames:
-                field = self.getField(fieldName)
-                value = field.getValue()
-                if not value and field.isRequired():
-                    raise Exception('Required field {fieldName!s:s} missing value.'.format(fieldName=fieldName))
-                # print('{fieldName!s:s}, {subdelim!s:s}, {value!s:s}'
-                #       .format(fieldName=fieldName, subdelim=self.__subdelim, value=value))
-                pair = fieldName + self.__subdelim + value
-                pairs.append(pair)
-            rawData = self.__delim.join(pairs) + '\n'
+            rawData = self.render()
+            if processText:
+                rawData = processText(rawData)
             idxFile = open(fileName, 'w')
             idxFile.write(rawData)
             idxFile.close()
@@ -208,6 +280,14 @@ class ASAPIndex(object):
             self.__logger.warn('Unable to write index file {fileName!s:s}:'.format(fileName=fileName), exc_info=True)
         return fSuccess
 
+    def render(self):
+        """ Return the index text for the current field values, as writeFile
+        would write it.  Raises if a required field has no value.
+
+        :rtype: str
+        """
+        return self.getTemplate().render()
+
     def dbgPrint(self):
         print('{vals!s:s}'
               .format(vals=str((self.type,
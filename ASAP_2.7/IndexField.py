@@ -29,10 +29,22 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-046
+          Format values with the formatters in IndexFormat: the date format
+          that worked is remembered per source field, the number format is
+          compiled in setFieldMeta, and ASCII values skip the normalisation.
+
+      19-Oct-2026   ilsdev  user-047
+          Added getMeta.
+
+      19-Oct-2026   ilsdev  user-044
+          setValue adds the field to the changed list of its index template
+          (setChangedList), so only fields that were set are reset.
 """
 
 import CRLUtility
-import unicodedata
+from .IndexFormat import ASAPDateFormatter, ASAPNumberFormatter, SSN_FORMAT, toAscii
 
 
 class ASAPIndexField(object):
@@ -63,7 +75,7 @@ class ASAPIndexField(object):
     TYPE_STRING = 'string'
     TYPE_NUMBER = 'number'
     # special formats
-    FMT_SSN = '999-99-9999'
+    FMT_SSN = SSN_FORMAT
 
     def __init__(self, logger=None):
         if not logger:
@@ -80,6 +92,23 @@ class ASAPIndexField(object):
         self.__maxlength = 0
         self.__source = self.SRC_DERIVED
         self.__reference = ''
+        # formatters built from the metadata
+        self.__dateFormatter = None     # type: ASAPDateFormatter
+        self.__numberFormatter = None   # type: ASAPNumberFormatter
+        # fields of the index template set since its last reset, this one included while fChanged
+        self.__changedList = None       # type: list[ASAPIndexField]
+        self.__fChanged = False
+
+    def setChangedList(self, changedList):
+        """ Add the field to changedList whenever it is set after a reset
+        (called by ASAPIndexTemplate, which resets only those fields).  The
+        field is added now as well, since its value is not known.
+
+        :param list[ASAPIndexField] changedList:
+        """
+        self.__changedList = changedList
+        self.__fChanged = True
+        changedList.append(self)
 
     def reset(self):
         """
@@ -89,34 +118,20 @@ class ASAPIndexField(object):
             self.__value = self.__reference
         else:
             self.__value = ''
+        self.__fChanged = False
 
     def __formatDate(self, sValue):
-        dateValue = CRLUtility.ParseStrDate(sValue, True)
-        return dateValue.strftime(str(self.__format))
+        dateValue = self.__dateFormatter.parse(sValue)
+        return dateValue.strftime(self.__format)
 
     def __formatNumber(self, sValue):
-        newVal = sValue
-        if len(newVal) > 1:
-            # remove common special characters like dashes, dollar signs, commas
-            newVal = newVal[0] + newVal[1:].replace('-', '')
-            newVal = newVal.replace('$', '')
-            newVal = newVal.replace(',', '')
-        if (self.__format == self.FMT_SSN):
-            if len(newVal) == 9:
-                return '{s1!s:s}-{s2!s:s}-{s3!s:s}'.format(s1=newVal[:3], s2=newVal[3:5], s3=newVal[5:])
-            else:
-                raise Exception('Value {sValue!s:s} cannot be converted to SSN format.'
-                                .format(sValue=sValue))
-        else:
-            numFormat = '{{floatVal:{numFmt!s:s}f}}'.format(numFmt=self.__format)
-            try:
-                floatVal = float(newVal)
-                return numFormat.format(floatVal=floatVal)
-            except Exception:
-                self.__logger.info(
-                    'Value {newVal!s:s} cannot be converted to float, returning empty string.'
-                    .format(newVal=newVal))
-                return ''
+        newVal = self.__numberFormatter.format(sValue)
+        if newVal is None:
+            self.__logger.info(
+                'Value {sValue!s:s} cannot be converted to float, returning empty string.'
+                .format(sValue=sValue))
+            return ''
+        return newVal
 
     def __formatValue(self, sValue):
         newVal = sValue
@@ -142,9 +157,16 @@ class ASAPIndexField(object):
         self.__format = sFormat
         # use the carat in the tables as a placeholder for the percent
         if sType == self.TYPE_DATE and sFormat:
-            self.__format = sFormat.replace('^', '%')
+            self.__format = str(sFormat.replace('^', '%'))
         self.__source = sSource
         self.__reference = sRef
+        self.__dateFormatter = None
+        self.__numberFormatter = None
+        if sFormat:
+            if sType == self.TYPE_DATE:
+                self.__dateFormatter = ASAPDateFormatter.forField(sSource, sRef)
+            elif sType == self.TYPE_NUMBER:
+                self.__numberFormatter = ASAPNumberFormatter(sFormat)
         self.reset()
 
     def getName(self):
@@ -162,6 +184,14 @@ class ASAPIndexField(object):
     def getValue(self):
         return self.__value
 
+    def getMeta(self):
+        """
+        Return the field's metadata as a tuple (name, type, required,
+        maxlength, format, source, reference).
+        """
+        return (self.__name, self.__type, self.__required, self.__maxlength,
+                self.__format, self.__source, self.__reference)
+
     def setValue(self, sValue):
         """
         Returns True if successful.  If False is returned, a log message
@@ -171,14 +201,13 @@ class ASAPIndexField(object):
         """
         fSuccess = False
         if isinstance(sValue, str):
+            if not self.__fChanged and self.__changedList is not None:
+                self.__fChanged = True
+                self.__changedList.append(self)
             sValue = sValue.strip()
             if sValue:
-                try:
-                    sValue = str(sValue)  # string case fails on some unicode values
-                except:
-                    # attempt to normalize unicode characters to ascii using NFKD (normal form canonical decomposition)
-                    sValue = unicodedata.normalize('NFKD', sValue).encode('ascii', 'ignore')
-                    sValue = str(sValue)
+                # normalize unicode characters to ascii using NFKD (normal form canonical decomposition)
+                sValue = toAscii(sValue)
                 try:
                     newVal = self.__formatValue(sValue)
                     if (self.__maxlength == 0 or len(newVal) <= self.__maxlength):
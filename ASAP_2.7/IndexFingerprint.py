@@ -0,0 +1,194 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      IndexFingerprint
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPIndexFingerprints class, which lets the
+      index handler skip rebuilding the indexes of a case whose inputs have
+      not changed since they were last built (re-release, restage, retrans).
+
+      The fingerprint is a SHA-1 of everything the index is built from:
+      the contact's index layout, the case's documents and their Delta QC
+      fields, the LIMS rows and the ACORD 121 order prefetched for the batch
+      (ASAPIndexPrefetch), the size and time of the 103 file, and whatever
+      the index handler adds (its class, transmit history, and any inputs of
+      a derived class; see ASAPIndexHandler._getFingerprintInputs).  If an
+      input cannot be had without doing the work (e.g. the rows were not
+      prefetched), there is no fingerprint and the indexes are built.
+
+      The fingerprint is stored with the index text it produced, in the
+      fingerprint subfolder of the contact's index folder
+      (<trackingId>.FP).  When the fingerprint matches, the stored index
+      files are written back to the index folder (they may have been
+      staged since).  Stored fingerprints are removed after MAX_AGE_DAYS.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import CRLUtility
+from .Case import ASAPCase
+from .IndexField import ASAPIndexField
+
+
+class ASAPIndexFingerprints(object):
+    """
+    Fingerprints of index inputs, stored with the indexes they produced.
+    """
+    FINGERPRINT_SUBDIR = 'fingerprint'
+    MAX_AGE_DAYS = 30
+
+    def __init__(self, logger=None):
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+
+    def __getPath(self, asapCase):
+        return os.path.join(asapCase.contact.index_dir, self.FINGERPRINT_SUBDIR,
+                            '{trackingId!s:s}.FP'.format(trackingId=asapCase.trackingId))
+
+    @staticmethod
+    def __getSources(index):
+        return set([index.getField(name).getSource() for name in index.getOrderedFieldNames()])
+
+    def compute(self, asapCase, handlerInputs):
+        """ Return the fingerprint of the case's index inputs, or None if
+        they cannot all be had without building the indexes.
+
+        :param ASAPCase asapCase:
+        :param list handlerInputs: inputs added by the index handler (None for no fingerprint)
+        :rtype: str|None
+        """
+        if handlerInputs is None:
+            return None
+        contact = asapCase.contact
+        index = contact.index
+        sources = self.__getSources(index)
+        inputs = [contact.contact_id, index.getLayout(), asapCase.sid, asapCase.trackingId, handlerInputs]
+        docs = []
+        for docId in sorted(asapCase.getDocuments().keys()):
+            doc = asapCase.getDocument(docId)
+            docs.append((docId, doc.fileName, doc.pageCount, doc.getDocTypeName(), doc.getDateCreated(),
+                         contact.docTypeNameMap.get(doc.getDocTypeName())))
+        inputs.append(docs)
+        if ASAPIndexField.SRC_LIMS in sources:
+            tables = set()
+            for name in index.getOrderedFieldNames():
+                field = index.getField(name)
+                if field.getSource() == ASAPIndexField.SRC_LIMS:
+                    tables.add(field.getReference().strip().split('.')[0].lower())
+            limsRecords = asapCase.limsRecords
+            if not limsRecords or not tables.issubset(set(limsRecords.keys())):
+                return None
+            inputs.append(sorted([(table, sorted(limsRecords[table].items())) for table in tables]))
+        if ASAPIndexField.SRC_ACORD121 in sources:
+            if asapCase.acord121BlobId is None:
+                return None
+            inputs.append(asapCase.acord121BlobId)
+        if ASAPIndexField.SRC_ACORD103 in sources:
+            if not contact.acord103_dir:
+                return None
+            xmlPath = os.path.join(contact.acord103_dir,
+                                   '{trackingid!s:s}.XML'.format(trackingid=asapCase.trackingId))
+            try:
+                stat = os.stat(xmlPath)
+            except OSError:
+                return None
+            inputs.append((stat.st_size, stat.st_mtime))
+        return hashlib.sha1(repr(inputs).encode('utf-8')).hexdigest()
+
+    def restore(self, asapCase, fingerprint):
+        """ If the case's indexes were last built from inputs with this
+        fingerprint, write the stored index files to the index folder and
+        return their paths; otherwise return None.
+
+        :param ASAPCase asapCase:
+        :param str fingerprint:
+        :rtype: list[str]|None
+        """
+        fpPath = self.__getPath(asapCase)
+        if not fingerprint or not os.path.isfile(fpPath):
+            return None
+        try:
+            ptr = open(fpPath, 'r')
+            try:
+                stored = json.load(ptr)
+            finally:
+                ptr.close()
+        except Exception:
+            self.__logger.warn('Unable to read index fingerprint {fpPath!s:s}:'.format(fpPath=fpPath), exc_info=True)
+            return None
+        if stored.get('fingerprint') != fingerprint or not stored.get('indexes'):
+            return None
+        idxPaths = []
+        for fileName, idxText in stored['indexes']:
+            idxPath = os.path.join(asapCase.contact.index_dir, fileName)
+            idxFile = open(idxPath, 'w')
+            idxFile.write(idxText)
+            idxFile.close()
+            idxPaths.append(idxPath)
+        return idxPaths
+
+    def store(self, asapCase, fingerprint, idxPaths):
+        """ Store the fingerprint with the text of the index files built from it.
+
+        :param ASAPCase asapCase:
+        :param str fingerprint:
+        :param list[str] idxPaths:
+        """
+        if not fingerprint:
+            return
+        fpPath = self.__getPath(asapCase)
+        try:
+            indexes = []
+            for idxPath in idxPaths:
+                idxFile = open(idxPath, 'r')
+                indexes.append((os.path.basename(idxPath), idxFile.read()))
+                idxFile.close()
+            if not os.path.isdir(os.path.dirname(fpPath)):
+                os.makedirs(os.path.dirname(fpPath))
+            ptr = open(fpPath, 'w')
+            try:
+                json.dump({'fingerprint': fingerprint, 'indexes': indexes}, ptr)
+            finally:
+                ptr.close()
+        except Exception:
+            self.__logger.warn('Unable to store index fingerprint {fpPath!s:s}:'.format(fpPath=fpPath), exc_info=True)
+
+    def prune(self, contact):
+        """ Remove the contact's stored fingerprints older than MAX_AGE_DAYS.
+
+        :param ASAPContact contact:
+        """
+        if not contact.index_dir:
+            return
+        fpDir = os.path.join(contact.index_dir, self.FINGERPRINT_SUBDIR)
+        if not os.path.isdir(fpDir):
+            return
+        cutoff = time.time() - self.MAX_AGE_DAYS * 86400
+        for fileName in os.listdir(fpDir):
+            fpPath = os.path.join(fpDir, fileName)
+            try:
+                if os.path.getmtime(fpPath) < cutoff:
+                    os.remove(fpPath)
+            except OSError:
+                pass
@@ -0,0 +1,267 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      IndexFormat
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the value formatters used by ASAPIndexField.
+      ASAPDateFormatter parses date values with the format that worked
+      last time for the same source field, instead of trying every format
+      CRLUtility.ParseStrDate knows for each value; a format is only
+      remembered once it has given the same date as ParseStrDate, which is
+      still used for anything the remembered formats do not match.
+      ASAPNumberFormatter holds a number format compiled once per field.
+      toAscii skips the unicode normalisation for values that are plain
+      ASCII already.
+
+      Run this module to time the formatters against the old per-value
+      code over a sample of typical index values.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-046
+          toAscii passes byte strings through unchanged, and the benchmark
+          sample is ASCII source, so the module loads under Python 2.7.
+
+      19-Oct-2026   ilsdev  user-046
+          The benchmark runs the old setValue and __formatNumber code as it
+          was (str() first, NFKD only if that fails, and SSN values), and
+          checks that both give the same values.
+
+"""
+
+import datetime
+import threading
+import time
+import unicodedata
+
+import CRLUtility
+
+try:
+    TEXT_TYPE = unicode
+except NameError:
+    TEXT_TYPE = str
+
+# formats tried, in this order, before falling back to CRLUtility.ParseStrDate
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y%m%d',
+)
+
+SSN_FORMAT = '999-99-9999'
+
+
+def toAscii(sValue):
+    """ Return a unicode value with any non-ASCII characters normalised to
+    ASCII using NFKD (normal form canonical decomposition); values that are
+    ASCII already, and byte strings, are returned as they are (as str() did).
+
+    :param str|unicode sValue:
+    :rtype: str
+    """
+    if not isinstance(sValue, TEXT_TYPE):
+        return sValue
+    try:
+        sValue.encode('ascii')
+        return sValue
+    except UnicodeEncodeError:
+        return str(unicodedata.normalize('NFKD', sValue).encode('ascii', 'ignore').decode('ascii'))
+
+
+class ASAPDateFormatter(object):
+    """
+    Parses the date values of one source field, remembering the format
+    that matched.  Use forField to share one formatter per source field.
+    """
+    __formatters = {}
+    __lock = threading.Lock()
+
+    def __init__(self):
+        self.__format = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def forField(cls, source, reference):
+        """ Return the shared formatter for a source field.
+
+        :param str source:
+        :param str reference:
+        :rtype: ASAPDateFormatter
+        """
+        key = (source, reference)
+        with cls.__lock:
+            formatter = cls.__formatters.get(key)
+            if formatter is None:
+                formatter = cls()
+                cls.__formatters[key] = formatter
+            return formatter
+
+    def parse(self, sValue):
+        """ Parse a date value, as CRLUtility.ParseStrDate(sValue, True) does.
+
+        :param str sValue:
+        :rtype: datetime.datetime
+        """
+        dateFormat = self.__format
+        if dateFormat:
+            try:
+                dateValue = datetime.datetime.strptime(sValue, dateFormat)
+                self.hits += 1
+                return dateValue
+            except ValueError:
+                pass
+        self.misses += 1
+        dateValue = CRLUtility.ParseStrDate(sValue, True)
+        for dateFormat in DATE_FORMATS:
+            try:
+                if datetime.datetime.strptime(sValue, dateFormat) == dateValue:
+                    self.__format = dateFormat
+                    break
+            except ValueError:
+                pass
+        return dateValue
+
+
+class ASAPNumberFormatter(object):
+    """
+    Formats the number values of one field: SSN, or a float format such
+    as '.2' compiled once.
+    """
+
+    def __init__(self, numFormat):
+        """
+
+        :param str numFormat: SSN_FORMAT, or a float format spec without the 'f'
+        """
+        self.__fSSN = numFormat == SSN_FORMAT
+        self.__numFormat = '{{floatVal:{numFmt!s:s}f}}'.format(numFmt=numFormat)
+
+    def format(self, sValue):
+        """ Return the formatted value, or None if it is not a number.
+        Raises if an SSN does not have nine digits.
+
+        :param str sValue:
+        :rtype: str|None
+        """
+        newVal = sValue
+        if len(newVal) > 1:
+            # remove common special characters like dashes, dollar signs, commas
+            newVal = newVal[0] + newVal[1:].replace('-', '')
+            newVal = newVal.replace('$', '')
+            newVal = newVal.replace(',', '')
+        if self.__fSSN:
+            if len(newVal) == 9:
+                return '{s1!s:s}-{s2!s:s}-{s3!s:s}'.format(s1=newVal[:3], s2=newVal[3:5], s3=newVal[5:])
+            raise Exception('Value {sValue!s:s} cannot be converted to SSN format.'
+                            .format(sValue=sValue))
+        try:
+            return self.__numFormat.format(floatVal=float(newVal))
+        except Exception:
+            return None
+
+
+def benchmark(iterations=2000):
+    """
+    Time the formatters against the old per-value code of ASAPIndexField
+    (setValue, __formatDate and __formatNumber) over a sample of typical
+    index values (LIMS dates, ACORD dates, Delta QC dates, amounts, SSNs
+    and names), check that both give the same values, and print the results.
+    """
+    # date values by source field, as a batch of cases would pass them
+    dates = [('lims', 'sample.collect_date', ['2026-10-19 08:15:00', '2026-10-18 14:02:37', '2026-10-19 09:41:10']),
+             ('acord121', 'birthdate', ['1961-04-02', '1959-12-31', '1974-07-15']),
+             ('deltaqc', 'asapdocument.datecreated', ['10/19/2026', '10/18/2026', '10/19/2026'])]
+    numbers = [('.2', '$250,000'), ('.0', '1,000,000'), ('.2', '72.5'), ('.0', '180'),
+               (SSN_FORMAT, '123-45-6789'), (SSN_FORMAT, '987654321')]
+    names = ['SMITH', 'O\'BRIEN', 'MULLER', u'M\xdcLLER', 'GARCIA-LOPEZ']
+
+    def oldConvert(sValue):
+        # ASAPIndexField.setValue before the formatters
+        sValue = sValue.strip()
+        try:
+            sValue = str(sValue)  # string case fails on some unicode values
+        except:
+            sValue = unicodedata.normalize('NFKD', sValue).encode('ascii', 'ignore')
+            sValue = str(sValue)
+        return sValue
+
+    def oldFormatNumber(numFmt, sValue):
+        # ASAPIndexField.__formatNumber before the formatters
+        newVal = sValue
+        if len(newVal) > 1:
+            newVal = newVal[0] + newVal[1:].replace('-', '')
+            newVal = newVal.replace('$', '')
+            newVal = newVal.replace(',', '')
+        if numFmt == SSN_FORMAT:
+            if len(newVal) == 9:
+                return '{s1!s:s}-{s2!s:s}-{s3!s:s}'.format(s1=newVal[:3], s2=newVal[3:5], s3=newVal[5:])
+            raise Exception('Value {sValue!s:s} cannot be converted to SSN format.'
+                            .format(sValue=sValue))
+        numFormat = '{{floatVal:{numFmt!s:s}f}}'.format(numFmt=numFmt)
+        try:
+            return numFormat.format(floatVal=float(newVal))
+        except Exception:
+            return ''
+
+    def oldPass():
+        values = []
+        for source, reference, sValues in dates:
+            for sValue in sValues:
+                values.append(CRLUtility.ParseStrDate(oldConvert(sValue), True).strftime('%m/%d/%Y'))
+        for numFmt, sValue in numbers:
+            values.append(oldFormatNumber(numFmt, oldConvert(sValue)))
+        for sValue in names:
+            values.append(oldConvert(sValue))
+        return values
+
+    dateFormatters = dict([(reference, ASAPDateFormatter()) for source, reference, sValues in dates])
+    numberFormatters = dict([(numFmt, ASAPNumberFormatter(numFmt)) for numFmt, sValue in numbers])
+
+    def newPass():
+        values = []
+        for source, reference, sValues in dates:
+            for sValue in sValues:
+                values.append(dateFormatters[reference].parse(toAscii(sValue.strip())).strftime('%m/%d/%Y'))
+        for numFmt, sValue in numbers:
+            newVal = numberFormatters[numFmt].format(toAscii(sValue.strip()))
+            values.append('' if newVal is None else newVal)
+        for sValue in names:
+            values.append(toAscii(sValue.strip()))
+        return values
+
+    oldValues, newValues = oldPass(), newPass()
+    if oldValues != newValues:
+        print('The formatters give different values: {differences!r:s}'.format(
+            differences=[(oldValue, newValue) for oldValue, newValue in zip(oldValues, newValues)
+                         if oldValue != newValue]))
+    for name, func in (('per-value', oldPass), ('formatters', newPass)):
+        beginTime = time.time()
+        for i in range(iterations):
+            func()
+        elapsed = time.time() - beginTime
+        print('{name!s:>10s}: {elapsed:.3f}s for {iterations:d} passes ({perPass:.1f} us per pass)'
+              .format(name=name, elapsed=elapsed, iterations=iterations, perPass=elapsed * 1000000.0 / iterations))
+    print('date format hits/misses: {hits:d}/{misses:d}'.format(
+        hits=sum([formatter.hits for formatter in dateFormatters.values()]),
+        misses=sum([formatter.misses for formatter in dateFormatters.values()])))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -26,6 +26,42 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-027
+          Read the 103 through the shared parsed-document cache.
+
+      19-Oct-2026   ilsdev  user-028
+          Look up 103 and 121 fields through ASAPAcordPathIndex; added
+          _getAcordPathIndex for derived classes.
+
+      19-Oct-2026   ilsdev  user-040
+          Answer _isFirstTransmit/_isFullTransmit from the transmit history
+          kept on the case.
+
+      19-Oct-2026   ilsdev  user-041
+          Read LIMS fields from the rows prefetched for the batch
+          (ASAPCase.limsRecords) when they are there.
+
+      19-Oct-2026   ilsdev  user-042
+          Use the 121 order prefetched and parsed for the batch
+          (ASAPCase.acord121Document) when it is there.
+
+      19-Oct-2026   ilsdev  user-045
+          Added _processIndexText, so derived classes can change an index
+          before it is written instead of rewriting the file afterwards.
+
+      19-Oct-2026   ilsdev  user-047
+          Reuse the indexes of a case whose inputs have the same fingerprint
+          as when they were last built (see ASAPIndexFingerprints); added
+          _getFingerprintInputs for derived classes.
+
+      19-Oct-2026   ilsdev  user-026
+          Added finishBatch and _postProcessBatch, for work that derived
+          classes collect in _postProcessIndex and do once for the batch.
+
+      19-Oct-2026   ilsdev  user-026
+          Added _failBatchCase; finishBatch moves the cases whose postponed
+          work failed to error and returns them, so they are not billed.
 """
 
 import CRLUtility
@@ -33,7 +69,7 @@ import datetime
 import os
 from .Utility import ASAP_UTILITY
 from .Case import ASAPCase
-from .. import AcordXML
+from .IndexPrefetch import ASAPIndexPrefetch
 
 
 class ASAPIndexHandler(object):
@@ -55,7 +91,10 @@ class ASAPIndexHandler(object):
         self.__deltaFields = []
         self.__limsFields = []
         self.__acordHandler = None
+        self.__acordPathIndex = None
         self.__idxPaths = []
+        # cases whose work postponed to the end of the batch failed
+        self.__batchFailures = []
 
     def __reset(self):
         self.__currentDocument = None
@@ -64,8 +103,16 @@ class ASAPIndexHandler(object):
         self.__deltaFields = []
         self.__limsFields = []
         self.__acordHandler = None
+        self.__acordPathIndex = None
         self.__idxPaths = []
 
+    def _failBatchCase(self, case):
+        """
+        Derived class should call this from _postProcessBatch for a case
+        whose postponed work failed, so finishBatch moves it to error.
+        """
+        self.__batchFailures.append(case)
+
     def _isReadyToIndex(self):
         """
         Derived class should override this method if index shouldn't
@@ -78,27 +125,23 @@ class ASAPIndexHandler(object):
         """
         Check if current case is being transmitted for first time.
         """
-        fFirst = True
-        hist = ASAP_UTILITY.getDocumentHistory()
-        if hist.getTrackedDocidsForCase(self.__case, hist.ACTION_TRANSMIT):
-            fFirst = False
-        return fFirst
+        return ASAP_UTILITY.getDocumentHistory().isFirstTransmit(self.__case)
 
     def _isFullTransmit(self):
         """
         Check if entire current case is being transmitted.
         """
-        fFull = True
-        hist = ASAP_UTILITY.getDocumentHistory()
-        xmitRecs = hist.getTrackedDocidsForCase(self.__case, hist.ACTION_TRANSMIT)
-        xmitDocids = [docid for docid, auditstamp in xmitRecs]
-        docids = list(self.__case.getDocuments().keys())
-        for docid in docids:
-            if docid in xmitDocids:
-                xmitDocids.remove(docid)
-        if xmitDocids:
-            fFull = False
-        return fFull
+        return ASAP_UTILITY.getDocumentHistory().isFullTransmit(self.__case)
+
+    def _getFingerprintInputs(self):
+        """
+        Derived class should override this method if its indexes depend on
+        anything besides the index fields, the case's documents and the
+        transmit history: return a list of those inputs (values with a
+        stable repr), or None if the indexes must always be rebuilt (e.g.
+        they depend on the date, or building them has other effects).
+        """
+        return []
 
     def _preProcessIndex(self):
         """
@@ -119,6 +162,19 @@ class ASAPIndexHandler(object):
         # print 'base class process derived does nothing'
         return True
 
+    def _processIndexText(self, idxPath, idxText):
+        """
+        Derived class should override this method to change the text of
+        an index before it is written to idxPath (the path is already in
+        _getIndexPaths).  Return the text to write.  Raising an exception
+        fails the write, as in writing the file.
+
+        :param str idxPath:
+        :param str idxText:
+        :rtype: str
+        """
+        return idxText
+
     def _postProcessIndex(self):
         """
         Derived class should override this method to perform any
@@ -129,6 +185,15 @@ class ASAPIndexHandler(object):
         # print 'base class postprocess does nothing'
         return True
 
+    def _postProcessBatch(self):
+        """
+        Derived class should override this method to perform any
+        postprocessing that is done once for all of the cases indexed
+        in a batch (such as work collected by _postProcessIndex).
+        Return True if it succeeded.
+        """
+        return True
+
     def _getLogger(self):
         """
         This accessor is so a derived class can get the logger.
@@ -154,6 +219,14 @@ class ASAPIndexHandler(object):
         """
         return self.__acordHandler
 
+    def _getAcordPathIndex(self):
+        """
+        This accessor is so a derived class can look up elements of the
+        first TXLife in the handler by dotted path (if available).  It
+        answers getElement like the TXLife element itself, but faster.
+        """
+        return self.__acordPathIndex
+
     def _getIndexPaths(self):
         """
         This accessor is so a derived class can get a list of index files written
@@ -173,24 +246,25 @@ class ASAPIndexHandler(object):
             if contact.acord103_dir:
                 xmlPath = os.path.join(contact.acord103_dir,
                                        '{trackingid!s:s}.XML'.format(trackingid=self.__case.trackingId))
-                parser = AcordXML.AcordXMLParser()
-                handler = parser.parse(xmlPath)
-                if parser.getException():
+                # the parsed 103 is shared with later users of the same file,
+                # so the handler must not be changed here
+                document = ASAP_UTILITY.getAcordDocumentCache().getDocument(xmlPath)
+                handler = document.handler
+                if document.exception:
                     # exception email should be generated for this, so just return False
                     return False
-                errorHandler = parser.getErrorHandler()
-                if errorHandler.warnings:
+                if document.warnings:
                     self.__logger.info('Warnings parsing {xmlPath!s:s}:'.format(xmlPath=xmlPath))
-                    for warning in errorHandler.warnings:
+                    for warning in document.warnings:
                         self.__logger.info(warning)
-                if errorHandler.errors:
+                if document.errors:
                     self.__logger.warn('Errors parsing {xmlPath!s:s}:'.format(xmlPath=xmlPath))
-                    for error in errorHandler.errors:
+                    for error in document.errors:
                         self.__logger.warn(error)
                     return False
                 if handler:
                     # process acord 103 fields now
-                    txLifeElement = handler.txList[0]
+                    txLifeElement = document.getPathIndex()
                     fError = False
                     # try to process all fields, so all problems that occur can be logged
                     # before deciding to return False
@@ -209,6 +283,7 @@ class ASAPIndexHandler(object):
                     # there were no problems, so assign the handler for access by
                     # a derived class, if needed
                     self.__acordHandler = handler
+                    self.__acordPathIndex = txLifeElement
                 else:
                     self.__logger.warn('No handler was returned from parsing {xmlPath!s:s}.'.format(xmlPath=xmlPath))
                     return False
@@ -227,47 +302,49 @@ class ASAPIndexHandler(object):
         Return True if okay to continue, False if processing should be halted.
         """
         if self.__acord121Fields:
-            # Retrieve ACORD 121 order from blob
-            sQuery = """
-                select blobhandle
-                from rh_blobs
-                where blobid = (select max(blobid)
-                                from acord_order
-                                where source_code = '{source_code!s:s}'
-                                and trackingid = '{trackingid!s:s}')
-                """.format(source_code=self.__case.contact.source_code,
-                           trackingid=self.__case.trackingId)
-            xmitConfig = ASAP_UTILITY.getXmitConfig()
-            acordCursor = xmitConfig.getCursor(xmitConfig.DB_NAME_ACORD)
-            acordCursor.execute(sQuery)
-            rec = acordCursor.fetch(True)
-            if not rec:
-                self.__logger.warn('Unable to locate acord 121 blob for tracking id {trackingid!s:s}'
-                                   .format(trackingid=self.__case.trackingId))
-                return False
+            # the order may have been read and parsed for the batch by ASAPIndexPrefetch
+            document = self.__case.acord121Document
+            if document is None:
+                # Retrieve ACORD 121 order from blob
+                sQuery = """
+                    select blobhandle
+                    from rh_blobs
+                    where blobid = (select max(blobid)
+                                    from acord_order
+                                    where source_code = '{source_code!s:s}'
+                                    and trackingid = '{trackingid!s:s}')
+                    """.format(source_code=self.__case.contact.source_code,
+                               trackingid=self.__case.trackingId)
+                xmitConfig = ASAP_UTILITY.getXmitConfig()
+                acordCursor = xmitConfig.getCursor(xmitConfig.DB_NAME_ACORD)
+                acordCursor.execute(sQuery)
+                rec = acordCursor.fetch(True)
+                if not rec:
+                    self.__logger.warn('Unable to locate acord 121 blob for tracking id {trackingid!s:s}'
+                                       .format(trackingid=self.__case.trackingId))
+                    return False
 
-            data = rec[0].read()
-            acordCursor.rollback()
+                data = rec[0].read()
+                acordCursor.rollback()
+                document = ASAPIndexPrefetch.parseAcord121(self.__case.trackingId, data)
 
-            parser = AcordXML.AcordXMLParser()
-            handler = parser.parseString(data)
-            if parser.getException():
+            handler = document.handler
+            if document.exception:
                 # exception email should be generated for this, so just return False
                 return False
-            errorHandler = parser.getErrorHandler()
-            if errorHandler.warnings:
+            if document.warnings:
                 self.__logger.info('Warnings parsing 121 for {trackingid!s:s}:'.format(trackingid=self.__case.trackingId))
-                for warning in errorHandler.warnings:
+                for warning in document.warnings:
                     self.__logger.info(warning)
-            if errorHandler.errors:
+            if document.errors:
                 self.__logger.warn('Errors parsing 121 for {trackingid!s:s}:'.format(trackingid=self.__case.trackingId))
-                for error in errorHandler.errors:
+                for error in document.errors:
                     self.__logger.warn(error)
                 return False
 
             if handler:
                 # process acord 121 fields now
-                txLifeElement = handler.txList[0]
+                txLifeElement = document.getPathIndex()
                 fError = False
                 # try to process all fields, so all problems that occur can be logged
                 # before deciding to return False
@@ -286,6 +363,7 @@ class ASAPIndexHandler(object):
                 # there were no problems, so assign the handler for access by
                 # a derived class, if needed
                 self.__acordHandler = handler
+                self.__acordPathIndex = txLifeElement
             else:
                 self.__logger.warn('No handler was returned from parsing 121 for {trackingid!s:s}.'
                                    .format(trackingid=self.__case.trackingId))
@@ -370,6 +448,14 @@ class ASAPIndexHandler(object):
                                        .format(ref=ref, field=field.getName()))
                     fError = True
             sid = self.__case.sid
+            limsRecords = self.__case.limsRecords
+            if limsRecords and all([tableName.lower() in limsRecords for tableName in tableFieldMap]):
+                # prefetched for the batch by ASAPIndexPrefetch
+                for tableName in list(tableFieldMap.keys()):
+                    rec = limsRecords[tableName.lower()]
+                    for refValue, field in tableFieldMap[tableName]:
+                        self.__setLIMSValue(field, rec.get(refValue.lower()))
+                return not fError
             cursor = ASAP_UTILITY.getLIMSCursorForSid(sid)
             if cursor:
                 for tableName in list(tableFieldMap.keys()):
@@ -387,12 +473,7 @@ class ASAPIndexHandler(object):
                         index = 0
                         fields = [field for refValue, field in fieldList]
                         for field in fields:
-                            if not rec[index]:
-                                field.setValue('')
-                            elif isinstance(rec[index], datetime.datetime):
-                                field.setValue(rec[index].strftime('%Y-%m-%d %H:%M:%S'))
-                            else:
-                                field.setValue(str(rec[index]))
+                            self.__setLIMSValue(field, rec[index])
                             index += 1
                     else:
                         self.__logger.warn("Field values could not be found in LIMS for sid {sid!s:s}."
@@ -405,6 +486,15 @@ class ASAPIndexHandler(object):
                 return False
         return True
 
+    @staticmethod
+    def __setLIMSValue(field, value):
+        if not value:
+            field.setValue('')
+        elif isinstance(value, datetime.datetime):
+            field.setValue(value.strftime('%Y-%m-%d %H:%M:%S'))
+        else:
+            field.setValue(str(value))
+
     def __writeIndex(self):
         """
         Write index to file.  Format based on document or case index.
@@ -416,7 +506,7 @@ class ASAPIndexHandler(object):
             idxBase = self.__currentDocument.fileName.split('.')[0]
         idxPath = os.path.join(contact.index_dir, '{idxBase!s:s}.IDX'.format(idxBase=idxBase))
         self.__idxPaths.append(idxPath)
-        return contact.index.writeFile(idxPath)
+        return contact.index.writeFile(idxPath, lambda idxText: self._processIndexText(idxPath, idxText))
 
     def __moveImagesToProcessed(self):
         """
@@ -435,18 +525,35 @@ class ASAPIndexHandler(object):
 
     def buildIndexesForCase(self, asapCase):
         """
-        This is the only public method for this class.  Call this to generate index files
-        for a case and its documents.  Index files are generated and stored based upon
-        contact specifications tied to case object.
+        Call this to generate index files for a case and its documents, and call
+        finishBatch once all of the cases of the batch are done.  Index files are
+        generated and stored based upon contact specifications tied to case object.
 
         :param ASAPCase asapCase:
         """
         self.__reset()
         self.__case = asapCase
         self.__case.contact.index.reset()
+        asapCase.indexReused = False
         # call check to build indexes
         if not self._isReadyToIndex():
             return False
+        # reuse the indexes if they were last built from the same inputs
+        fingerprints = ASAP_UTILITY.getIndexFingerprints()
+        fingerprint = None
+        handlerInputs = self._getFingerprintInputs()
+        if handlerInputs is not None:
+            handlerInputs = [self.__class__.__module__, self.__class__.__name__,
+                             self._isFirstTransmit(), self._isFullTransmit()] + list(handlerInputs)
+            fingerprint = fingerprints.compute(asapCase, handlerInputs)
+        idxPaths = fingerprints.restore(asapCase, fingerprint)
+        if idxPaths:
+            self.__idxPaths = idxPaths
+            asapCase.indexReused = True
+            self.__logger.debug('Inputs unchanged for case ({sid!s:s}/{trackingid!s:s}), reused its indexes.'
+                                .format(sid=asapCase.sid, trackingid=asapCase.trackingId))
+            self.__moveImagesToProcessed()
+            return True
         # call custom preprocessing
         if not self._preProcessIndex():
             self.__logger.warn('Preprocess failed for case ({sid!s:s}/{trackingid!s:s}).'
@@ -507,10 +614,33 @@ class ASAPIndexHandler(object):
             self.__logger.warn('Postprocess failed for case ({sid!s:s}/{trackingid!s:s}).'
                                .format(sid=asapCase.sid, trackingid=asapCase.trackingId))
             return False
+        fingerprints.store(asapCase, fingerprint, self.__idxPaths)
         # move indexed images to processed subfolder to prevent reindexing
         self.__moveImagesToProcessed()
         return True
 
+    def finishBatch(self, failedCases=None):
+        """ Call this after buildIndexesForCase has been called for each case of a
+        batch, to finish the work postponed until then, and before the cases are
+        billed.  The cases it failed for are moved to error and appended to
+        failedCases (if given).  Return True if it succeeded for every case.
+
+        :param list[ASAPCase] failedCases:
+        """
+        self.__reset()
+        fSuccess = self._postProcessBatch()
+        if not fSuccess:
+            self.__logger.warn('Postprocess failed for the batch.')
+        batchFailures = self.__batchFailures
+        self.__batchFailures = []
+        for case in batchFailures:
+            case.moveToError()
+            self.__logger.warn('Postprocess failed for case ({sid!s:s}/{trackingid!s:s}) in the batch.'
+                               .format(sid=case.sid, trackingid=case.trackingId))
+            if failedCases is not None:
+                failedCases.append(case)
+        return fSuccess and not batchFailures
+
 
 class TestCustomHandler(ASAPIndexHandler):
     def _preProcessIndex(self):
@@ -0,0 +1,278 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      IndexPrefetch
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPIndexPrefetch class, which reads the
+      data needed to build the indexes of a batch of cases before the cases
+      are indexed, instead of one query per case.  For LIMS fields, each
+      LIMS table named by the contact's index is read once (in chunks of
+      BATCH_SIZE sids) for all of the cases, and the rows are stored on
+      each case (ASAPCase.limsRecords).  The index handler reads the
+      values from there, and falls back to its own query for any case the
+      prefetch did not cover.
+
+      The ACORD 121 orders are read from rh_blobs the same way, in chunks
+      of ACORD121_BATCH_SIZE tracking ids, up to MAX_ACORD121_BYTES of
+      blob data per batch; the cases beyond that are read by the index
+      handler as before.  Each blob is parsed as it is read, and the parsed
+      order is stored on the case (ASAPCase.acord121Document); a blob that
+      fails to parse is skipped, and its case is read by the index handler.
+      The parse is pure Python and holds the GIL, so parsing on threads
+      does not run in parallel, and the parsed handlers cannot be passed
+      back from a process pool; the blobs are therefore parsed in turn.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-047
+          Keep the blobid of the prefetched 121 on the case, for the index
+          fingerprint.
+
+      19-Oct-2026   ilsdev  user-042
+          Parse the 121 blobs in turn instead of on a thread pool, which
+          gained nothing under the GIL, and skip a blob that fails to parse
+          instead of failing the whole prefetch.
+
+      19-Oct-2026   ilsdev  user-049
+          Import the ACORD parser when a 121 is first parsed, so loading
+          ILS.ASAP does not load ILS.AcordXML.
+
+"""
+
+import CRLUtility
+from .AcordDocumentCache import ASAPAcordDocument
+from .Case import ASAPCase
+from .IndexField import ASAPIndexField
+
+
+class ASAPIndexPrefetch(object):
+    """
+    Batch reads of index data for the cases of a contact.
+    """
+    # sids per query
+    BATCH_SIZE = 500
+    # tracking ids per blob query, and blob bytes read per batch
+    ACORD121_BATCH_SIZE = 100
+    MAX_ACORD121_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, logger=None):
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+
+    @staticmethod
+    def getXmitConfig():
+        from .Utility import ASAP_UTILITY
+        return ASAP_UTILITY.getXmitConfig()
+
+    @classmethod
+    def __chunks(cls, values, size=None):
+        size = size or cls.BATCH_SIZE
+        for i in range(0, len(values), size):
+            yield values[i:i + size]
+
+    @staticmethod
+    def __quotedList(values):
+        return ', '.join(["'{value!s:s}'".format(value=value) for value in values])
+
+    @staticmethod
+    def __getFields(contact, source):
+        """
+        Return the contact's index fields that are read from source.
+
+        :rtype: list[ASAPIndexField]
+        """
+        fields = []
+        for name in contact.index.getOrderedFieldNames():
+            field = contact.index.getField(name)
+            if field.getSource() == source:
+                fields.append(field)
+        return fields
+
+    @staticmethod
+    def __groupByContact(asapCases):
+        """
+        Return {contact_id: (contact, [cases])} for the cases.
+        """
+        casesByContact = {}
+        for asapCase in asapCases:
+            if asapCase.contact:
+                casesByContact.setdefault(asapCase.contact.contact_id, (asapCase.contact, []))[1].append(asapCase)
+        return casesByContact
+
+    def prefetch(self, asapCases):
+        """ Read the index data for all of the cases.
+
+        :param list[ASAPCase] asapCases:
+        """
+        for contact, cases in self.__groupByContact(asapCases).values():
+            self.prefetchLIMS(contact, cases)
+            self.prefetchAcord121(contact, cases)
+
+    def __getLIMSDbs(self, sids):
+        """
+        Return {sid: db} for the sids found in LIMS, checking snip before
+        sip as ASAP_UTILITY.getLIMSCursorForSid does.
+        """
+        config = self.getXmitConfig()
+        sidDbs = {}
+        for db in (config.DB_NAME_SNIP, config.DB_NAME_SIP):
+            remaining = [sid for sid in sids if sid not in sidDbs]
+            if not remaining:
+                break
+            cursor = config.getCursor(db)
+            if not cursor:
+                self.__logger.warn('Unable to connect to LIMS.')
+                continue
+            for chunk in self.__chunks(remaining):
+                cursor.execute('''
+                    select sid
+                    from sample
+                    where sid in ({sids!s:s})
+                    and hold_flag_id not in ('~','#')
+                    '''.format(sids=self.__quotedList(chunk)))
+                recs = cursor.fetch()
+                cursor.rollback()
+                for sid, in recs or []:
+                    sidDbs.setdefault(str(sid).strip(), db)
+        return sidDbs
+
+    def prefetchLIMS(self, contact, asapCases):
+        """ Read the LIMS columns used by the contact's index for all of the
+        cases, with one query per table (and per BATCH_SIZE sids), and store
+        the rows on the cases as {table: {column: value}}.  A case whose sid
+        is not in LIMS, or has no row in a table, is left without that
+        table, so the index handler reports it as before.
+
+        :param ASAPContact contact:
+        :param list[ASAPCase] asapCases:
+        """
+        tableColumns = {}
+        for field in self.__getFields(contact, ASAPIndexField.SRC_LIMS):
+            tokens = field.getReference().strip().split('.')
+            if len(tokens) == 2:
+                columns = tableColumns.setdefault(tokens[0].lower(), [])
+                if tokens[1].lower() not in columns:
+                    columns.append(tokens[1].lower())
+        if not tableColumns or not asapCases:
+            return
+        casesBySid = {}
+        for asapCase in asapCases:
+            casesBySid.setdefault(str(asapCase.sid).strip(), []).append(asapCase)
+        sidDbs = self.__getLIMSDbs(sorted(casesBySid.keys()))
+        sidsByDb = {}
+        for sid, db in sidDbs.items():
+            sidsByDb.setdefault(db, []).append(sid)
+        config = self.getXmitConfig()
+        iQueries = 0
+        for db, sids in sidsByDb.items():
+            cursor = config.getCursor(db)
+            for tableName, columns in tableColumns.items():
+                for chunk in self.__chunks(sorted(sids)):
+                    iQueries += 1
+                    cursor.execute('''
+                        select sid, {cols!s:s}
+                        from {table!s:s}
+                        where sid in ({sids!s:s})
+                        '''.format(cols=','.join(columns), table=tableName, sids=self.__quotedList(chunk)))
+                    recs = cursor.fetch()
+                    cursor.rollback()
+                    for rec in recs or []:
+                        for asapCase in casesBySid.get(str(rec[0]).strip(), []):
+                            if asapCase.limsRecords is None:
+                                asapCase.limsRecords = {}
+                            # keep the first row for a sid, as the per-case query did
+                            asapCase.limsRecords.setdefault(tableName, dict(zip(columns, rec[1:])))
+        self.__logger.debug('Prefetched LIMS fields for {count:d} cases of {contact_id!s:s} in {queries:d} queries.'
+                            .format(count=len(asapCases), contact_id=contact.contact_id, queries=iQueries))
+
+    @staticmethod
+    def parseAcord121(trackingId, data):
+        """ Parse a 121 order read from its blob.
+
+        :param str trackingId:
+        :param data: the blob contents
+        :rtype: ASAPAcordDocument
+        """
+        from ILS.AcordXML import AcordXMLParser
+        parser = AcordXMLParser()
+        handler = parser.parseString(data)
+        errorHandler = parser.getErrorHandler()
+        warnings = errors = None
+        if errorHandler:
+            warnings = errorHandler.warnings
+            errors = errorHandler.errors
+        return ASAPAcordDocument(trackingId, handler, parser.getException(), warnings, errors)
+
+    def prefetchAcord121(self, contact, asapCases):
+        """ Read and parse the latest 121 order of each case, if the
+        contact's index has 121 fields, and store it on the case.
+
+        :param ASAPContact contact:
+        :param list[ASAPCase] asapCases:
+        """
+        if not self.__getFields(contact, ASAPIndexField.SRC_ACORD121) or not asapCases:
+            return
+        casesByTrackingId = {}
+        for asapCase in asapCases:
+            if asapCase.acord121Document is None:
+                casesByTrackingId.setdefault(asapCase.trackingId, []).append(asapCase)
+        if not casesByTrackingId:
+            return
+        config = self.getXmitConfig()
+        cursor = config.getCursor(config.DB_NAME_ACORD)
+        if not cursor:
+            return
+        totalBytes = 0
+        iBlobs = 0
+        for chunk in self.__chunks(sorted(casesByTrackingId.keys()), self.ACORD121_BATCH_SIZE):
+            if totalBytes >= self.MAX_ACORD121_BYTES:
+                self.__logger.debug('121 prefetch for {contact_id!s:s} stopped at {bytes:d} bytes.'
+                                    .format(contact_id=contact.contact_id, bytes=totalBytes))
+                break
+            cursor.execute('''
+                select o.trackingid, o.blobid, b.blobhandle
+                from rh_blobs b
+                inner join (select trackingid, max(blobid) blobid
+                            from acord_order
+                            where source_code = '{source_code!s:s}'
+                            and trackingid in ({trackingids!s:s})
+                            group by trackingid) o
+                on b.blobid = o.blobid
+                '''.format(source_code=contact.source_code, trackingids=self.__quotedList(chunk)))
+            recs = cursor.fetch()
+            blobs = []
+            for trackingId, blobId, blobHandle in recs or []:
+                if totalBytes >= self.MAX_ACORD121_BYTES:
+                    break
+                data = blobHandle.read()
+                totalBytes += len(data)
+                blobs.append((trackingId, blobId, data))
+            cursor.rollback()
+            for trackingId, blobId, data in blobs:
+                try:
+                    document = self.parseAcord121(trackingId, data)
+                except Exception:
+                    # leave the case to the index handler's own query
+                    self.__logger.warn('Unable to parse the prefetched 121 of {trackingId!s:s}:'
+                                       .format(trackingId=trackingId), exc_info=True)
+                    continue
+                iBlobs += 1
+                for asapCase in casesByTrackingId.get(trackingId, []):
+                    asapCase.acord121Document = document
+                    asapCase.acord121BlobId = blobId
+        self.__logger.debug('Prefetched {count:d} ACORD 121 orders ({bytes:d} bytes) for {contact_id!s:s}.'
+                            .format(count=iBlobs, bytes=totalBytes, contact_id=contact.contact_id))
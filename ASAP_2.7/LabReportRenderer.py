@@ -0,0 +1,359 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      LabReportRenderer
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPLabReportRenderer class, which converts
+      text lab reports into multi-page TIFF images for the contacts that
+      bundle a lab report with the case (NWN, SVB).  Rendered images are
+      cached by a hash of the report text, so a report that has not changed
+      since the last transmit is copied from the cache instead of being
+      rendered again.  Reports are drawn in-process with PIL using fonts
+      loaded once per process; if PIL or the font is unavailable, the
+      external CRLTextToTiffWithPageCount conversion is used instead.
+
+      Using a cached image marks it as used, and the first batch rendered
+      by a renderer removes the images not used in MAX_CACHE_AGE_DAYS (and
+      any temporary files left by an interrupted write), so the cache
+      only holds the reports of recent cases.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-026
+          Remove cached images not used in MAX_CACHE_AGE_DAYS.
+
+"""
+
+import hashlib
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import CRLUtility
+
+
+class ASAPLabReportRenderer(object):
+    """
+    Renders text lab reports to TIFF images, with a cache of rendered
+    images kept in cacheDir (keyed by a hash of the report text and the
+    render settings) and a worker pool for rendering a batch of reports.
+    """
+    # defaults match the settings the carriers pass to CRLTextToTiffWithPageCount
+    DEFAULT_CANVAS = '8.5/11/200'
+    DEFAULT_FONT_SIZE = '10.7b'
+    DEFAULT_WORKERS = 4
+    # monospace fonts used for the report text (regular, bold)
+    FONT_FILE_REGULAR = 'cour.ttf'
+    FONT_FILE_BOLD = 'courbd.ttf'
+    # page margin in inches
+    PAGE_MARGIN = 0.5
+    # extensions used for cache entries
+    CACHE_EXT_IMAGE = '.tif'
+    CACHE_EXT_PAGES = '.pages'
+    CACHE_EXT_TEMP = '.tmp'
+    # cached images not used for this many days are removed
+    MAX_CACHE_AGE_DAYS = 30
+
+    # fonts are shared by all renderers, keyed by (font file, pixel size)
+    __fonts = {}
+    __fontLock = threading.Lock()
+
+    def __init__(self, cacheDir=None, logger=None, workers=DEFAULT_WORKERS):
+        """
+
+        :param str|None cacheDir: directory for cached images (no caching if None)
+        :param logger:
+        :param int workers: number of reports rendered at once by renderMany
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__cacheDir = cacheDir
+        self.__workers = max(1, int(workers))
+        self.__cacheHits = 0
+        self.__cacheMisses = 0
+        self.__statLock = threading.Lock()
+        self.__fCachePruned = False
+
+    @staticmethod
+    def parseCanvas(sCanvas):
+        """ Parse a canvas spec of the form 'width/height/dpi' (inches, inches, dots per inch).
+
+        :param str sCanvas:
+        :rtype: tuple[float, float, int]
+        """
+        width, height, dpi = sCanvas.split('/')
+        return float(width), float(height), int(dpi)
+
+    @staticmethod
+    def parseFontSize(sFontSize):
+        """ Parse a font size spec of the form '10.7' or '10.7b' (points, optional bold flag).
+
+        :param str sFontSize:
+        :rtype: tuple[float, bool]
+        """
+        fBold = sFontSize.lower().endswith('b')
+        if fBold:
+            sFontSize = sFontSize[:-1]
+        return float(sFontSize), fBold
+
+    @staticmethod
+    def getCacheKey(reportText, sCanvas, sFontSize):
+        """ Hash of the report text and the settings used to render it.
+
+        :param bytes reportText:
+        :param str sCanvas:
+        :param str sFontSize:
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        digest.update('{canvas!s:s}|{fontSize!s:s}|'.format(canvas=sCanvas, fontSize=sFontSize).encode('ascii'))
+        digest.update(reportText)
+        return digest.hexdigest()
+
+    def getCacheStats(self):
+        """
+        Return a tuple of (hits, misses) for this renderer.
+        """
+        return self.__cacheHits, self.__cacheMisses
+
+    def __countCache(self, fHit):
+        with self.__statLock:
+            if fHit:
+                self.__cacheHits += 1
+            else:
+                self.__cacheMisses += 1
+
+    def __getCachePaths(self, cacheKey):
+        return (os.path.join(self.__cacheDir, cacheKey + self.CACHE_EXT_IMAGE),
+                os.path.join(self.__cacheDir, cacheKey + self.CACHE_EXT_PAGES))
+
+    def __readCache(self, cacheKey, tifPath):
+        """
+        Copy a cached image to tifPath.  Return the page count, or None
+        if the report is not in the cache.
+        """
+        if not self.__cacheDir:
+            return None
+        cacheTif, cachePages = self.__getCachePaths(cacheKey)
+        if not (os.path.isfile(cacheTif) and os.path.isfile(cachePages)):
+            return None
+        try:
+            ptr = open(cachePages, 'r')
+            pageCount = int(ptr.read().strip())
+            ptr.close()
+            CRLUtility.CRLCopyFile(cacheTif, tifPath, False, 5)
+            # mark the entry as used, for pruneCache
+            os.utime(cacheTif, None)
+        except Exception:
+            self.__logger.warn('Unable to use cached lab report image {cacheTif!s:s}:'.format(cacheTif=cacheTif), exc_info=True)
+            return None
+        return pageCount
+
+    def __writeCache(self, cacheKey, tifPath, pageCount):
+        """
+        Store a rendered image in the cache.  Files are written under a
+        temporary name first so a concurrent reader never sees a partial entry.
+        """
+        if not self.__cacheDir:
+            return
+        try:
+            if not os.path.isdir(self.__cacheDir):
+                os.makedirs(self.__cacheDir)
+            cacheTif, cachePages = self.__getCachePaths(cacheKey)
+            tmpSuffix = '.{tid:d}{ext!s:s}'.format(tid=threading.current_thread().ident or 0,
+                                                   ext=self.CACHE_EXT_TEMP)
+            CRLUtility.CRLCopyFile(tifPath, cacheTif + tmpSuffix, False, 5)
+            if os.path.isfile(cacheTif):
+                os.remove(cacheTif)
+            os.rename(cacheTif + tmpSuffix, cacheTif)
+            ptr = open(cachePages + tmpSuffix, 'w')
+            ptr.write('{pageCount:d}\n'.format(pageCount=pageCount))
+            ptr.close()
+            if os.path.isfile(cachePages):
+                os.remove(cachePages)
+            os.rename(cachePages + tmpSuffix, cachePages)
+        except Exception:
+            self.__logger.warn('Unable to cache lab report image {tifPath!s:s}:'.format(tifPath=tifPath), exc_info=True)
+
+    def pruneCache(self, maxAgeDays=MAX_CACHE_AGE_DAYS):
+        """ Remove the cached images not used in maxAgeDays, and temporary
+        files older than that.  Return the number of files removed.
+
+        :param float maxAgeDays:
+        :rtype: int
+        """
+        if not self.__cacheDir or not os.path.isdir(self.__cacheDir):
+            return 0
+        cutoff = time.time() - maxAgeDays * 24 * 60 * 60
+        iRemoved = 0
+        for fileName in os.listdir(self.__cacheDir):
+            cacheKey, ext = os.path.splitext(fileName)
+            filePath = os.path.join(self.__cacheDir, fileName)
+            try:
+                if ext == self.CACHE_EXT_IMAGE:
+                    if os.path.getmtime(filePath) >= cutoff:
+                        continue
+                    # remove the page count first, so a reader never finds an image without one
+                    cachePages = os.path.join(self.__cacheDir, cacheKey + self.CACHE_EXT_PAGES)
+                    if os.path.isfile(cachePages):
+                        os.remove(cachePages)
+                        iRemoved += 1
+                elif ext == self.CACHE_EXT_PAGES:
+                    # removed with its image, unless the image is missing
+                    if os.path.isfile(os.path.join(self.__cacheDir, cacheKey + self.CACHE_EXT_IMAGE)):
+                        continue
+                    if os.path.getmtime(filePath) >= cutoff:
+                        continue
+                elif ext != self.CACHE_EXT_TEMP or os.path.getmtime(filePath) >= cutoff:
+                    continue
+                os.remove(filePath)
+                iRemoved += 1
+            except OSError:
+                self.__logger.warn('Unable to remove cached lab report file {filePath!s:s}:'
+                                   .format(filePath=filePath), exc_info=True)
+        if iRemoved:
+            self.__logger.debug('Removed {count:d} old files from the lab report cache {cacheDir!s:s}.'
+                                .format(count=iRemoved, cacheDir=self.__cacheDir))
+        return iRemoved
+
+    @classmethod
+    def _getFont(cls, fontFile, sizePx):
+        """
+        Return a loaded PIL font, loading it only once per process.
+        """
+        key = (fontFile, sizePx)
+        font = cls.__fonts.get(key)
+        if font is None:
+            with cls.__fontLock:
+                font = cls.__fonts.get(key)
+                if font is None:
+                    from PIL import ImageFont
+                    font = ImageFont.truetype(fontFile, sizePx)
+                    cls.__fonts[key] = font
+        return font
+
+    def _renderWithPIL(self, reportText, tifPath, sCanvas, sFontSize):
+        """
+        Draw the report text onto 1-bit pages and save them as a Group 4
+        multi-page TIFF.  Form feeds start a new page, as do lines that
+        run past the bottom margin.  Returns the page count.
+        """
+        from PIL import Image, ImageDraw
+        widthIn, heightIn, dpi = self.parseCanvas(sCanvas)
+        pointSize, fBold = self.parseFontSize(sFontSize)
+        fontFile = self.FONT_FILE_BOLD if fBold else self.FONT_FILE_REGULAR
+        font = self._getFont(fontFile, int(round(pointSize * dpi / 72.0)))
+        ascent, descent = font.getmetrics()
+        lineHeight = ascent + descent
+        pageSize = (int(widthIn * dpi), int(heightIn * dpi))
+        margin = int(self.PAGE_MARGIN * dpi)
+        linesPerPage = max(1, (pageSize[1] - 2 * margin) // lineHeight)
+
+        text = reportText.decode('latin-1').replace('\r\n', '\n').replace('\r', '\n')
+        pageLines = []
+        for formPage in text.split('\f'):
+            lines = [line.expandtabs(8) for line in formPage.split('\n')]
+            for start in range(0, max(1, len(lines)), linesPerPage):
+                pageLines.append(lines[start:start + linesPerPage])
+        # drop a trailing empty page left by a final form feed
+        if len(pageLines) > 1 and not any(line.strip() for line in pageLines[-1]):
+            pageLines.pop()
+
+        pages = []
+        for lines in pageLines:
+            page = Image.new('1', pageSize, 1)
+            draw = ImageDraw.Draw(page)
+            y = margin
+            for line in lines:
+                if line:
+                    draw.text((margin, y), line, font=font, fill=0)
+                y += lineHeight
+            pages.append(page)
+        pages[0].save(tifPath, format='TIFF', compression='group4', dpi=(dpi, dpi),
+                      save_all=True, append_images=pages[1:])
+        return len(pages)
+
+    def render(self, rptFile, tifPath, sCanvas=DEFAULT_CANVAS, sFontSize=DEFAULT_FONT_SIZE):
+        """ Convert a text report to a TIFF image.  The return value has the same
+        form as CRLUtility.CRLTextToTiffWithPageCount, so it can be used in its place.
+
+        :param str rptFile: path to the text report
+        :param str tifPath: path to the TIFF image to create
+        :param str sCanvas:
+        :param str sFontSize:
+        :returns: a tuple of (pageCount, exitCode), where exitCode is 0 on success
+        :rtype: tuple[int, int]
+        """
+        ptr = open(rptFile, 'rb')
+        reportText = ptr.read()
+        ptr.close()
+        cacheKey = self.getCacheKey(reportText, sCanvas, sFontSize)
+        pageCount = self.__readCache(cacheKey, tifPath)
+        if pageCount is not None:
+            self.__countCache(True)
+            self.__logger.debug('Lab report {rptFile!s:s} copied from cache ({pageCount:d} pages).'
+                                .format(rptFile=rptFile, pageCount=pageCount))
+            return pageCount, 0
+        self.__countCache(False)
+        exitCode = 0
+        try:
+            pageCount = self._renderWithPIL(reportText, tifPath, sCanvas, sFontSize)
+        except Exception:
+            self.__logger.info('In-process rendering failed for {rptFile!s:s}, using external conversion:'
+                               .format(rptFile=rptFile), exc_info=True)
+            pageCount, exitCode = CRLUtility.CRLTextToTiffWithPageCount(rptFile, tifPath,
+                                                                        sCanvas=sCanvas, sFontSize=sFontSize)
+        if exitCode == 0 and pageCount and os.path.isfile(tifPath):
+            self.__writeCache(cacheKey, tifPath, pageCount)
+        return pageCount, exitCode
+
+    def renderMany(self, rptTifPairs, sCanvas=DEFAULT_CANVAS, sFontSize=DEFAULT_FONT_SIZE):
+        """ Render a batch of reports using the worker pool.  A failure for one
+        report is logged and returned as (0, -1) without stopping the others.
+
+        :param list[tuple[str, str]] rptTifPairs: list of (rptFile, tifPath)
+        :param str sCanvas:
+        :param str sFontSize:
+        :returns: list of (pageCount, exitCode), in the same order as rptTifPairs
+        :rtype: list[tuple[int, int]]
+        """
+        def renderOne(pair):
+            rptFile, tifPath = pair
+            try:
+                return self.render(rptFile, tifPath, sCanvas, sFontSize)
+            except Exception:
+                self.__logger.warn('Failed to render lab report {rptFile!s:s}:'.format(rptFile=rptFile), exc_info=True)
+                return 0, -1
+
+        with self.__statLock:
+            fPrune = not self.__fCachePruned
+            self.__fCachePruned = True
+        if fPrune:
+            try:
+                self.pruneCache()
+            except Exception:
+                self.__logger.warn('Unable to prune the lab report cache:', exc_info=True)
+        rptTifPairs = list(rptTifPairs)
+        if len(rptTifPairs) <= 1 or self.__workers == 1:
+            return [renderOne(pair) for pair in rptTifPairs]
+        pool = ThreadPool(min(self.__workers, len(rptTifPairs)))
+        try:
+            return pool.map(renderOne, rptTifPairs)
+        finally:
+            pool.close()
+            pool.join()
@@ -19,6 +19,21 @@
       01-Apr-2009
 
   Modification History:
+      19-Oct-2026   ilsdev  user-038
+          Zip, PGP-encrypt and upload the batch as one stream with ASAPTransmitPipeline.
+
+      19-Oct-2026   ilsdev  user-045
+          Build the transact index before it is written (_processIndexText).
+
+      19-Oct-2026   ilsdev  user-047
+          Always rebuild the index, since the batch id and date come from the
+          time it is built.
+
+      19-Oct-2026   ilsdev  user-049
+          Import odbc when a case is first staged.
+
+      19-Oct-2026   ilsdev  user-035
+          Cap the FTP sessions open at once to the Minnesota Life host.
 
 """
 from ILS import ASAP
@@ -28,14 +43,14 @@ from ILS.ASAP.DocumentHistory import ASAPDocumentHistory
 from ILS.ASAP.MainHandler import ASAPMainHandler
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
-from ILS.ASAP.Utility import ASAPUtility
+from ILS.ASAP.Utility import ASAPUtility, ASAP_UTILITY
+from ILS.ASAP.TransmitPipeline import ASAPTransmitPipeline, ASAPPgpEncryptor
 from ILS import ILSDocumentBundling as idb
 from DeltaIdentity import DeltaIdentity
 import CRLUtility
 import datetime
 import glob
 import os
-import odbc
 import sets
 import sys
 import time
@@ -87,31 +102,26 @@ class MNMIndexHandler( ASAPIndexHandler ):
     Custom handler for building indexes for MNM.
     """
     
-    def _postProcessIndex( self ):
-        idxPaths = self._getIndexPaths()
+    def _getFingerprintInputs( self ):
+        # the batch id and date come from the time the index is built
+        return None
+
+    def _processIndexText( self, idxPath, idxText ):
+        # build transact.dat format file in place of the 'intermediary' index
         today = datetime.datetime.today()
-        for idxPath in idxPaths:
-            # build transact.dat format file to replace 'intermediary' index
-            ptr = open( idxPath, 'r' )
-            lines = ptr.readlines()
-            ptr.close()
-            docFields = lines[0].strip().split(',')
-            docMap = {}
-            for field in docFields:
-                name, val = field.split('=')
-                docMap[name] = val
- 
-            batchid = CreateBatchID(today, os.path.basename(idxPath)[:-4])
-            
-            polNum = docMap['POLNUM']
-            if not polNum:
-                polNum = 'LIFE000'
-            transactIdx = CreateTransactIndex(polNum, docMap['DOCNUM'], today, batchid)
-            
-            ptr = open( idxPath, 'w' )
-            ptr.write(transactIdx)
-            ptr.close()
-        return True
+        lines = idxText.splitlines()
+        docFields = lines[0].strip().split(',')
+        docMap = {}
+        for field in docFields:
+            name, val = field.split('=')
+            docMap[name] = val
+
+        batchid = CreateBatchID(today, os.path.basename(idxPath)[:-4])
+
+        polNum = docMap['POLNUM']
+        if not polNum:
+            polNum = 'LIFE000'
+        return CreateTransactIndex(polNum, docMap['DOCNUM'], today, batchid)
 
 class MNMTransmitHandler( ASAPTransmitHandler ):
     """
@@ -195,6 +205,7 @@ class MNMTransmitHandler( ASAPTransmitHandler ):
                                 """ % (ASAP.xmitConfig.DB_NAME_DELTA_QC))
         rec = cursor.fetch(True)
         conString, = rec
+        import odbc
         qcCon = odbc.odbc(conString)
         case = self._getCurrentCase()
         fSuccess = True
@@ -267,8 +278,10 @@ class MNMTransmitHandler( ASAPTransmitHandler ):
     def _transmitStagedCases( self ):
         fSuccess = True
         MNM_FTP_HOSTNAME = 'Minnesota Life'
+        MNM_FTP_MAX_SESSIONS = 2
         MNM_REMOTE_USER = 'Individual Sales and Marketing'
         sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo( MNM_FTP_HOSTNAME )
+        ASAP_UTILITY.getTransportPool().setHostLimit( sServer, MNM_FTP_MAX_SESSIONS )
         contact = self._getContact()
         xmitStagingPath = contact.xmit_dir
         xmitZipPath = os.path.join( xmitStagingPath, 'zip' )
@@ -285,27 +298,32 @@ class MNMTransmitHandler( ASAPTransmitHandler ):
                 sTest = 'test'
             zipFileName = '%sCRLMINNLIFE%s.zip' % (sTest, today.strftime('%Y%m%d%H%M%S'))
             pgpFileName = zipFileName + '.pgp'
-            CRLUtility.CRLZIPFiles( os.path.join(xmitStagingPath, '*.*'),
-                                    os.path.join(xmitZipPath, zipFileName),
-                                    True )
-            iRet = CRLUtility.CRLPGPEncrypt( 'ILS', MNM_REMOTE_USER,
-                                             os.path.join(xmitZipPath, zipFileName),
-                                             os.path.join(xmitPgpPath, pgpFileName))
-            self._getLogger().debug( 'PGP encrypt returned %d.' % iRet )
-            # now move the zip file to the sent folder if PGP encryption
-            # was successful
-            if iRet == 0 and os.path.exists( os.path.join(xmitPgpPath, pgpFileName) ):
-                CRLUtility.CRLCopyFile( os.path.join(xmitZipPath, zipFileName),
-                                        os.path.join(xmitSentPath, zipFileName),
-                                        True, 5 )
-                self._getLogger().info(
-                    'PGP file %s successfully created and ready for transmission.'
-                    % pgpFileName )
+            # zip, encrypt and upload in one stream, keeping the zip in the sent folder;
+            # in test mode the PGP file is only written to the pgp folder
+            sentZipPath = os.path.join( xmitSentPath, zipFileName )
+            if ASAP.devState.isDevInstance():
+                upload = ASAPTransmitPipeline.fileUploader( os.path.join(xmitPgpPath, pgpFileName) )
             else:
+                upload = ASAPTransmitPipeline.ftpUploader( ASAP_UTILITY.getTransportPool(), sServer, sUser, sPassword,
+                                                          './Put/' + pgpFileName )
+            pipeline = ASAPTransmitPipeline( ASAPPgpEncryptor('ILS', MNM_REMOTE_USER),
+                                             xmitZipPath, logger=self._getLogger() )
+            sourceFiles = glob.glob( os.path.join(xmitStagingPath, '*.*') )
+            try:
+                result = pipeline.run( sourceFiles, upload, sentZipPath )
+                self._getLogger().info(
+                    'PGP file %s successfully created and transmitted (%r).'
+                    % (pgpFileName, result) )
+                for sourceFile in sourceFiles:
+                    CRLUtility.CRLDeleteFile( sourceFile )
+            except:
+                # leave the files in the staging folder for the next run
                 fSuccess = False
-                self._getLogger().error( 'Failed to PGP-encrypt file %s for MNM.'
-                                        % zipFileName )
-        # now FTP any unsent PGP files to MNM
+                self._getLogger().error( 'Failed to PGP-encrypt and transmit file %s for MNM:'
+                                         % zipFileName, exc_info=True )
+                if os.path.isfile( sentZipPath ):
+                    CRLUtility.CRLDeleteFile( sentZipPath )
+        # now FTP any PGP files left from earlier runs to MNM
         if not ASAP.devState.isDevInstance():
             pgpFiles = glob.glob( os.path.join(xmitPgpPath, '*.*') )
             for pgpFile in pgpFiles:
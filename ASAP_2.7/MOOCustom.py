@@ -25,11 +25,18 @@
       14-MAY-2021 nelsonj
       Migration to new apphub and updating to python 2.7
 
+      19-Oct-2026 ilsdev  user-037
+      Write the sent-folder archives in one pass with ASAPZipBuilder.
+
+      19-Oct-2026 ilsdev  user-045
+      Add the [Image Data] line before the index is written.
+
 """
 
 from ILS.ASAP.Utility import ASAP_UTILITY
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
+from ILS.ASAP.ZipBuilder import ASAPZipBuilder
 import CRLUtility
 import datetime
 import glob
@@ -47,21 +54,9 @@ class MOOIndexHandler(ASAPIndexHandler):
     Custom handler for building indexes for MOO.
     """
 
-    def _postProcessIndex(self):
-        print('processing indexes')
-        idxPaths = self._getIndexPaths()
-        for idxPath in idxPaths:
-            # Add [Image data] as the first line
-            print('Adding Image Data')
-            idxLines = ['[Image Data]\n']
-            with open(idxPath, 'r') as ptr:
-                lines = ptr.readlines()
-            for line in lines:
-                idxLines.append(line)
-
-            with open(idxPath, 'w') as ptr:
-                ptr.writelines(idxLines)
-        return True
+    def _processIndexText(self, idxPath, idxText):
+        # Add [Image data] as the first line
+        return '[Image Data]\n' + idxText
 
 
 class MOOTransmitHandler(ASAPTransmitHandler):
@@ -164,6 +159,7 @@ class MOOTransmitHandler(ASAPTransmitHandler):
                 work_path = r'\\ILSDFS\sys$\xmit\FTP\MOO_IPS\test\Work'
             else:
                 work_path = r'\\ILSDFS\sys$\xmit\FTP\MOO_IPS\prod\Work'
+            zipBuilders = {}  # type: dict[str, ASAPZipBuilder]
             for asapFile in asapToXmitFiles:
                 try:
                     destFile = os.path.join(work_path, os.path.basename(asapFile.getFullPath()).upper().replace('NDX', 'INI'))
@@ -183,12 +179,23 @@ class MOOTransmitHandler(ASAPTransmitHandler):
                         raise ValueError('Path {filePath!s:s} does not match expected value'
                                          .format(filePath=filePath))
                     zipFilePath = os.path.join(xmitSentPath, zipFileName)
-                    CRLUtility.CRLAddToZIPFile(asapFile.getFullPath(), zipFilePath, True)
+                    if zipFilePath not in zipBuilders:
+                        zipBuilders[zipFilePath] = ASAPZipBuilder(zipFilePath, self._getLogger())
+                    zipBuilders[zipFilePath].addFile(asapFile.getFullPath(), fDeleteSource=True)
                 except:
                     fSuccess = False
                     destFile = os.path.join(retransPath, os.path.basename(asapFile.getFullPath()))
                     CRLUtility.CRLCopyFile(asapFile.getFullPath(), destFile, True)
                     self._getLogger().info('Moved {path!s:s} file to Mutual Of Omaha Retrans Folder...'.format(path=asapFile.getFullPath()))
+            for zipBuilder in zipBuilders.values():
+                try:
+                    zipBuilder.close()
+                except:
+                    fSuccess = False
+                    self._getLogger().warn('Failed to write {path!s:s}:'.format(path=zipBuilder.getZipPath()), exc_info=True)
+                    for sourcePath in zipBuilder.getSourcePaths():
+                        CRLUtility.CRLCopyFile(sourcePath, os.path.join(retransPath, os.path.basename(sourcePath)), True)
+                        self._getLogger().info('Moved {path!s:s} file to Mutual Of Omaha Retrans Folder...'.format(path=sourcePath))
         return fSuccess
 
 
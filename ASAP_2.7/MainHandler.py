@@ -40,6 +40,21 @@
       27-Sep-2019   jbn  SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-043
+          Read the Delta QC fields of exported documents in batches
+          (ASAPDocumentFactory.fromFileNames/fromDocumentIds).
+
+      19-Oct-2026   ilsdev  user-048
+          Get the contacts' index and transmit handlers from the process-wide
+          ASAPHandlerRegistry instead of loading the custom module on each call.
+
+      19-Oct-2026   ilsdev  user-026
+          Added finishIndexBatch.
+
+      19-Oct-2026   ilsdev  user-026
+          finishIndexBatch appends the cases it failed for to failedCases,
+          so they are not billed or reported as having images available.
 """
 
 from .Utility import ASAP_UTILITY
@@ -100,6 +115,7 @@ CASE_FACTORY = ASAP_UTILITY.getCaseFactory()
 DOCUMENT_FACTORY = ASAP_UTILITY.getDocumentFactory()
 DOCUMENT_HISTORY = ASAP_UTILITY.getDocumentHistory()
 ACORD_103_STORE = ASAP_UTILITY.getAcord103Store()
+HANDLER_REGISTRY = ASAP_UTILITY.getHandlerRegistry()
 
 
 class ASAPMainHandler(object):
@@ -127,7 +143,6 @@ class ASAPMainHandler(object):
             self.__logger = logger
         self.__fError = False
         self.__preExportedCasesList = []
-        self.__loadedModules = {}
 
     def getErrorState(self):
         return self.__fError
@@ -567,13 +582,9 @@ class ASAPMainHandler(object):
         exportedCases = []
         # if contact supports document processing, proceed
         if asapContact.document_dir:
-            exportedDocs = []
             imageFiles = glob.glob(os.path.join(asapContact.document_dir, '*.TIF'))
-            for imageFile in imageFiles:
-                fileName = os.path.basename(imageFile)
-                asapDocument = DOCUMENT_FACTORY.fromFileName(fileName)
-                if asapDocument:
-                    exportedDocs.append(asapDocument)
+            # Delta QC fields for all of the images, in grouped queries
+            exportedDocs = DOCUMENT_FACTORY.fromFileNames([os.path.basename(imageFile) for imageFile in imageFiles])
             if exportedDocs:
                 exportedCases = CASE_FACTORY.casesForDocuments(exportedDocs)
                 if exportedCases:
@@ -590,12 +601,18 @@ class ASAPMainHandler(object):
                     # --this is done to make sure all untransmitted case documents are grouped
                     #   together (may lead to some redundant indexing, but should be rare)
                     processedSubdir = XMIT_CONFIG.getSetting(XMIT_CONFIG.SETTING_PROCESSED_SUBDIR)
+                    caseDocIds = []
                     for case in exportedCases:  # type: ASAPCase
                         docIds = DOCUMENT_HISTORY.getTrackedDocidsForCase(case, DOCUMENT_HISTORY.ACTION_RELEASE)
                         docDict = case.getDocuments()
-                        for docId, auditstamp in docIds:
-                            if docId not in docDict:
-                                doc = DOCUMENT_FACTORY.fromDocumentId(docId)
+                        caseDocIds.append((case, [docId for docId, auditstamp in docIds if docId not in docDict]))
+                    # Delta QC fields for the released documents of all cases, in grouped queries
+                    releasedDocs = DOCUMENT_FACTORY.fromDocumentIds(
+                        [docId for case, docIds in caseDocIds for docId in docIds])
+                    for case, docIds in caseDocIds:
+                        for docId in docIds:
+                            if docId not in case.getDocuments():
+                                doc = releasedDocs.get(int(docId))
                                 if doc:
                                     docPath = os.path.join(asapContact.document_dir,
                                                            processedSubdir,
@@ -676,37 +693,9 @@ class ASAPMainHandler(object):
         """
         self.__fError = False
         fSuccess = False
-        # need to get custom class from custom module (table-based data)
-        # and check that it's derived from ASAPIndexHandler, then call
-        # buildIndexesForCase if it is
-        customRec = asapCase.contact.customClasses.get(self.BASE_INDEXHANDLER)
-        handler = None
-        if customRec:
-            customModule, customClass = customRec
-            if customModule in self.__loadedModules:
-                modObj = self.__loadedModules[customModule]
-            else:
-                modObj = CRLUtility.CRLLoadModule(customModule)
-                self.__loadedModules[customModule] = modObj
-            if modObj:
-                classObj = None
-                try:
-                    classObj = getattr(modObj, customClass)
-                except Exception:
-                    self.__logger.warn('Module {customModule!s:s} does not contain class {customClass!s:s}.'
-                                       .format(customModule=customModule, customClass=customClass))
-
-                if (isinstance(classObj, type) and issubclass(classObj, ASAPIndexHandler)):
-                    handler = classObj()
-                else:
-                    self.__logger.warn(
-                        'Class {customClass!s:s} (module {customModule!s:s}) is not a subclass of {BASE_INDEXHANDLER!s:s}.'
-                        .format(customClass=customClass, customModule=customModule, BASE_INDEXHANDLER=self.BASE_INDEXHANDLER))
-            else:
-                self.__logger.warn('Module {customModule!s:s} does not exist.'.format(customModule=customModule))
-        else:
-            # if no custom class is configured, use the base class by default
-            handler = ASAPIndexHandler()
+        # the custom class (table-based data) derived from ASAPIndexHandler, or
+        # the base class if none is configured, as resolved by the registry
+        handler = HANDLER_REGISTRY.getHandler(asapCase.contact, self.BASE_INDEXHANDLER)
         if handler:
             fSuccess = handler.buildIndexesForCase(asapCase)
             # noinspection PyProtectedMember
@@ -716,6 +705,25 @@ class ASAPMainHandler(object):
             self.__fError = not fSuccess
         return fSuccess
 
+    def finishIndexBatch(self, asapContact, failedCases):
+        """ Call this after buildIndexesForCase for each of a contact's cases to
+        index, and before billing them, so the contact's index handler can finish
+        the work it postponed (such as lab reports).
+        NOTE: The parameter failedCases *must* be a list (preferably an empty list)
+        that will be appended to with the cases the work failed for; these are
+        moved to error and must not be billed.
+
+        :param ASAPContact asapContact:
+        :param list[ASAPCase] failedCases:
+        """
+        self.__fError = False
+        fSuccess = True
+        handler = HANDLER_REGISTRY.getHandler(asapContact, self.BASE_INDEXHANDLER)
+        if handler:
+            fSuccess = handler.finishBatch(failedCases)
+        self.__fError = not fSuccess
+        return fSuccess
+
     def stageAndTransmitCases(self, asapCases, asapContact, stagedCases):
         """ Given a list of ASAPCases (all presumed to have been indexed or appropriately
         prepared to be staged for transmission by their related contact), prepare for
@@ -729,33 +737,11 @@ class ASAPMainHandler(object):
         """
         self.__fError = False
         fSuccess = False
-        # need to get custom class from custom module (table-based data)
-        # and check that it's derived from ASAPTransmitHandler, then call
-        # stageAndTransmitCases if it is
-        customRec = asapContact.customClasses.get(self.BASE_TRANSMITHANDLER)
+        # the custom class (table-based data) derived from ASAPTransmitHandler,
+        # as resolved by the registry
         handler = None
-        if customRec:
-            customModule, customClass = customRec
-            if customModule in self.__loadedModules:
-                modObj = self.__loadedModules[customModule]
-            else:
-                modObj = CRLUtility.CRLLoadModule(customModule)
-                self.__loadedModules[customModule] = modObj
-            if modObj:
-                classObj = None
-                try:
-                    classObj = getattr(modObj, customClass)
-                except Exception:
-                    self.__logger.warn('Module {customModule!s:s} does not contain class {customClass!s:s}.'
-                                       .format(customModule=customModule, customClass=customClass))
-                if (isinstance(classObj, type) and issubclass(classObj, ASAPTransmitHandler)):
-                    handler = classObj()
-                else:
-                    self.__logger.warn(
-                        'Class {customClass!s:s} (module {customModule!s:s}) is not a subclass of {BASE_TRANSMITHANDLER!s:s}.'
-                        .format(customClass=customClass, customModule=customModule, BASE_TRANSMITHANDLER=self.BASE_TRANSMITHANDLER))
-            else:
-                self.__logger.warn('Module {customModule!s:s} does not exist.'.format(customModule=customModule))
+        if HANDLER_REGISTRY.isConfigured(asapContact, self.BASE_TRANSMITHANDLER):
+            handler = HANDLER_REGISTRY.getHandler(asapContact, self.BASE_TRANSMITHANDLER)
         else:
             # if no custom class is configured, log and ignore
             self.__logger.info('Contact {contact_id!s:s} not configured for transmitting cases.'
@@ -864,3 +850,9 @@ class ASAPMainHandler(object):
         fSuccess = ASAP_UTILITY.pushAcordStatus(asapCase.trackingId, asapCase.source_code, statusValue)
         self.__fError = not fSuccess
         return fSuccess
+
+
+# index handlers reset themselves for each case, so each thread reuses its own;
+# transmit handlers keep the cases they staged, so one is made for each call
+HANDLER_REGISTRY.register(ASAPMainHandler.BASE_INDEXHANDLER, ASAPIndexHandler, ASAPIndexHandler, True)
+HANDLER_REGISTRY.register(ASAPMainHandler.BASE_TRANSMITHANDLER, ASAPTransmitHandler)
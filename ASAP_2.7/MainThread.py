@@ -20,12 +20,25 @@
       20-Jan-2007
 
   Modification History:
-
+      19-Oct-2026   ilsdev  user-034
+          Purge null file records on a background thread while the run
+          proceeds, and wait for it at the end.
+      19-Oct-2026   ilsdev  user-035
+          Close pooled SFTP/FTP sessions at the end of the run.
+      19-Oct-2026   ilsdev  user-049
+          Time module imports from startup to the end of the run, and log
+          the slowest (ImportProfile).
+      19-Oct-2026   ilsdev  user-050
+          Only start threads for the contacts with pending work (ContactScan).
 """
 # import sets
 
 import time
 
+# start timing imports before the package is loaded
+from ILS.ASAP.ImportProfile import IMPORT_PROFILE
+IMPORT_PROFILE.start()
+
 from ILS.ASAP.Utility import ASAP_UTILITY
 from ILS.ASAP.ContactThread import ASAPContactThread
 from ILS.ASAP.MainHandler import ASAPMainHandler
@@ -38,9 +51,10 @@ def run():
     logger = ASAP_UTILITY.asapLogger
     logger.info('\n\n{}'.format('-' * 100))
     config = ASAP_UTILITY.getXmitConfig()
+    purgeThread = None
     try:
         fm = ASAP_UTILITY.getASAPFileManager()
-        fm.purgeNullFiles()
+        purgeThread = fm.purgeNullFilesInBackground(logger=logger)
         contacts = config.getContacts()
         mainHandler = ASAPMainHandler(logger)
         # export cases
@@ -50,9 +64,9 @@ def run():
             mainHandler.exportCase(case)
             fError = mainHandler.getErrorState() or fError
         mainHandler.reportPreExportedCases()
-        # process all configured ASAP contacts, then do a join on each thread
+        # process the configured ASAP contacts that have work, then do a join on each thread
         contactThreads = []
-        for contact in list(contacts.values()):
+        for contact in ASAP_UTILITY.getContactScan().getContactsWithWork(list(contacts.values())):
             contactThread = ASAPContactThread(contact, logger)
             contactThreads.append(contactThread)
         # use a thread pool of size 5
@@ -78,6 +92,11 @@ def run():
                 fComplete = True
     except Exception:
         logger.exception('Error')
+    if purgeThread:
+        purgeThread.join()
+    ASAP_UTILITY.getTransportPool().closeAll()
+    IMPORT_PROFILE.stop()
+    IMPORT_PROFILE.report(logger)
     if fError:
         logger.error('There was at least one error exporting released ASAP cases.')
     logger.info('ASAP processing complete.')
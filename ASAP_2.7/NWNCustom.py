@@ -30,17 +30,37 @@
          Updated the script to OldApphub version.
       26-Apr-2018      Manjusha    SCTASK0017656
          Updated prefix for Labs from CRL to CRL_L_.
+      19-Oct-2026      ilsdev      user-026
+         Render lab reports through ASAPLabReportRenderer (cached by report text,
+         in-process, several reports at once).
+      19-Oct-2026      ilsdev      user-038
+         Zip, PGP-encrypt and upload the batch as one stream with ASAPTransmitPipeline.
+      19-Oct-2026      ilsdev      user-047
+         Always rebuild the index, since postprocessing builds the lab report.
+      19-Oct-2026      ilsdev      user-049
+         Remove the unused AcordXML import.
+      19-Oct-2026      ilsdev      user-026
+         Use raw strings for the NWN folder map; a backslash followed by N is not
+         a valid escape in Python 3, so the module did not compile there.
+      19-Oct-2026      ilsdev      user-026
+         Render the lab reports of the whole batch together (_postProcessBatch)
+         instead of one report per case.
+      19-Oct-2026      ilsdev      user-026
+         A case whose lab report could not be built is failed for the batch
+         (_failBatchCase), so it is moved to error instead of being billed.
+      19-Oct-2026      ilsdev      user-035
+         Cap the FTP sessions open at once to the ING host (shared with ING).
 
 """
 from ILS import ASAP
-from ILS                        import AcordXML
 from ILS.ASAP.CaseFactory       import ASAPCaseFactory
 from ILS.ASAP.DocumentFactory   import ASAPDocumentFactory
 from ILS.ASAP.DocumentHistory   import ASAPDocumentHistory
 from ILS.ASAP.IndexHandler      import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler   import ASAPTransmitHandler
 from ILS.ASAP.FileManager       import ASAPFileManager
-from ILS.ASAP.Utility           import ASAPUtility
+from ILS.ASAP.Utility           import ASAPUtility, ASAP_UTILITY
+from ILS.ASAP.TransmitPipeline  import ASAPTransmitPipeline, ASAPPgpEncryptor
 import CRLUtility
 import datetime
 import glob
@@ -60,9 +80,19 @@ class NWNIndexHandler( ASAPIndexHandler ):
     Custom handler for building indexes for NWN.
     """
 
+    def __init__( self ):
+        ASAPIndexHandler.__init__( self )
+        # lab reports to build at the end of the batch: (case, NWN folder, model index file)
+        self.__labReports = []
+
+    def _getFingerprintInputs( self ):
+        # postprocessing builds the lab report and its index
+        return None
+
     def _postProcessIndex( self ):
         """
-        Build image and index for NWN lab report.
+        Build text report for NWN lab report; its image and index are built
+        with the rest of the batch in _postProcessBatch.
         Must be a full transmit or a partial transmit with a labslip. And the LIMS
         sample must have transmitted.
         """        
@@ -84,33 +114,67 @@ class NWNIndexHandler( ASAPIndexHandler ):
                 return False
 
             nwnFolderMap = {
-                'nwnacsasmm': 'NWN\NWN_ACSA',
-                'nwnarlismm': 'NWN\NWN_ARLI',
-                'nwnalnysmm': 'NWN\NWN_ALNY',
-                'nwnrlismm' : 'NWN\NWN_RLI',
-                'nwnrlnysmm': 'NWN\NWN_RLNY',
-                'nwnvrlismm': 'NWN\NWN_VRLI',
-                'nwnvrnysmm': 'NWN\NWN_VRNY'
+                'nwnacsasmm': r'NWN\NWN_ACSA',
+                'nwnarlismm': r'NWN\NWN_ARLI',
+                'nwnalnysmm': r'NWN\NWN_ALNY',
+                'nwnrlismm' : r'NWN\NWN_RLI',
+                'nwnrlnysmm': r'NWN\NWN_RLNY',
+                'nwnvrlismm': r'NWN\NWN_VRLI',
+                'nwnvrnysmm': r'NWN\NWN_VRNY'
             }
 
-            fError, pageCount = self.buildLabReport(case.sid, nwnFolderMap.get(case.contact.contact_id)) 
-
-            if fError:
-                self._getLogger().warn('Unable to process lab report for %s: ' % case.sid, exc_info=True )        
-                    
-            self.buildLabReportIndex( case, pageCount )
-            
-            #remove txt lab report from reports/processed folder
-            txtReport = os.path.join( os.path.join(os.path.dirname(xmitDir), 'reports'), 'processed' ,'%s.txt' % case.sid )
-            s = glob.glob(txtReport)
-            if s:
-                CRLUtility.CRLDeleteFile( txtReport ) 
+            idxPaths = self._getIndexPaths()
+            self.__labReports.append( (case, nwnFolderMap.get(case.contact.contact_id), idxPaths and idxPaths[0]) )
                     
         except:
             self._getLogger().warn('PostProcessIndex failed with exception: ', exc_info=True)
 
         return True
 
+    def _postProcessBatch( self ):
+        """
+        Build images and indexes for the lab reports of the batch, rendering the
+        images of each NWN folder together.
+        """
+        labReports = self.__labReports
+        self.__labReports = []
+        results = {}
+        sidsByFolder = {}
+        for case, NWNFolder, modelIdxFile in labReports:
+            sidsByFolder.setdefault( NWNFolder, [] ).append( case.sid )
+        for NWNFolder, sids in sidsByFolder.items():
+            try:
+                for sid, result in self.buildLabReports( sids, NWNFolder ).items():
+                    results[(NWNFolder, sid)] = result
+            except:
+                self._getLogger().warn('Unable to build lab report images for %s: ' % NWNFolder, exc_info=True)
+
+        for case, NWNFolder, modelIdxFile in labReports:
+            if (NWNFolder, case.sid) not in results:
+                # the case is not billed without its lab report
+                self._failBatchCase( case )
+                continue
+            try:
+                fError, pageCount = results[(NWNFolder, case.sid)]
+                if fError:
+                    self._getLogger().warn('Unable to process lab report for %s.' % case.sid)
+                    self._failBatchCase( case )
+                    continue
+
+                self.buildLabReportIndex( case, pageCount, modelIdxFile )
+
+                #remove txt lab report from reports/processed folder
+                xmitDir = case.contact.xmit_dir
+                txtReport = os.path.join( os.path.join(os.path.dirname(xmitDir), 'reports'), 'processed' ,'%s.txt' % case.sid )
+                s = glob.glob(txtReport)
+                if s:
+                    CRLUtility.CRLDeleteFile( txtReport )
+            except:
+                self._getLogger().warn('PostProcessBatch failed for %s with exception: ' % case.sid, exc_info=True)
+                self._failBatchCase( case )
+
+        return True
+
     def isReadyToBuildLabReport( self, case ):
         """
         Check whether lab report is needed for this case transmission.
@@ -139,12 +203,12 @@ class NWNIndexHandler( ASAPIndexHandler ):
                 
         return False        
 
-    def buildLabReport( self, sid, NWNFolder ):
+    def buildLabReports( self, sids, NWNFolder ):
         """
-        Convert txt file to image file.
+        Convert the txt files of the sids to image files, rendering them together.
+        Returns a dictionary of sid: (fError, pageCount).
         """
-        fError = False
-        pageCount = 0
+        labReports = {}
 
         # constants that differ between prod and dev
         sTest = ''
@@ -155,45 +219,70 @@ class NWNIndexHandler( ASAPIndexHandler ):
         #NWN_IMAGING_DIR = os.path.join( r'\\ntsys1\ils_appl\data\xmit\ftp\NWN\NWN_RLI\test\imaging')
 
         reportStagingPath = os.path.join( NWN_IMAGING_DIR, 'reports' )
+
+        rptFilesBySid = {}
+        rptTifPairs = []
+        for sid in sids:
+            if sid in rptFilesBySid:
+                continue
+            rptFiles = glob.glob( os.path.join(reportStagingPath, '%s.txt' % sid) )
+            rptFilesBySid[sid] = rptFiles
+            for rptFile in rptFiles:
+                tif = os.path.join( reportStagingPath, os.path.splitext(os.path.basename(rptFile))[0] + '.tif' )
+                rptTifPairs.append( (rptFile, tif) )
+        #reduce font size to avoid blank pages in the lab report
+        renderer = ASAP_UTILITY.getLabReportRenderer( os.path.join(reportStagingPath, 'cache') )
+        results = renderer.renderMany( rptTifPairs, sCanvas = '8.5/11/200', sFontSize = '10.7b' )
+        rendered = dict( [ (rptFile, (tif, result)) for (rptFile, tif), result in zip(rptTifPairs, results) ] )
+
+        for sid, rptFiles in rptFilesBySid.items():
+            fError = False
+            pageCount = 0
+            for rptFile in rptFiles:
+                tif, (pageCount, exitCode) = rendered[rptFile]
+                fError = self.__moveLabReport( sid, rptFile, tif, reportStagingPath ) or fError
+            labReports[sid] = ( fError, pageCount )
+
+        return labReports
+
+    def __moveLabReport( self, sid, rptFile, tif, reportStagingPath ):
+        """
+        Move a converted txt file to the processed folder, or to the error folder
+        if it was not converted.  Returns True if there was an error.
+        """
+        fError = False
+        fMoveToError = False
         processedPath = os.path.join( reportStagingPath, 'processed' )
         errorPath = os.path.join( reportStagingPath, 'error' )
 
-        rptFiles = glob.glob( os.path.join(reportStagingPath, '%s.txt' % sid) )    
-        for rptFile in rptFiles:
-            fMoveToError = False
-            sidText = os.path.splitext(os.path.basename(rptFile))[0]
-            tif = os.path.join( reportStagingPath, sidText + '.tif' )
-        
-            #reduce font size to avoid blank pages in the lab report
-            pageCount, exitCode = CRLUtility.CRLTextToTiffWithPageCount( rptFile, tif, sCanvas = '8.5/11/200', sFontSize = '10.7b' )
-
-            if os.path.isfile(tif):
-                # now move files to processed folder
-                CRLUtility.CRLCopyFile(rptFile,
-                                       os.path.join(processedPath, os.path.basename(rptFile)),
-                                       True, 5)
-            else:
-                fError = True
-                fMoveToError = True
-                self._getLogger().warn('Failed to create TIF image for text report %s.' % rptFile)
+        if os.path.isfile(tif):
+            # now move files to processed folder
+            CRLUtility.CRLCopyFile(rptFile,
+                                   os.path.join(processedPath, os.path.basename(rptFile)),
+                                   True, 5)
+        else:
+            fError = True
+            fMoveToError = True
+            self._getLogger().warn('Failed to create TIF image for text report %s.' % rptFile)
 
-            # report file should have been processed, so if any are left, they are unmatched
-            sidRptFile = glob.glob(os.path.join(reportStagingPath, '*%s*.txt' % sid))
-            if sidRptFile:
-                fError = True
-                fMoveToError = True
-                self._getLogger().warn('Text report for %s was left in %s. Moving to error sub-directory' %
-                                       (sid, reportStagingPath))
+        # report file should have been processed, so if any are left, they are unmatched
+        sidRptFile = glob.glob(os.path.join(reportStagingPath, '*%s*.txt' % sid))
+        if sidRptFile:
+            fError = True
+            fMoveToError = True
+            self._getLogger().warn('Text report for %s was left in %s. Moving to error sub-directory' %
+                                   (sid, reportStagingPath))
 
-            if fMoveToError:
-                CRLUtility.CRLCopyFile(rptFile, os.path.join(errorPath, os.path.basename(rptFile)), True, 5)
+        if fMoveToError:
+            CRLUtility.CRLCopyFile(rptFile, os.path.join(errorPath, os.path.basename(rptFile)), True, 5)
 
-        return fError, pageCount
+        return fError
 
                         
-    def buildLabReportIndex( self, case, pageCount ): 
+    def buildLabReportIndex( self, case, pageCount, idxFile = None ): 
         """
         Build the index for the lab report using another index file for the case as a model
+        (idxFile, or the first index built for the current case)
         """
 
         delim = '='
@@ -201,9 +290,10 @@ class NWNIndexHandler( ASAPIndexHandler ):
         pagenumfield = 'PAGES'               
         labworkdoctype = 'LABWORK' 
                                 
-        idxPaths = self._getIndexPaths()
-        if idxPaths and os.path.isfile( idxPaths[0] ):
-            idxFile = idxPaths[0]                    
+        if not idxFile:
+            idxPaths = self._getIndexPaths()
+            idxFile = idxPaths and idxPaths[0]
+        if idxFile and os.path.isfile( idxFile ):
             ptr = open( idxFile, 'r' )
             lines = ptr.readlines()
             ptr.close()
@@ -340,6 +430,7 @@ class NWNTransmitHandler( ASAPTransmitHandler ):
     def _transmitStagedCases( self ):
         fSuccess = True
         ING_FTP_HOSTNAME = 'ING'
+        ING_FTP_MAX_SESSIONS = 2    # shared with the ING contacts, which upload to the same host
         ING_PUBLIC_KEY = r'\\Ntsys1\Crl_appl\Data\pgp\ils\ing.asc'
         ING_REMOTE_USER = 'Reliastar lockbox diffie'
         ING_CONTACT_AGENCY_MAP = {
@@ -353,6 +444,7 @@ class NWNTransmitHandler( ASAPTransmitHandler ):
             }
         
         sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo( ING_FTP_HOSTNAME )
+        ASAP_UTILITY.getTransportPool().setHostLimit( sServer, ING_FTP_MAX_SESSIONS )
         contact = self._getContact()
         xmitStagingPath = contact.xmit_dir
         xmitZipPath = os.path.join(xmitStagingPath, 'zip')
@@ -372,25 +464,31 @@ class NWNTransmitHandler( ASAPTransmitHandler ):
                 self._getLogger().warn('Contact %s does not have an agency abbreviation for the zip file name.' % contact.contact_id)
                 return False
             pgpFileName = zipFileName
-            asapZipFile = fm.newFile( os.path.join(xmitZipPath, zipFileName), True )
-            for asapFile in asapToXmitFiles:
-                CRLUtility.CRLAddToZIPFile(asapFile.getFullPath(), asapZipFile.getFullPath(), False)
-                fm.deleteFile(asapFile)
-            iRet = CRLUtility.CRLPGPEncrypt('ILS', ING_REMOTE_USER, asapZipFile.getFullPath(), os.path.join(xmitPgpPath, pgpFileName))
-            self._getLogger().debug('PGP encrypt returned %d.' % iRet)
-            # now move the zip file to the sent folder if PGP encryption was successful
-            if iRet == 0 and os.path.exists(os.path.join(xmitPgpPath, pgpFileName)):
-                asapSentZipFile = fm.moveFile(asapZipFile, os.path.join(xmitSentPath, asapZipFile.fileName))
-                self._getLogger().info('PGP file %s successfully created and ready for transmission.'
-                    % pgpFileName)
+            # zip, encrypt and upload in one stream, keeping the zip in the sent folder;
+            # in test mode the PGP file is only written to the pgp folder
+            sentZipPath = os.path.join(xmitSentPath, zipFileName)
+            if ASAP.devState.isDevInstance():
+                upload = ASAPTransmitPipeline.fileUploader(os.path.join(xmitPgpPath, pgpFileName))
             else:
+                upload = ASAPTransmitPipeline.ftpUploader(ASAP_UTILITY.getTransportPool(), sServer, sUser, sPassword,
+                                                          '/usr/local/ftp/CRL/' + pgpFileName)
+            pipeline = ASAPTransmitPipeline(ASAPPgpEncryptor('ILS', ING_REMOTE_USER), xmitZipPath, logger=self._getLogger())
+            try:
+                result = pipeline.run([asapFile.getFullPath() for asapFile in asapToXmitFiles], upload, sentZipPath)
+                self._getLogger().info('PGP file %s successfully created and transmitted (%r).' % (pgpFileName, result))
+            except:
                 fSuccess = False
-                self._getLogger().warn('Failed to PGP-encrypt file %s for ING (extracting zip to retrans folder).' %
-                                       asapZipFile.fileName)
-                CRLUtility.CRLUnzipFile(asapZipFile.getFullPath(), retransPath)
-                fm.deleteFile(asapZipFile)
+                self._getLogger().warn('Failed to transmit file %s to ING (moving files to retrans folder):' % pgpFileName,
+                                       exc_info=True)
+                if os.path.isfile(sentZipPath):
+                    CRLUtility.CRLUnzipFile(sentZipPath, retransPath)
+                else:
+                    for asapFile in asapToXmitFiles:
+                        CRLUtility.CRLCopyFile(asapFile.getFullPath(), os.path.join(retransPath, asapFile.fileName), False, 5)
+            for asapFile in asapToXmitFiles:
+                fm.deleteFile(asapFile)
                 
-        # now FTP any unsent PGP files to ING, only if we're not in test mode
+        # now FTP any PGP files left from earlier runs to ING, only if we're not in test mode
         if not ASAP.devState.isDevInstance():
             asapPgpFiles = fm.glob( os.path.join(xmitPgpPath, '*.*') )
             for asapPgpFile in asapPgpFiles:
@@ -0,0 +1,344 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      Outbox
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPOutbox class, a durable list of uploads
+      that failed and are waiting to be retried, kept in the asap_outbox
+      table.  Each entry has an attempt count and the time of its next
+      attempt, which backs off exponentially after each failure.  A transmit
+      handler queues a failed upload with enqueue and then calls process,
+      which retries the contact's entries as they come due, waiting for
+      them for up to DEFAULT_MAX_WAIT seconds (never more than
+      MAX_WAIT_LIMIT).  With the default delays an upload that failed is
+      tried again 30, 90 and 210 seconds later, so a transient FTP/SFTP
+      failure is recovered within minutes in the same run, without
+      unzipping and re-staging the case.  process only waits when the
+      contact has queued entries, and returns once they are all sent or
+      the next one is due after the deadline.  Entries that are not sent
+      by then are picked up again by the next run; entries that fail too
+      many times are given up so the handler can fall back to its retrans
+      folder.
+
+      The handler keeps queued files in a folder its _preStage does not
+      clean up (the outbox subfolder of the transmit folder).
+
+      ASAPOutbox.createTable creates the table in the xmit database (SQL
+      Server); run this module with the create argument to do so.
+      createOutboxSchema creates it in a sqlite database (see
+      ASAPSqliteCursor), which can stand in for the xmit database.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-039
+          process makes one pass over the due entries by default, and never
+          waits longer than MAX_WAIT_LIMIT (it used to sleep for up to 900
+          seconds in the contact thread).
+
+      19-Oct-2026   ilsdev  user-039
+          process waits for retries coming due for up to five minutes, so a
+          failed upload is retried within the run instead of the next one.
+          Added createTable for the SQL Server table.
+
+"""
+
+import os
+import threading
+import time
+
+import CRLUtility
+
+
+class ASAPOutboxItem(object):
+    """
+    One queued upload.
+    """
+    STATE_PENDING = 'PENDING'
+    STATE_SENT = 'SENT'
+    STATE_FAILED = 'FAILED'
+
+    def __init__(self, itemId, contactId, filePath, remotePath, state, attempts, nextAttempt, lastError):
+        self.itemId = itemId
+        self.contactId = contactId
+        self.filePath = filePath
+        self.remotePath = remotePath
+        self.state = state
+        self.attempts = attempts
+        self.nextAttempt = nextAttempt
+        self.lastError = lastError
+
+    def __repr__(self):
+        return '<ASAPOutboxItem {itemId!s:s} {filePath!s:s} {state!s:s} after {attempts:d} attempts>'.format(
+            itemId=self.itemId, filePath=self.filePath, state=self.state, attempts=self.attempts)
+
+
+class ASAPOutbox(object):
+    """
+    Queue of failed uploads, retried with exponential backoff.
+    """
+    TABLE_OUTBOX = 'asap_outbox'
+    DEFAULT_BASE_DELAY = 30
+    DEFAULT_MAX_DELAY = 1800
+    DEFAULT_MAX_ATTEMPTS = 8
+    # seconds process waits for entries coming due, and never more than the limit
+    DEFAULT_MAX_WAIT = 300
+    MAX_WAIT_LIMIT = 600
+
+    def __init__(self, cursor=None, logger=None, baseDelay=DEFAULT_BASE_DELAY,
+                 maxDelay=DEFAULT_MAX_DELAY, maxAttempts=DEFAULT_MAX_ATTEMPTS):
+        """
+
+        :param cursor: cursor for the asap_outbox table (default is the xmit database)
+        :param logger:
+        :param int baseDelay: seconds before the first retry; doubled after each failure
+        :param int maxDelay: longest wait between retries
+        :param int maxAttempts: failed attempts (including the first upload) before giving up
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__cursor = cursor
+        self.__baseDelay = baseDelay
+        self.__maxDelay = maxDelay
+        self.__maxAttempts = max(1, int(maxAttempts))
+        # the cursor is shared by the contact threads
+        self.__lock = threading.RLock()
+
+    def getCursor(self):
+        if not self.__cursor:
+            from .Utility import ASAP_UTILITY
+            xmitConfig = ASAP_UTILITY.getXmitConfig()
+            self.__cursor = xmitConfig.getCursor(xmitConfig.DB_NAME_XMIT)
+        return self.__cursor
+
+    def getDelay(self, attempts):
+        """ Return the seconds to wait after the given number of failed attempts.
+
+        :param int attempts:
+        :rtype: int
+        """
+        return min(self.__maxDelay, self.__baseDelay * 2 ** max(0, attempts - 1))
+
+    def createTable(self):
+        """
+        Create the asap_outbox table in the xmit database (SQL Server), if not already there.
+        """
+        with self.__lock:
+            cursor = self.getCursor()
+            cursor.execute('''
+                if object_id('{table!s:s}', 'U') is null
+                begin
+                    create table {table!s:s} (
+                        id int identity(1, 1) not null primary key,
+                        contact_id varchar(50) not null,
+                        file_path varchar(500) not null,
+                        remote_path varchar(500) not null,
+                        state varchar(20) not null,
+                        attempts int not null,
+                        next_attempt float not null,
+                        last_error varchar(1000) null)
+                    create index ix_{table!s:s}_contact on {table!s:s} (contact_id, state, next_attempt)
+                end
+                '''.format(table=self.TABLE_OUTBOX))
+            cursor.commit()
+
+    @staticmethod
+    def __quote(value):
+        return '{value!s:s}'.format(value=value).replace("'", "''")
+
+    def enqueue(self, contactId, filePath, remotePath, error=None):
+        """ Queue a file whose upload failed once already.  The first retry is
+        due after the base delay.
+
+        :param str contactId:
+        :param str filePath: the file to send, in a folder the handler leaves alone
+        :param str remotePath: where to put it on the server
+        :param error: the exception or message from the failed upload
+        :rtype: ASAPOutboxItem
+        """
+        nextAttempt = time.time() + self.getDelay(1)
+        lastError = self.__quote(error or '')[:1000]
+        with self.__lock:
+            cursor = self.getCursor()
+            cursor.execute('''
+                insert into {table!s:s} (contact_id, file_path, remote_path, state, attempts, next_attempt, last_error)
+                values ('{contact_id!s:s}', '{file_path!s:s}', '{remote_path!s:s}', '{state!s:s}', 1, {next_attempt:f}, '{last_error!s:s}')
+                '''.format(table=self.TABLE_OUTBOX, contact_id=self.__quote(contactId),
+                           file_path=self.__quote(filePath), remote_path=self.__quote(remotePath),
+                           state=ASAPOutboxItem.STATE_PENDING, next_attempt=nextAttempt, last_error=lastError))
+            cursor.commit()
+            cursor.execute('''
+                select max(id) from {table!s:s}
+                where contact_id = '{contact_id!s:s}' and file_path = '{file_path!s:s}'
+                '''.format(table=self.TABLE_OUTBOX, contact_id=self.__quote(contactId),
+                           file_path=self.__quote(filePath)))
+            rec = cursor.fetch(True)
+            cursor.rollback()
+        self.__logger.info('Queued {filePath!s:s} for another upload attempt in {delay:.0f} seconds.'
+                           .format(filePath=filePath, delay=self.getDelay(1)))
+        return ASAPOutboxItem(rec[0] if rec else None, contactId, filePath, remotePath,
+                              ASAPOutboxItem.STATE_PENDING, 1, nextAttempt, lastError)
+
+    def getPending(self, contactId):
+        """ Return the contact's queued items, earliest due first.
+
+        :param str contactId:
+        :rtype: list[ASAPOutboxItem]
+        """
+        with self.__lock:
+            cursor = self.getCursor()
+            cursor.execute('''
+                select id, contact_id, file_path, remote_path, state, attempts, next_attempt, last_error
+                from {table!s:s} with (nolock)
+                where contact_id = '{contact_id!s:s}' and state = '{state!s:s}'
+                order by next_attempt
+                '''.format(table=self.TABLE_OUTBOX, contact_id=self.__quote(contactId),
+                           state=ASAPOutboxItem.STATE_PENDING))
+            recs = cursor.fetch()
+            cursor.rollback()
+        return [ASAPOutboxItem(itemId, itemContactId, filePath, remotePath, state, int(attempts),
+                               float(nextAttempt), lastError)
+                for itemId, itemContactId, filePath, remotePath, state, attempts, nextAttempt, lastError in recs or []]
+
+    def __update(self, item):
+        with self.__lock:
+            cursor = self.getCursor()
+            cursor.execute('''
+                update {table!s:s}
+                set state = '{state!s:s}', attempts = {attempts:d}, next_attempt = {next_attempt:f},
+                last_error = '{last_error!s:s}'
+                where id = {id!s:s}
+                '''.format(table=self.TABLE_OUTBOX, state=item.state, attempts=item.attempts,
+                           next_attempt=item.nextAttempt, last_error=self.__quote(item.lastError or '')[:1000],
+                           id=item.itemId))
+            cursor.commit()
+
+    def markSent(self, item):
+        """
+        Record that the item was uploaded.
+        """
+        item.state = ASAPOutboxItem.STATE_SENT
+        item.attempts += 1
+        self.__update(item)
+
+    def markFailed(self, item, error):
+        """ Record a failed attempt and schedule the next one.  Return True
+        if the item has now failed too many times and was given up.
+
+        :param ASAPOutboxItem item:
+        :param error:
+        :rtype: bool
+        """
+        item.attempts += 1
+        item.lastError = '{error!s:s}'.format(error=error)
+        if item.attempts >= self.__maxAttempts:
+            item.state = ASAPOutboxItem.STATE_FAILED
+        else:
+            item.nextAttempt = time.time() + self.getDelay(item.attempts)
+        self.__update(item)
+        return item.state == ASAPOutboxItem.STATE_FAILED
+
+    def process(self, contactId, upload, maxWait=DEFAULT_MAX_WAIT):
+        """ Retry the contact's queued uploads as they come due, waiting up to
+        maxWait seconds (at most MAX_WAIT_LIMIT) for the later ones, and
+        retrying the ones that fail again within that time.  upload(item)
+        must raise if the upload fails.  Return (sent, abandoned), the items
+        uploaded and the items given up on this call; any others stay queued
+        for the next run.
+
+        :param str contactId:
+        :param upload: callable taking an ASAPOutboxItem
+        :param int maxWait:
+        :rtype: tuple[list[ASAPOutboxItem], list[ASAPOutboxItem]]
+        """
+        sent = []
+        abandoned = []
+        deadline = time.time() + min(maxWait, self.MAX_WAIT_LIMIT)
+        while True:
+            pending = self.getPending(contactId)
+            if not pending:
+                break
+            now = time.time()
+            for item in pending:
+                if item.nextAttempt > now:
+                    continue
+                if not os.path.isfile(item.filePath):
+                    item.state = ASAPOutboxItem.STATE_FAILED
+                    item.lastError = 'File not found.'
+                    self.__update(item)
+                    self.__logger.warn('Queued file {filePath!s:s} no longer exists.'.format(filePath=item.filePath))
+                    continue
+                try:
+                    upload(item)
+                except Exception as e:
+                    if self.markFailed(item, e):
+                        abandoned.append(item)
+                        self.__logger.warn('Giving up on {filePath!s:s} after {attempts:d} attempts: {error!s:s}'
+                                           .format(filePath=item.filePath, attempts=item.attempts, error=e))
+                    else:
+                        self.__logger.info('Upload attempt {attempts:d} of {filePath!s:s} failed, retrying in '
+                                           '{delay:.0f} seconds: {error!s:s}'
+                                           .format(attempts=item.attempts, filePath=item.filePath,
+                                                   delay=self.getDelay(item.attempts), error=e))
+                else:
+                    self.markSent(item)
+                    sent.append(item)
+                    self.__logger.info('{filePath!s:s} uploaded on attempt {attempts:d}.'
+                                       .format(filePath=item.filePath, attempts=item.attempts))
+            pending = self.getPending(contactId)
+            if not pending:
+                break
+            wait = pending[0].nextAttempt - time.time()
+            if time.time() + wait > deadline:
+                self.__logger.info('{count:d} queued uploads for {contactId!s:s} left for the next run.'
+                                   .format(count=len(pending), contactId=contactId))
+                break
+            if wait > 0:
+                time.sleep(wait)
+        return sent, abandoned
+
+
+def createOutboxSchema(cursor):
+    """ Create the asap_outbox table used by ASAPOutbox.
+
+    :param ASAPSqliteCursor cursor:
+    """
+    cursor.execute('''
+        create table if not exists asap_outbox (
+            id integer primary key autoincrement,
+            contact_id varchar(50) not null,
+            file_path varchar(500) not null,
+            remote_path varchar(500) not null,
+            state varchar(20) not null,
+            attempts integer not null,
+            next_attempt float not null,
+            last_error varchar(1000))
+        ''')
+    cursor.commit()
+
+
+if __name__ == '__main__':
+    import sys
+    logger = CRLUtility.CRLGetLogger()
+    try:
+        if sys.argv[1:] == ['create']:
+            ASAPOutbox(logger=logger).createTable()
+            logger.info('Created the {table!s:s} table (if not already there).'.format(table=ASAPOutbox.TABLE_OUTBOX))
+        else:
+            logger.warn('Argument(s) not valid. Valid arguments:')
+            logger.warn('create')
+    except:
+        logger.exception('Error')
@@ -66,10 +66,25 @@
 
       14-MAY-2021 nelsonj
          Migration to new apphub and updating to python 2.7
+
+      19-Oct-2026 ilsdev    user-027
+         Look up the 103 reference number through the shared parsed-document cache.
+
+      19-Oct-2026 ilsdev    user-028
+         Look up 103 elements through the index handler's path index.
+
+      19-Oct-2026 ilsdev    user-035
+         Upload through the shared SFTP session pool, so one session serves
+         all of the zip files instead of one per file.
+
+      19-Oct-2026 ilsdev    user-049
+         Import paramiko when there is a zip file to upload.
+
+      19-Oct-2026 ilsdev    user-035
+         Cap the SFTP sessions open at once to the Prudential host.
 """
 
 from ILS.ASAP.Utility import ASAP_UTILITY
-from ILS import AcordXML
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
 
@@ -79,7 +94,6 @@ import glob
 import os
 import sys
 import time
-import paramiko
 
 import logging
 import logging.handlers
@@ -93,6 +107,7 @@ ftpRemoteDir = None
 _debugLoggerName = 'Pruftp'  # must supply sLoggerName when call CRLGetLogger, otherwise all the other ASAP logging will be in this file
 
 PIC_FTP_HOSTNAME = 'Prudential'
+PIC_FTP_MAX_SESSIONS = 2
 
 if ASAP_UTILITY.devState.isDevInstance():
     EMAIL_ADDRESS = 'nelsonj@crlcorp.com'
@@ -132,8 +147,7 @@ class PICIndexHandler(ASAPIndexHandler):
         doc = self._getCurrentDocument()
         docType = doc.getDocTypeName().upper()
         if docType == 'DISCLOSURE':
-            handler = self._getAcordHandler()
-            appJuris = handler.txList[0].getElement(
+            appJuris = self._getAcordPathIndex().getElement(
                 'ACORDInsuredHolding.Policy.ApplicationInfo.ApplicationJurisdiction')
             if appJuris:
                 attrs = appJuris.getAttrs()
@@ -152,8 +166,7 @@ class PICIndexHandler(ASAPIndexHandler):
                     elif tcValue == '6':
                         case.contact.index.setValue('REQUIRE', 'MISC-MAIL')
         elif docType == 'SECONDARY ADDRESSEE NOTICE':
-            handler = self._getAcordHandler()
-            appJuris = handler.txList[0].getElement(
+            appJuris = self._getAcordPathIndex().getElement(
                 'ACORDInsuredHolding.Policy.ApplicationInfo.ApplicationJurisdiction')
             if appJuris:
                 attrs = appJuris.getAttrs()
@@ -174,8 +187,7 @@ class PICTransmitHandler(ASAPTransmitHandler):
         """
         """
         refNum = '0000000'
-        parser = AcordXML.AcordXMLParser()
-        handler = parser.parse(acord103Path)
+        handler = ASAP_UTILITY.getAcordDocumentCache().getHandler(acord103Path)
         if handler:
             refNumElem = handler.txList[0].getElement(
                 'ACORDInsuredHolding.HoldingSysKey')
@@ -310,8 +322,8 @@ class PICTransmitHandler(ASAPTransmitHandler):
 
     def _transmitStagedCases(self):
         fSuccess = True
-        sftpClient = None
-        transport = None
+        transportPool = ASAP_UTILITY.getTransportPool()
+        transportPool.setHostLimit(ftpServerName, PIC_FTP_MAX_SESSIONS)
 
         contact = self._getContact()
         regionAbbreviation = _regionId_abbrev_map.get(contact.region_id)
@@ -344,23 +356,23 @@ class PICTransmitHandler(ASAPTransmitHandler):
             xmitZipFile = os.path.join(xmitZipPath, asapZipFile.fileName)
             serverPath = ftpRemoteDir + asapZipFile.fileName  # forward slash is in ftpRemoteDir already
             handler = stream = None
+            session = None
+            fDiscard = False
             try:
                 # capture paramiko logging to a stream which will later get written to the ftpLogger
                 # can't just have paramiko log to the ftpLogger since it rewrites the log file every time
                 # and also needed to reimport paramiko to get this to work
                 stream = BytesIO()
                 handler = logging.StreamHandler(stream)
+                import paramiko
                 log = paramiko.util.logging.getLogger()
                 log.setLevel(logging.DEBUG)
                 for oldhandler in log.handlers:
                     log.removeHandler(oldhandler)
                 log.addHandler(handler)
 
-                # noinspection PyTypeChecker
-                transport = paramiko.Transport((ftpServerName, ftpPort))
-                transport.connect(username=ftpUserName, password=ftpPassword)
-                sftpClient = paramiko.SFTPClient.from_transport(transport)
-                info = sftpClient.put(xmitZipFile, serverPath)
+                session = transportPool.acquire(ftpServerName, ftpUserName, ftpPassword, ftpPort)
+                info = session.put(xmitZipFile, serverPath)
                 self._getLogger().info("{fileName!s:s} Transmission info: {info!s:s}"
                                        .format(fileName=asapZipFile.fileName, info=str(info)))
                 CRLUtility.CRLCopyFile(asapZipFile.getFullPath(),
@@ -375,6 +387,7 @@ class PICTransmitHandler(ASAPTransmitHandler):
                                            os.path.join(xmitSentPath, asapZipFile.fileName), False, 5)
                 else:
                     fSuccess = False
+                    fDiscard = True
                     self._getLogger().warn(
                         'Failed to FTP file {fullPath!s:s} to Prudential (extracting original zip to retrans folder):'
                         .format(fullPath=asapZipFile.getFullPath()), exc_info=True)
@@ -382,6 +395,7 @@ class PICTransmitHandler(ASAPTransmitHandler):
 
             except:
                 fSuccess = False
+                fDiscard = True
                 self._getLogger().warn(
                     'Failed to FTP file {fullPath!s:s} to Prudential (extracting original zip to retrans folder):'
                     .format(fullPath=asapZipFile.getFullPath()), exc_info=True)
@@ -398,11 +412,9 @@ class PICTransmitHandler(ASAPTransmitHandler):
                     for logLine in logLines:
                         ftpLogger.debug(logLine)
 
-                if sftpClient:
-                    sftpClient.close()
-
-                if transport:
-                    transport.close()
+                # keep the session for the next file unless it failed
+                if session:
+                    transportPool.release(session, fDiscard)
 
         return fSuccess
 
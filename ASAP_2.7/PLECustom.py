@@ -24,12 +24,23 @@
   Modification History:
       14-MAY-2021 nelsonj
           Migration to new apphub and updating to python 2.7
+      19-Oct-2026 ilsdev  user-035
+          Upload through the shared FTP session pool.  The connection used to be
+          closed after the first file, so later files in the same pass failed.
+      19-Oct-2026 ilsdev  user-036
+          Upload the zip files concurrently through the upload scheduler.
+      19-Oct-2026 ilsdev  user-036
+          Wait for an upload that ran past its timeout to end before moving
+          its zip file to the sent folder.
+      19-Oct-2026 ilsdev  user-035
+          Cap the uploads and FTP sessions open at once to the CRL server.
 
 """
 
 
 from ILS.ASAP.Utility import ASAP_UTILITY
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
+from ILS.ASAP.TransportPool import ASAPTransportSession
 
 import CRLUtility
 import glob
@@ -46,6 +57,11 @@ else:
     EMAIL_ADDRESS = 'ilsprod@crlcorp.com'
     PLE_BASE_DIR = r'\\ilsdfs\sys$\XMIT\FTP\PLE_SLQ\Imaging'
 
+# seconds to wait for one zip upload
+PLE_FTP_TIMEOUT = 1800
+# uploads (and FTP sessions) open at once to the CRL server
+PLE_FTP_MAX_SESSIONS = 2
+
 
 class PLETransmitHandler(ASAPTransmitHandler):
     """
@@ -153,6 +169,15 @@ class PLETransmitHandler(ASAPTransmitHandler):
                 CRLUtility.CRLCopyFile(fromPath, toPath, True, 5)
         return fSuccess
 
+    @staticmethod
+    def _uploadFile(sServer, sUser, sPassword, zipFile, serverPath):
+        """
+        Upload one zip over a pooled FTP session; run by the upload scheduler.
+        """
+        with ASAP_UTILITY.getTransportPool().session(sServer, sUser, sPassword,
+                                                     protocol=ASAPTransportSession.PROTOCOL_FTP) as session:
+            CRLUtility.CRLFTPPut(session.ftp, zipFile, serverPath, 'b')
+
     def _transmitStagedCases(self):
         fSuccess = True
         today = datetime.datetime.today()
@@ -173,26 +198,34 @@ class PLETransmitHandler(ASAPTransmitHandler):
                                        True)
             except:
                 fSuccess = False
-        # FTP the zip file
+        # FTP the zip files, several at once within the CRL server's upload limit
         toFTPFiles = glob.glob(os.path.join(xmitZipPath, '*.*'))
-        ftpServer = None
+        sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo('CRLCORP2')
+        scheduler = ASAP_UTILITY.getUploadScheduler()
+        scheduler.setHostLimit(sServer, PLE_FTP_MAX_SESSIONS)
+        ASAP_UTILITY.getTransportPool().setHostLimit(sServer, PLE_FTP_MAX_SESSIONS)
+        jobs = []
         for zipFile in toFTPFiles:
             fileName = os.path.basename(zipFile)
-            try:
-                if not ftpServer:
-                    sServer, sUser, sPassword = CRLUtility.CRLGetFTPHostInfo('CRLCORP2')
-                    ftpServer = ftplib.FTP(sServer, sUser, sPassword)
-                if ASAP_UTILITY.devState.isDevInstance():
-                    serverPath = '/pleftp1/test/ASAP/{fileName!s:s}'.format(fileName=fileName)
-                else:
-                    serverPath = '/pleftp1/prod/ASAP/{fileName!s:s}'.format(fileName=fileName)
-                CRLUtility.CRLFTPPut(ftpServer, zipFile, serverPath, 'b')
+            if ASAP_UTILITY.devState.isDevInstance():
+                serverPath = '/pleftp1/test/ASAP/{fileName!s:s}'.format(fileName=fileName)
+            else:
+                serverPath = '/pleftp1/prod/ASAP/{fileName!s:s}'.format(fileName=fileName)
+            jobs.append((zipFile, scheduler.submit(sServer, fileName, self._uploadFile,
+                                                   sServer, sUser, sPassword, zipFile, serverPath,
+                                                   timeout=PLE_FTP_TIMEOUT)))
+        for zipFile, job in jobs:
+            if not job.wait() and not job.isFinished():
+                # the upload is still running, so the file cannot be moved to sent yet
+                self._getLogger().warn('Upload of {zipFile!s:s} to PacLife East did not finish within {timeout:d} '
+                                       'seconds, waiting for it to end.'.format(zipFile=zipFile, timeout=PLE_FTP_TIMEOUT))
+                job.waitFinished()
+            if job.succeeded():
                 self._getLogger().info('File {zipFile!s:s} successfully uploaded to PacLife East'.format(zipFile=zipFile))
-            except:
+            else:
                 fSuccess = False
-                self._getLogger().exception('Failed to FTP file {zipFile!s:s} to PacLife East:'.format(zipFile=zipFile))
-            if ftpServer:
-                ftpServer.close()
+                self._getLogger().error('Failed to FTP file {zipFile!s:s} to PacLife East:\n{error!s:s}'
+                                        .format(zipFile=zipFile, error=job.errorText))
         for zipFile in toFTPFiles:
             CRLUtility.CRLCopyFile(zipFile, os.path.join(xmitSentPath, os.path.basename(zipFile)), True, 5)
         # Write all the asapToXmitFiles names in a file that would be sent to PLE for reconciliation
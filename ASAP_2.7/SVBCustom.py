@@ -41,11 +41,25 @@
          files where they will get picked up by the SVB_Imaging.py feed.
       14-MAY-2021 nelsonj
          Migration to new apphub and updating to python 2.7
+      19-Oct-2026 ilsdev  user-026
+         Render lab reports through ASAPLabReportRenderer (cached by report text,
+         in-process, several reports at once).
+      19-Oct-2026 ilsdev  user-037
+         Write the sent-folder archive in one pass with ASAPZipBuilder.
+      19-Oct-2026 ilsdev  user-047
+         Always rebuild the index, since postprocessing builds the lab report.
+      19-Oct-2026 ilsdev  user-026
+         Render the lab reports of the whole batch together (_postProcessBatch)
+         instead of one report per case.
+      19-Oct-2026 ilsdev  user-026
+         A case whose lab report could not be built is failed for the batch
+         (_failBatchCase), so it is moved to error instead of being billed.
 """
 
 from .IndexHandler import ASAPIndexHandler
 from .TransmitHandler import ASAPTransmitHandler
 from .Utility import ASAP_UTILITY
+from .ZipBuilder import ASAPZipBuilder
 import CRLUtility
 import datetime
 import glob
@@ -66,6 +80,15 @@ class SVBIndexHandler(ASAPIndexHandler):
     Custom handler for building indexes for SVB.
     """
 
+    def __init__(self):
+        ASAPIndexHandler.__init__(self)
+        # lab reports to build at the end of the batch: (case, SVB folder, model index file)
+        self.__labReports = []
+
+    def _getFingerprintInputs(self):
+        # postprocessing builds the lab report and its index
+        return None
+
     def _isReadyToIndex(self):
         """
         For full transmits, do not build indexes until the lab report is ready.
@@ -89,7 +112,8 @@ class SVBIndexHandler(ASAPIndexHandler):
 
     def _postProcessIndex(self):
         """
-        Build image and index for SVB lab report.
+        Build text report for SVB lab report; its image and index are built
+        with the rest of the batch in _postProcessBatch.
         Must be a full transmit or a partial transmit with a labslip. And the LIMS
         sample must have transmitted.
         """
@@ -114,18 +138,8 @@ class SVBIndexHandler(ASAPIndexHandler):
                 'svbslqapps': 'SVB_SLQ'
             }
 
-            fError, pageCount = self.buildLabReport(case.sid, svbFolderMap.get(case.contact.contact_id))
-
-            if fError:
-                self._getLogger().warn('Unable to process lab report for {sid!s:s}: '.format(sid=case.sid), exc_info=True)
-
-            self.buildLabReportIndex(case, pageCount)
-
-            # remove txt lab report from reports/processed folder
-            txtReport = os.path.join(os.path.join(os.path.dirname(xmitDir), 'reports'), 'processed', '{sid!s:s}.txt'.format(sid=case.sid))
-            s = glob.glob(txtReport)
-            if s:
-                CRLUtility.CRLDeleteFile(txtReport)
+            idxPaths = self._getIndexPaths()
+            self.__labReports.append((case, svbFolderMap.get(case.contact.contact_id), idxPaths and idxPaths[0]))
 
         except:
             self._getLogger().warn(
@@ -133,6 +147,52 @@ class SVBIndexHandler(ASAPIndexHandler):
 
         return True
 
+    def _postProcessBatch(self):
+        """
+        Build images and indexes for the lab reports of the batch, rendering the
+        images of each SVB folder together.
+        """
+        labReports = self.__labReports
+        self.__labReports = []
+        results = {}
+        sidsByFolder = {}
+        for case, SVBFolder, modelIdxFile in labReports:
+            sidsByFolder.setdefault(SVBFolder, []).append(case.sid)
+        for SVBFolder, sids in sidsByFolder.items():
+            try:
+                for sid, result in self.buildLabReports(sids, SVBFolder).items():
+                    results[(SVBFolder, sid)] = result
+            except:
+                self._getLogger().warn('Unable to build lab report images for {SVBFolder!s:s}: '
+                                       .format(SVBFolder=SVBFolder), exc_info=True)
+
+        for case, SVBFolder, modelIdxFile in labReports:
+            if (SVBFolder, case.sid) not in results:
+                # the case is not billed without its lab report
+                self._failBatchCase(case)
+                continue
+            try:
+                fError, pageCount = results[(SVBFolder, case.sid)]
+                if fError:
+                    self._getLogger().warn('Unable to process lab report for {sid!s:s}.'.format(sid=case.sid))
+                    self._failBatchCase(case)
+                    continue
+
+                self.buildLabReportIndex(case, pageCount, modelIdxFile)
+
+                # remove txt lab report from reports/processed folder
+                xmitDir = case.contact.xmit_dir
+                txtReport = os.path.join(os.path.join(os.path.dirname(xmitDir), 'reports'), 'processed', '{sid!s:s}.txt'.format(sid=case.sid))
+                s = glob.glob(txtReport)
+                if s:
+                    CRLUtility.CRLDeleteFile(txtReport)
+            except:
+                self._getLogger().warn('PostProcessBatch failed for {sid!s:s} with exception: '
+                                       .format(sid=case.sid), exc_info=True)
+                self._failBatchCase(case)
+
+        return True
+
     def isReadyToBuildLabReport(self, case):
         """
         Check whether lab report is needed for this case transmission.
@@ -166,11 +226,12 @@ class SVBIndexHandler(ASAPIndexHandler):
 
         return False
 
-    def buildLabReport(self, sid, SVBFolder):
+    def buildLabReports(self, sids, SVBFolder):
         """
-        Convert txt file to image file.
+        Convert the txt files of the sids to image files, rendering them together.
+        Returns a dictionary of sid: (fError, pageCount).
         """
-        fError = False
+        labReports = {}
 
         # constants that differ between prod and dev
         sTest = ''
@@ -183,52 +244,68 @@ class SVBIndexHandler(ASAPIndexHandler):
         processedPath = os.path.join(reportStagingPath, 'processed')
         errorPath = os.path.join(reportStagingPath, 'error')
 
-        rptFiles = glob.glob(os.path.join(reportStagingPath, '{sid!s:s}.txt'.format(sid=sid)))
-        pageCount = 0
-        for rptFile in rptFiles:
-            fMoveToError = False
-            sidText = os.path.splitext(os.path.basename(rptFile))[0]
-            tif = os.path.join(reportStagingPath, sidText + '.tif')
-
-            # reduce font size to avoid blank pages in the lab report
-            pageCount, exitCode = CRLUtility.CRLTextToTiffWithPageCount(rptFile, tif, sCanvas='8.5/11/200', sFontSize='10.7b')
-
-            if os.path.isfile(tif):
-                # now move files to processed folder
-                CRLUtility.CRLCopyFile(rptFile,
-                                       os.path.join(processedPath,
-                                                    os.path.basename(rptFile)),
-                                       True, 5)
-            else:
-                fError = True
-                fMoveToError = True
-                self._getLogger().warn('Failed to create TIF image for text report {rptFile!s:s}.'.format(rptFile=rptFile))
-
-            if fMoveToError:
-                CRLUtility.CRLCopyFile(rptFile,
-                                       os.path.join(errorPath, os.path.basename(rptFile)),
-                                       True, 5)
-
-                # all report files should have been processed, so if any are left, they are unmatched
+        rptFilesBySid = {}
+        rptTifPairs = []
+        for sid in sids:
+            if sid in rptFilesBySid:
+                continue
+            rptFiles = glob.glob(os.path.join(reportStagingPath, '{sid!s:s}.txt'.format(sid=sid)))
+            rptFilesBySid[sid] = rptFiles
+            for rptFile in rptFiles:
+                tif = os.path.join(reportStagingPath, os.path.splitext(os.path.basename(rptFile))[0] + '.tif')
+                rptTifPairs.append((rptFile, tif))
+        # reduce font size to avoid blank pages in the lab report
+        renderer = ASAP_UTILITY.getLabReportRenderer(os.path.join(reportStagingPath, 'cache'))
+        results = renderer.renderMany(rptTifPairs, sCanvas='8.5/11/200', sFontSize='10.7b')
+        rendered = dict([(rptFile, (tif, result)) for (rptFile, tif), result in zip(rptTifPairs, results)])
+
+        for sid, rptFiles in rptFilesBySid.items():
+            fError = False
+            pageCount = 0
+            for rptFile in rptFiles:
+                tif, (pageCount, exitCode) = rendered[rptFile]
+                fMoveToError = False
+
+                if os.path.isfile(tif):
+                    # now move files to processed folder
+                    CRLUtility.CRLCopyFile(rptFile,
+                                           os.path.join(processedPath,
+                                                        os.path.basename(rptFile)),
+                                           True, 5)
+                else:
+                    fError = True
+                    fMoveToError = True
+                    self._getLogger().warn('Failed to create TIF image for text report {rptFile!s:s}.'.format(rptFile=rptFile))
+
+                if fMoveToError:
+                    CRLUtility.CRLCopyFile(rptFile,
+                                           os.path.join(errorPath, os.path.basename(rptFile)),
+                                           True, 5)
+            labReports[sid] = (fError, pageCount)
+
+        # all report files should have been processed, so if any are left, they are unmatched
         rptFiles = glob.glob(os.path.join(reportStagingPath, '*.txt'))
         if rptFiles:
-            fError = True
             self._getLogger().warn('There are {rptFiles:d} unconverted report files in {reportStagingPath!s:s}.'.format(rptFiles=len(rptFiles), reportStagingPath=reportStagingPath))
+            for sid in labReports:
+                labReports[sid] = (True, labReports[sid][1])
 
-        return (fError, pageCount)
+        return labReports
 
-    def buildLabReportIndex(self, case, pageCount):
+    def buildLabReportIndex(self, case, pageCount, idxFile=None):
         """
         Build the index for the lab report using another index file for the case as a model
+        (idxFile, or the first index built for the current case)
         """
 
         doctypefield = 'REQUIRE'
         pagenumfield = 'PAGES'
         labworkdoctype = 'HOSMAC'
 
-        idxPaths = self._getIndexPaths()
-        if idxPaths and os.path.isfile(idxPaths[0]):
-            idxFile = idxPaths[0]
+        if not idxFile:
+            idxPaths = self._getIndexPaths()
+            idxFile = idxPaths and idxPaths[0]
+        if idxFile and os.path.isfile(idxFile):
             ptr = open(idxFile, 'r')
             lines = ptr.readlines()
             ptr.close()
@@ -385,6 +462,9 @@ class SVBTransmitHandler(ASAPTransmitHandler):
                 .format(asapToXmitFiles=len(asapToXmitFiles)))
             today = datetime.datetime.today()
 
+            # Zip the files and store in sent location for records
+            zipFileName = 'CRLSVBSLQ{today:%Y%m%d%H%M%S}.zip'.format(today=today)
+            zipBuilder = ASAPZipBuilder(os.path.join(xmitSentPath, zipFileName), self._getLogger())
             # Move the files to the SVB regular Image transmission
             for asapFile in asapToXmitFiles:
                 try:
@@ -394,17 +474,22 @@ class SVBTransmitHandler(ASAPTransmitHandler):
                     CRLUtility.CRLCopyFile(asapFile.getFullPath(), destFile)
                     self._getLogger().info('Copied {fullPath!s:s} file to SVB Work Folder...'.format(fullPath=asapFile.getFullPath()))
 
-                    # Zip the files and store in sent location for records
                     filePath = asapFile.getFullPath()
                     logger.debug(filePath)
-                    zipFileName = 'CRLSVBSLQ{today:%Y%m%d%H%M%S}.zip'.format(today=today)
-                    zipFilePath = os.path.join(xmitSentPath, zipFileName)
-                    CRLUtility.CRLAddToZIPFile(asapFile.getFullPath(), zipFilePath, True)
+                    zipBuilder.addFile(filePath, fDeleteSource=True)
                 except:
                     fSuccess = False
                     destFile = os.path.join(retransPath, os.path.basename(asapFile.getFullPath()))
                     CRLUtility.CRLCopyFile(asapFile.getFullPath(), destFile, True)
                     self._getLogger().info('Moved {fullPath!s:s} file to SVB Work Folder...'.format(fullPath=asapFile.getFullPath()))
+            try:
+                zipBuilder.close()
+            except:
+                fSuccess = False
+                self._getLogger().warn('Failed to write {path!s:s}:'.format(path=zipBuilder.getZipPath()), exc_info=True)
+                for sourcePath in zipBuilder.getSourcePaths():
+                    CRLUtility.CRLCopyFile(sourcePath, os.path.join(retransPath, os.path.basename(sourcePath)), True)
+                    self._getLogger().info('Moved {fullPath!s:s} file to SVB Work Folder...'.format(fullPath=sourcePath))
         return fSuccess
 
 
@@ -104,13 +104,51 @@
          will send these and other TRO files to the Aegon FTP server
        14-MAY-2021 nelsonj
          Migration to new apphub and updating to python 2.7
+       19-Oct-2026  ilsdev  user-027
+         Edit a private copy of the cached 103 when staging, and drop the cache
+         entry after writing it back.
+       19-Oct-2026  ilsdev  user-029
+         Use getAcord103Store (getASAPAcord103Store does not exist) for the 103
+         policy number lookup, which now reads only the metadata columns.
+       19-Oct-2026  ilsdev  user-036
+         Replaced the global troFtpLock and 30 second sleep with the upload scheduler,
+         which keeps one upload at a time, 30 seconds apart, on the CRL FTP server.
+         Zips are queued first and finished in order as their uploads complete.
+       19-Oct-2026  ilsdev  user-037
+         Build the V2 case zip in one pass with ASAPZipBuilder.
+       19-Oct-2026  ilsdev  user-039
+         Failed uploads go to the outbox folder and are retried with backoff through
+         ASAPOutbox, within the run and in later runs, before falling back to retrans.
+       19-Oct-2026  ilsdev  user-045
+         Build the V1/V2 index before it is written (_processIndexText).
+       19-Oct-2026  ilsdev  user-047
+         Add the 103 policy number to the index fingerprint (_getFingerprintInputs).
+       19-Oct-2026  ilsdev  user-049
+         Import AcordXMLElement (the only name used from ILS.AcordXML) when a case
+         is staged, rather than the whole module when this one is loaded.
+       19-Oct-2026  ilsdev  user-050
+         Process the transmit contacts on every run (listed in
+         ASAPContactScan.ALWAYS_PROCESSED_HANDLERS), since _preStage images the text
+         reports.
+       19-Oct-2026  ilsdev  user-039
+         An upload that runs past its timeout is left alone until it ends, then
+         treated as sent or failed, instead of being queued for a retry while it
+         may still be reading the zip.  Outbox retries wait for the upload to end,
+         and no longer sleep in the contact thread for items that are not yet due.
+       19-Oct-2026  ilsdev  user-039
+         Queued uploads are retried as they come due within the run.  A zip is only
+         moved to the outbox folder once it is queued; if the outbox cannot be used,
+         it goes to the retrans folder as before.
+       19-Oct-2026  ilsdev  user-037
+         Build the V1 zip in one pass with ASAPZipBuilder.
 """
 
 
-from ILS.AcordXML import *
 from ILS.ASAP.Utility import ASAP_UTILITY
 from ILS.ASAP.IndexHandler import ASAPIndexHandler
 from ILS.ASAP.TransmitHandler import ASAPTransmitHandler
+from ILS.ASAP.UploadScheduler import ASAPUploadJob
+from ILS.ASAP.ZipBuilder import ASAPZipBuilder
 from ILS import TROSmartParamedFileHandler
 import CRLUtility
 import datetime
@@ -134,6 +172,10 @@ ftpLogFile = os.path.join(ftpLogDir, 'ASAP_TROCustom_FTP.log')
 ftpLogger = CRLUtility.CRLGetLogger(ftpLogFile, sLoggerName='ASAP_TROCustom_FTP')
 ftpLogger.setLevel(CRLUtility.logging.DEBUG)
 
+# seconds required between uploads to the CRL FTP server, and to wait for one upload
+TRO_FTP_INTERVAL = 30.0
+TRO_FTP_TIMEOUT = 1800
+
 TRO_V1_TYPE_MAP = {
     'MISC DOC': 'NBDOCS',
     'HIVCONSNT': 'HIVCONSNT',
@@ -205,94 +247,95 @@ class TROIndexHandler(ASAPIndexHandler):
             fReady = True
         return fReady
 
-    def _postProcessIndex(self):
-        idxPaths = self._getIndexPaths()
-        if idxPaths and os.path.isfile(idxPaths[0]):
-            # replace 'intermediary' index with either version 1 (AWD/RIP) index
-            # or version 2 index
-            idxFile = idxPaths[0]
-            docs = list(self._getCase().getDocuments().values())
-            docdates = [CRLUtility.ParseStrDate(doc.getDateCreated(), True) for doc in docs]
-            docdates.sort()
-            docTypeMap = self._getCase().contact.docTypeNameMap
-            ptr = open(idxFile, 'r')
-            lines = ptr.readlines()
-            ptr.close()
-            caseFields = lines[0].strip()
-            delim = ', '
-            subdelim = '='
-            # this section of code to build the fieldlist must be done because
-            # some field values might have commas in them, and they need to be
-            # identified and joined with their erroneously separated prior field
-            templist = caseFields.split(delim)
-            fieldlist = []
-            for field in templist:
-                if field.find(subdelim) < 0:
-                    fieldlist[-1] = '{name!s:s}{delim!s:s}{field!s:s}'.format(name=fieldlist[-1], delim=delim, field=field)
-                else:
-                    fieldlist.append(field)
-            #
-            # If 103 is present, use Policy Number from Recon File (stored in acord103 table) instead of from 121
-            # so that retransmits will have the updated policy number.
-            #
-            if (self._getCase().contact.acord103_dir):
-                Acord103Store = ASAP_UTILITY.getASAPAcord103Store()
-                Acord103s = Acord103Store.getByTrackingId(self._getCase().trackingId)
-                polNum103 = Acord103s[0].policyNumber
+    def __getPolicyNumber103(self):
+        #
+        # If 103 is present, use Policy Number from Recon File (stored in acord103 table) instead of from 121
+        # so that retransmits will have the updated policy number.
+        #
+        if (self._getCase().contact.acord103_dir):
+            # only the policy number is needed, so the XML is never read
+            Acord103s = ASAP_UTILITY.getAcord103Store().getByTrackingId(self._getCase().trackingId)
+            if Acord103s:
+                return Acord103s[0].policyNumber
+        return None
+
+    def _getFingerprintInputs(self):
+        # the index version depends on the 103 policy number
+        return [self.__getPolicyNumber103()]
+
+    def _processIndexText(self, idxPath, idxText):
+        # replace 'intermediary' index with either version 1 (AWD/RIP) index
+        # or version 2 index, before it is written
+        docs = list(self._getCase().getDocuments().values())
+        docdates = [CRLUtility.ParseStrDate(doc.getDateCreated(), True) for doc in docs]
+        docdates.sort()
+        docTypeMap = self._getCase().contact.docTypeNameMap
+        lines = idxText.splitlines()
+        caseFields = lines[0].strip()
+        delim = ', '
+        subdelim = '='
+        # this section of code to build the fieldlist must be done because
+        # some field values might have commas in them, and they need to be
+        # identified and joined with their erroneously separated prior field
+        templist = caseFields.split(delim)
+        fieldlist = []
+        for field in templist:
+            if field.find(subdelim) < 0:
+                fieldlist[-1] = '{name!s:s}{delim!s:s}{field!s:s}'.format(name=fieldlist[-1], delim=delim, field=field)
             else:
-                polNum103 = None
-
-            state = fieldlist[3].split(subdelim)[1].strip()
-            caseFields = delim.join(fieldlist[:3])
-
-            # full transmits are version 2 if no 103 or if there is no policy number with the 103
-            troVersion = 1  # indexing version sent via rip process
-            if self._isFullTransmit():
-                if not self._getCase().contact.acord103_dir:
-                    troVersion = 2
-                elif not polNum103:
-                    troVersion = 2
-
-            troLines = []
-            if troVersion == 1:
-                troLines.append("@@BEGIN")
-                troLines.append("@@KEY UNIT=NBUKC, WRKT=MAIL, STAT=RIPPED, ACTION=W")
-                troLines.append("@@LOB {fields!s:s}".format(fields=caseFields.upper()))
-            if docs:
-                troDocList = []
-                for doc in docs:
-                    troDocType = docTypeMap.get(doc.getDocTypeName())
-                    nyType = TRO_NY_TYPE_MAP.get(troDocType)
-                    if state.upper() == 'NEW YORK' and nyType:
-                        troDocType = nyType
-                    if troDocType == 'APP':
-                        troDocList = [(troDocType, doc.fileName)] + troDocList
-                    else:
-                        troDocList.append((troDocType, doc.fileName))
-
-                for troDocType, fileName in troDocList:
-                    if troVersion == 1:
-                        troDocType = TRO_V1_TYPE_MAP.get(troDocType)
-                        troLines.append("@@BEGIN")
-                        troLines.append("@@KEY UNIT=NBUKC, OBJT={troDocType!s:s}, ACTION=S".format(troDocType=troDocType))
-                        troLines.append("@@FILE=P:\\CRL\\TIF\\{fileName!s:s}".format(fileName=fileName.upper()))
-                        troLines.append("@@END")
-                    else:
-                        troLines.append("{troDocType!s:s}={fileName!s:s}".format(troDocType=troDocType, fileName=fileName.upper()))
+                fieldlist.append(field)
+        polNum103 = self.__getPolicyNumber103()
 
-            if troVersion == 1:
-                troLines.append("@@END")
+        state = fieldlist[3].split(subdelim)[1].strip()
+        caseFields = delim.join(fieldlist[:3])
 
-            with open(idxFile, 'w') as ptr:
-                for line in troLines:
-                    ptr.write("{}\n".format(line))
-        return True
+        # full transmits are version 2 if no 103 or if there is no policy number with the 103
+        troVersion = 1  # indexing version sent via rip process
+        if self._isFullTransmit():
+            if not self._getCase().contact.acord103_dir:
+                troVersion = 2
+            elif not polNum103:
+                troVersion = 2
+
+        troLines = []
+        if troVersion == 1:
+            troLines.append("@@BEGIN")
+            troLines.append("@@KEY UNIT=NBUKC, WRKT=MAIL, STAT=RIPPED, ACTION=W")
+            troLines.append("@@LOB {fields!s:s}".format(fields=caseFields.upper()))
+        if docs:
+            troDocList = []
+            for doc in docs:
+                troDocType = docTypeMap.get(doc.getDocTypeName())
+                nyType = TRO_NY_TYPE_MAP.get(troDocType)
+                if state.upper() == 'NEW YORK' and nyType:
+                    troDocType = nyType
+                if troDocType == 'APP':
+                    troDocList = [(troDocType, doc.fileName)] + troDocList
+                else:
+                    troDocList.append((troDocType, doc.fileName))
+
+            for troDocType, fileName in troDocList:
+                if troVersion == 1:
+                    troDocType = TRO_V1_TYPE_MAP.get(troDocType)
+                    troLines.append("@@BEGIN")
+                    troLines.append("@@KEY UNIT=NBUKC, OBJT={troDocType!s:s}, ACTION=S".format(troDocType=troDocType))
+                    troLines.append("@@FILE=P:\\CRL\\TIF\\{fileName!s:s}".format(fileName=fileName.upper()))
+                    troLines.append("@@END")
+                else:
+                    troLines.append("{troDocType!s:s}={fileName!s:s}".format(troDocType=troDocType, fileName=fileName.upper()))
+
+        if troVersion == 1:
+            troLines.append("@@END")
+
+        return ''.join(["{}\n".format(line) for line in troLines])
 
 
 class TROTransmitHandler(ASAPTransmitHandler):
     """
     Custom handler for TRO transmission.
     """
+    # _preStage images the text reports, which are not in the contact's folders,
+    # so ASAPContactScan.ALWAYS_PROCESSED_HANDLERS lists this class
 
     def _preStage(self):
         fSuccess = True
@@ -382,6 +425,7 @@ class TROTransmitHandler(ASAPTransmitHandler):
         return fReady
 
     def _stageIndexedCase(self):
+        from ILS.AcordXML import AcordXMLElement
         case = self._getCurrentCase()
         fSuccess = True
         troVersion = 1  # indexing version
@@ -435,8 +479,9 @@ class TROTransmitHandler(ASAPTransmitHandler):
             acord103Path = os.path.join(case.contact.acord103_dir, '{trackingId!s:s}.xml'.format(trackingId=case.trackingId))
             self._getLogger().info('Appending {path!s:s} to filesToDelete'.format(path=os.path.join(os.path.dirname(case.contact.xmit_dir), 'reports', '{sid!s:s}.tif'.format(sid=case.sid))))
             if troVersion == 2:
-                p = AcordXMLParser()
-                h = p.parse(acord103Path)
+                # private copy, since the parsed 103 is shared and this one is changed
+                acordCache = ASAP_UTILITY.getAcordDocumentCache()
+                h = acordCache.getMutableHandler(acord103Path)
                 party = h.txList[0].getElement('ACORDInsuredParty')
                 if party:
                     # temporary band-aid to remove empty OLifEExtension object from Risk
@@ -520,6 +565,7 @@ class TROTransmitHandler(ASAPTransmitHandler):
                             transRefGuid = h.txList[0].getElement('TXLifeRequest.TransRefGUID')
                             transRefGuid.value = trackingId.value
                     h.writeXML(acord103Path)
+                    acordCache.invalidate(acord103Path)
                 fromToMoves.append((acord103Path,
                                     os.path.join(case.contact.xmit_dir, zipPath,
                                                  '{trackingId!s:s}.xml'.format(trackingId=case.trackingId))))
@@ -538,13 +584,13 @@ class TROTransmitHandler(ASAPTransmitHandler):
                     zipFileName = 'CRL_EMAIL_{trackingId!s:s}.ZIP'.format(trackingId=case.trackingId)
                 asapFileList = asapFileManager.glob(os.path.join(case.contact.xmit_dir, zipPath, '*.*'))
                 self._getLogger().debug('Getting files to zip in {zipPath!s:s}, zip file name: {zipFileName!s:s}'.format(zipPath=zipPath, zipFileName=zipFileName))
+                with ASAPZipBuilder(os.path.join(case.contact.xmit_dir, zipFileName), self._getLogger()) as zipBuilder:
+                    for asapFile in asapFileList:
+                        fullPath = asapFile.getFullPath()
+                        self._getLogger().debug('adding file to zipfile: {path!s:s}'.format(path=fullPath))
+                        zipBuilder.addFile(fullPath)
                 for asapFile in asapFileList:
-                    fullPath = asapFile.getFullPath()
-                    self._getLogger().debug('adding file to zipfile: {path!s:s}'.format(path=fullPath))
-                    CRLUtility.CRLAddToZIPFile(fullPath,
-                                               os.path.join(case.contact.xmit_dir, zipFileName),
-                                               False)
-                    self._getLogger().debug('adding file to ASAP file manager: ' + str(fullPath))
+                    self._getLogger().debug('adding file to ASAP file manager: ' + str(asapFile.getFullPath()))
                     asapFileManager.deleteFile(asapFile)
 
             # Delete the labreports here as these will not be sent by the ASAP but ACORD
@@ -553,13 +599,19 @@ class TROTransmitHandler(ASAPTransmitHandler):
                 self._getLogger().info('file deleted: {eachFile!s:s}'.format(eachFile=eachFile))
         return fSuccess
 
+    def _uploadToCrlServer(self, ftpServer, localPath, serverPath, ftpUser, ftpPassword):
+        """
+        Upload one zip to the CRL FTP server; run by the upload scheduler.
+        """
+        if os.path.isfile(localPath):
+            try:
+                CRLUtility.CRLFTPPut(ftpServer, localPath, serverPath, 'b', ftpUser, ftpPassword)
+            except IOError as ioe:
+                # the size check after the put is not reliable on this server, the file is there
+                if not str(ioe.args[0]).startswith('size mismatch in put'):
+                    raise
+
     def _transmitStagedCases(self):
-        global troFtpLock
-        import threading
-        try:
-            troFtpLock
-        except NameError:
-            troFtpLock = threading.RLock()
         fSuccess = True
 
         contact = self._getContact()
@@ -584,19 +636,29 @@ class TROTransmitHandler(ASAPTransmitHandler):
         xmitZipPath = os.path.join(xmitStagingPath, 'zip')
         xmitRetransPath = os.path.join(xmitStagingPath, 'retrans')
         xmitSentPath = os.path.join(xmitStagingPath, 'sent')
-
-        allFiles = glob.glob(os.path.join(xmitStagingPath, '*.*'))
-        for fileItem in allFiles:
-            if fileItem[-3:].upper() != 'ZIP':
-                CRLUtility.CRLAddToZIPFile(fileItem,
-                                           os.path.join(xmitStagingPath, TRO_V1_ZIPFILENAME))
+        # failed uploads waiting for a retry; not cleaned up by _preStage
+        xmitOutboxPath = os.path.join(xmitStagingPath, 'outbox')
+        outbox = ASAP_UTILITY.getOutbox()
+
+        # add the V1 files to the V1 zip in one pass, moving them into it as CRLAddToZIPFile did
+        v1Files = [fileItem for fileItem in glob.glob(os.path.join(xmitStagingPath, '*.*'))
+                   if fileItem[-3:].upper() != 'ZIP']
+        if v1Files:
+            with ASAPZipBuilder(os.path.join(xmitStagingPath, TRO_V1_ZIPFILENAME), self._getLogger()) as zipBuilder:
+                zipBuilder.addFiles(v1Files, True)
         fm = ASAP_UTILITY.getASAPFileManager(contact)
         asapToXmitFiles = fm.glob(os.path.join(xmitStagingPath, '*.ZIP'))
-        xmitZipFile = None
+        # one upload at a time to the TRO folder on the CRL server, 30 seconds apart per AEGON
+        # requirement, shared with the other TRO contacts running in this process
+        uploadKey = CRL_FTP_SERVER + '/TROftp1'
+        scheduler = ASAP_UTILITY.getUploadScheduler()
+        scheduler.setHostLimit(uploadKey, 1, TRO_FTP_INTERVAL)
         if (len(asapToXmitFiles) > 0):
             self._getLogger().info(
                 'There are {count:d} zip files in the transmit staging folder to process...'
                 .format(count=len(asapToXmitFiles)))
+            # queue the ftp uploads first, then finish each file in order as its upload completes
+            transmits = []
             for asapZipFile in asapToXmitFiles:
                 today = datetime.datetime.today()
                 # Make sure zip does not have jumbled cases or is idx, xml, dat files required for transmission.
@@ -616,59 +678,27 @@ class TROTransmitHandler(ASAPTransmitHandler):
                     fm.moveFile(asapZipFile, xmitZipFile)
                     sentZipFile = '{basename!s:s}_{dt:%Y%m%d%H%M%S}.ZIP'.format(basename=asapZipFile.fileName.split('.')[0],
                                                                                 dt=today)
-                    # -- use SFTP/SSH to transfer the file to Aegon's FTP site,
-                    #    only if we're not in test mode
-                    finalZipPath = xmitSentPath
-                    troFtpLock.acquire()
-                    self._getLogger().info("FTP Lock acquired by thread {contact_id!s:s}..."
-                                           .format(contact_id=contact.contact_id))
+                    # 26-Dec-2017
+                    # With the changes to the TRO server we are not able to upload the files using the OLD Apphub
+                    # and as ASAP is still running on the old AppHub we shall place all the files in one location and
+                    # another script will upload them to The Aegon New server.
+                    if not ASAP_UTILITY.devState.isDevInstance():
+                        serverPath = '/TROftp1/' + aegonFileName
+                    else:
+                        serverPath = '/TROftp1/Test/' + aegonFileName
+                    self._getLogger().info("About to ftp {contact_id!s:s} file {path!s:s} as {destPath!s:s}"
+                                           .format(contact_id=contact.contact_id,
+                                                   path=asapZipFile.fileName,
+                                                   destPath=aegonFileName))
                     ftpLogger.debug("About to ftp {contact_id!s:s} file {path!s:s}"
                                     .format(contact_id=contact.contact_id, path=asapZipFile.fileName))
-                    try:
-                        if os.path.isfile(xmitZipFile):
-                            # capture paramiko logging to a stream which will later get written to the ftpLogger
-                            # can't just have paramiko log to the ftpLogger since it rewrites the log file every time
-                            # and also needed to reimport paramiko to get this to work
-                            # 26-Dec-2017
-                            # With the changes to the TRO server we are not able to upload the files using the OLD Apphub
-                            # and as ASAP is still running on the old AppHub we shall place all the files in one location and
-                            # another script will upload them to The Aegon New server.
-                            if not ASAP_UTILITY.devState.isDevInstance():
-                                serverPath = '/TROftp1/' + aegonFileName
-                            else:
-                                serverPath = '/TROftp1/Test/' + aegonFileName
-                            self._getLogger().info("About to ftp {contact_id!s:s} file {path!s:s} as {destPath!s:s}"
-                                                   .format(contact_id=contact.contact_id,
-                                                           path=asapZipFile.fileName,
-                                                           destPath=aegonFileName))
-
-                            CRLUtility.CRLFTPPut(CRL_FTP_SERVER, asapZipFile.getFullPath(),
-                                                 serverPath, 'b', CRL_FTP_USER, CRL_FTP_USER_PASSWORD)
-                            self._getLogger().info("{path!s:s} Transmitted to CRL Server".format(path=asapZipFile.fileName))
-
-                    except IOError as ioe:
-                        if not str(ioe.args[0]).startswith('size mismatch in put'):
-                            finalZipPath = xmitRetransPath
-                            sentZipFile = asapZipFile.fileName
-                            fSuccess = False
-                            self._getLogger().warn('Failed to FTP file {path!s:s} to TRO (moving to retrans folder)'
-                                                   .format(path=asapZipFile.fileName),
-                                                   exc_info=True)
-                    except:
-                        finalZipPath = xmitRetransPath
-                        sentZipFile = asapZipFile.fileName
-                        fSuccess = False
-                        self._getLogger().warn('Failed to FTP file {path!s:s} to TRO (moving to retrans folder)'
-                                               .format(path=asapZipFile.fileName),
-                                               exc_info=True)
-                    finally:
-
-                        time.sleep(30.0)  # sleep for 30 seconds between ftp's per AEGON requirement
-                        troFtpLock.release()
-                        self._getLogger().info("FTP Lock released by thread {contact_id!s:s}."
-                                               .format(contact_id=contact.contact_id))
+                    job = scheduler.submit(uploadKey, asapZipFile.fileName, self._uploadToCrlServer,
+                                           CRL_FTP_SERVER, asapZipFile.getFullPath(), serverPath,
+                                           CRL_FTP_USER, CRL_FTP_USER_PASSWORD, timeout=TRO_FTP_TIMEOUT)
+                    transmits.append((asapZipFile, xmitZipFile, sentZipFile, job, serverPath))
 
                 else:  # send by email
+                    xmitZipFile = None
                     try:
                         xmitZipFile = os.path.join(xmitZipPath, asapZipFile.fileName)
                         fSuccess = self.transmitByEmail(asapZipFile)
@@ -690,27 +720,109 @@ class TROTransmitHandler(ASAPTransmitHandler):
                         self._getLogger().warn('Failed to email file {path!s:s} to TRO (moving to retrans folder)'
                                                .format(path=asapZipFile.fileName),
                                                exc_info=True)
-
-                # Send the notification to ACORD that the case has been uploaded
-                # This is done only for version 2 files as version 1 files are basically retransmits
-                # Version 2 files have tracking id in the filenames so extract from the name.
-                if (fSuccess):
-                    file_nm = asapZipFile.fileName.split('.')[0]
-                    if len(file_nm.split('_')) == 3:
-                        tracking_id = file_nm.split('_')[2]
-                        req = ASAP_UTILITY.getASAPAcordRequest()
-                        if not req.makeRequestByTrackingId(tracking_id):
-                            fSuccess = False
-                            self._getLogger().info("Error while notifying ACORD for {tracking_id!s:s}.".format(tracking_id=tracking_id))
+                    transmits.append((asapZipFile, xmitZipFile, sentZipFile, finalZipPath, None))
+
+            # uploads still running after their timeout are finished last, once they have ended
+            while transmits:
+                lateTransmits = []
+                for asapZipFile, xmitZipFile, sentZipFile, result, serverPath in transmits:
+                    if isinstance(result, ASAPUploadJob):
+                        finalZipPath = xmitSentPath
+                        if not result.wait() and not result.isFinished():
+                            # the upload may still be reading the zip, so leave it alone until it ends
+                            self._getLogger().warn('Upload of {path!s:s} to TRO did not finish within {timeout:d} '
+                                                   'seconds, waiting for it to end.'
+                                                   .format(path=asapZipFile.fileName, timeout=TRO_FTP_TIMEOUT))
+                            lateTransmits.append((asapZipFile, xmitZipFile, sentZipFile, result, serverPath))
+                            continue
+                        if result.succeeded():
+                            self._getLogger().info("{path!s:s} Transmitted to CRL Server in {elapsed:.1f} seconds"
+                                                   .format(path=asapZipFile.fileName, elapsed=result.elapsed))
                         else:
-                            self._getLogger().info("ACORD Notified that ASAP case sent.")
+                            # queue it to be retried shortly, instead of restaging it from retrans in a later run
+                            self._getLogger().warn('Failed to FTP file {path!s:s} to TRO\n{error!s:s}'
+                                                   .format(path=asapZipFile.fileName, error=result.errorText))
+                            outboxZipPath = os.path.join(xmitOutboxPath, asapZipFile.fileName)
+                            try:
+                                outbox.enqueue(contact.contact_id, outboxZipPath, serverPath, result.error)
+                            except Exception:
+                                fSuccess = False
+                                finalZipPath = xmitRetransPath
+                                sentZipFile = asapZipFile.fileName
+                                self._getLogger().warn('Unable to queue {path!s:s} for retry (moving to retrans folder):'
+                                                       .format(path=asapZipFile.fileName), exc_info=True)
+                            else:
+                                fm.moveFile(fm.newFile(xmitZipFile, True), outboxZipPath)
+                                continue
+                    else:
+                        finalZipPath = result
+
+                    # Send the notification to ACORD that the case has been uploaded
+                    if (fSuccess):
+                        fSuccess = self._notifyAcord(asapZipFile.fileName)
+
+                    # move zip file to either sent or retrans folder
+                    if xmitZipFile:
+                        fm.moveFile(fm.newFile(xmitZipFile, True), os.path.join(finalZipPath, sentZipFile))
+                        self._getLogger().info("File moved to SENT Folder {zipFile!s:s}, {zipPath!s:s}."
+                                               .format(zipFile=xmitZipFile, zipPath=os.path.join(finalZipPath, sentZipFile)))
+                for asapZipFile, xmitZipFile, sentZipFile, result, serverPath in lateTransmits:
+                    result.waitFinished()
+                transmits = lateTransmits
+
+        # retry the uploads that failed, in this run or an earlier one, as they come due
+        def retryUpload(item):
+            job = scheduler.submit(uploadKey, os.path.basename(item.filePath), self._uploadToCrlServer,
+                                   CRL_FTP_SERVER, item.filePath, item.remotePath,
+                                   CRL_FTP_USER, CRL_FTP_USER_PASSWORD, timeout=TRO_FTP_TIMEOUT)
+            # the attempt is only over when the upload has ended, so the file is never sent twice at once
+            if not job.waitFinished():
+                raise job.error
 
-                # move zip file to either sent or retrans folder
-                if xmitZipFile:
-                    fm.moveFile(fm.newFile(xmitZipFile, True), os.path.join(finalZipPath, sentZipFile))
-                    self._getLogger().info("File moved to SENT Folder {zipFile!s:s}, {zipPath!s:s}."
-                                           .format(zipFile=xmitZipFile, zipPath=os.path.join(finalZipPath, sentZipFile)))
+        try:
+            sentItems, abandonedItems = outbox.process(contact.contact_id, retryUpload)
+            fPending = bool(outbox.getPending(contact.contact_id))
+        except Exception:
+            # the queued zips stay in the outbox folder until the outbox can be read again
+            self._getLogger().warn('Unable to retry the queued uploads for {contact_id!s:s}:'
+                                   .format(contact_id=contact.contact_id), exc_info=True)
+            sentItems, abandonedItems, fPending = [], [], True
+        for item in sentItems:
+            fileName = os.path.basename(item.filePath)
+            if not self._notifyAcord(fileName):
+                fSuccess = False
+            sentZipFile = '{basename!s:s}_{dt:%Y%m%d%H%M%S}.ZIP'.format(basename=fileName.split('.')[0],
+                                                                        dt=datetime.datetime.today())
+            fm.moveFile(fm.newFile(item.filePath, True), os.path.join(xmitSentPath, sentZipFile))
+            self._getLogger().info("File moved to SENT Folder {zipFile!s:s}, {zipPath!s:s}."
+                                   .format(zipFile=item.filePath, zipPath=os.path.join(xmitSentPath, sentZipFile)))
+        for item in abandonedItems:
+            fSuccess = False
+            fileName = os.path.basename(item.filePath)
+            fm.moveFile(fm.newFile(item.filePath, True), os.path.join(xmitRetransPath, fileName))
+            self._getLogger().warn('Failed to FTP file {path!s:s} to TRO after {attempts:d} attempts (moving to retrans folder)'
+                                   .format(path=fileName, attempts=item.attempts))
+        if fPending:
+            fSuccess = False
+
+        return fSuccess
 
+    def _notifyAcord(self, zipFileName):
+        """
+        Send the notification to ACORD that the case has been uploaded.
+        This is done only for version 2 files as version 1 files are basically retransmits
+        Version 2 files have tracking id in the filenames so extract from the name.
+        """
+        fSuccess = True
+        file_nm = zipFileName.split('.')[0]
+        if len(file_nm.split('_')) == 3:
+            tracking_id = file_nm.split('_')[2]
+            req = ASAP_UTILITY.getASAPAcordRequest()
+            if not req.makeRequestByTrackingId(tracking_id):
+                fSuccess = False
+                self._getLogger().info("Error while notifying ACORD for {tracking_id!s:s}.".format(tracking_id=tracking_id))
+            else:
+                self._getLogger().info("ACORD Notified that ASAP case sent.")
         return fSuccess
 
     def transmitByEmail(self, asapZipFile):
@@ -867,7 +979,7 @@ def TRORecon():
         caseFactory = ASAP_UTILITY.getASAPCaseFactory()
         viableFactory = ASAP_UTILITY.getViableCaseFactory()
         docHistory = ASAP_UTILITY.getASAPDocumentHistory()
-        acord103Store = ASAP_UTILITY.getASAPAcord103Store()
+        acord103Store = ASAP_UTILITY.getAcord103Store()
 
         if not os.path.isdir(reconProcessedFolder):
             os.makedirs(reconProcessedFolder)
@@ -33,6 +33,13 @@
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
           Moved AG specific FTP Info to the AIGCustom TransmitHandler class
+
+      19-Oct-2026   ilsdev   user-034
+          Added setSetting and newCursor.
+
+      19-Oct-2026   ilsdev   user-034
+          The loaded settings are read and changed under a lock, since the
+          file purge saves its mark from another thread.
 """
 
 
@@ -40,6 +47,7 @@
 import DevInstance
 import CRLUtility
 import os
+import threading
 from collections import defaultdict
 from CRL.DBCursor import CRLDBCursor
 from .Contact import ASAPContact
@@ -78,6 +86,9 @@ class ASAPTransmitConfig(object):
     SETTING_DELTA_EXPORT_FIELD = 'delta_export_field'
     SETTING_NO_BILL_NO_SEND_CODE = 'no_bill_no_send_code'
     SETTING_NO_BILL_CODE = 'no_bill_code'
+    SETTING_ACORD103_STORAGE = 'acord103_storage'
+    SETTING_FILE_CONTENT_DIR = 'file_content_dir'
+    SETTING_FILE_PURGE_MARK = 'file_purge_mark'
     # constants for the common database names in the asap_db_settings table
     DB_NAME_XMIT = 'xmit'
     DB_NAME_SIP = 'sip'
@@ -92,6 +103,8 @@ class ASAPTransmitConfig(object):
     # a cache of database connection info loaded from asap_db_settings, passed to CRLDBCursor
     __cursor_info = {}
     __settings = {}
+    # guards __settings, which setSetting changes from other threads
+    __settingsLock = threading.RLock()
     __contacts = {}  # type: dict[tuple, ASAPContact]
     __initialized = False
 
@@ -140,8 +153,9 @@ class ASAPTransmitConfig(object):
         recs = cursor.fetch()
         cursor.rollback()
         if recs:
-            for name, value in recs:
-                self.__settings[name] = value
+            with self.__settingsLock:
+                for name, value in recs:
+                    self.__settings[name] = value
 
     def __loadContactIndex(self, contact):
         """
@@ -457,7 +471,47 @@ class ASAPTransmitConfig(object):
     def getSetting(self, sName):
         if not self.__initialized:
             self.__initialize()
-        return self.__settings.get(sName)
+        with self.__settingsLock:
+            return self.__settings.get(sName)
+
+    def setSetting(self, sName, sValue, cursor=None):
+        """ Save a value in the asap_settings table (adding the setting if it
+        is not there yet) and in the loaded settings.
+
+        :param str sName:
+        :param str sValue:
+        :param cursor: cursor for the xmit database, if not the shared one
+        """
+        if not self.__initialized:
+            self.__initialize()
+        if cursor is None:
+            cursor = self.getCursor(self.DB_NAME_XMIT)
+        sValue = '{value!s:s}'.format(value=sValue).replace("'", "''")
+        # held while the row is written too, so two threads do not both insert it
+        with self.__settingsLock:
+            iRet = cursor.execute('''
+                update {table!s:s} set setting_value = '{value!s:s}'
+                where setting_name = '{name!s:s}'
+                '''.format(table=self.TABLE_SETTINGS, name=sName, value=sValue))
+            if not iRet:
+                cursor.execute('''
+                    insert into {table!s:s} (setting_name, setting_value)
+                    values ('{name!s:s}', '{value!s:s}')
+                    '''.format(table=self.TABLE_SETTINGS, name=sName, value=sValue))
+            cursor.commit()
+            self.__settings[sName] = sValue.replace("''", "'")
+
+    def newCursor(self, dbName):
+        """ Return a new cursor for dbName that is not shared through getCursor,
+        for work done on another thread.  The caller should close it when done.
+
+        :param dbName:
+        :rtype: CRLDBCursor
+        """
+        if not self.__initialized:
+            self.__initialize()
+        dbtype, connstr = self._getCursorInfo(dbName)
+        return CRLDBCursor(dbName, dbtype, connstr)
 
     def close(self):
         # for cursor in self.__cursors.values():
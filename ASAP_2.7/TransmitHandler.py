@@ -28,6 +28,10 @@
       27-Sep-2019   jbn     SCTASK0021398
           Migrating ASAP to new apphub
           Upgrade to Python 2.7
+
+      19-Oct-2026   ilsdev  user-040
+          Load the transmit history of all cases to stage in one query, and
+          answer _isFirstTransmit/_isFullTransmit from it.
 """
 
 import CRLUtility
@@ -43,7 +47,6 @@ class ASAPTransmitHandler(object):
     transmission of cases.  This class must be overridden to be
     of any use.
     """
-
     def __init__(self, logger=None):
         # print('in base init')
         if not logger:
@@ -75,27 +78,13 @@ class ASAPTransmitHandler(object):
         """
         Check if current case is being transmitted for first time.
         """
-        fFirst = True
-        hist = ASAP_UTILITY.getDocumentHistory()
-        if hist.getTrackedDocidsForCase(self.__currentCase, hist.ACTION_TRANSMIT):
-            fFirst = False
-        return fFirst
+        return ASAP_UTILITY.getDocumentHistory().isFirstTransmit(self.__currentCase)
 
     def _isFullTransmit(self):
         """
         Check if entire current case is being transmitted.
         """
-        fFull = True
-        hist = ASAP_UTILITY.getDocumentHistory()
-        xmitRecs = hist.getTrackedDocidsForCase(self.__currentCase, hist.ACTION_TRANSMIT)
-        xmitDocids = [docid for docid, auditstamp in xmitRecs]
-        docids = list(self.__currentCase.getDocuments().keys())
-        for docid in docids:
-            if docid in xmitDocids:
-                xmitDocids.remove(docid)
-        if xmitDocids:
-            fFull = False
-        return fFull
+        return ASAP_UTILITY.getDocumentHistory().isFullTransmit(self.__currentCase)
 
     def _stageIndexedCase(self):
         """
@@ -170,6 +159,8 @@ class ASAPTransmitHandler(object):
         if not self._preStage():
             self.__logger.warn('Pre-stage process failed.')
             return False
+        # one query for the transmit history of the whole batch
+        ASAP_UTILITY.getDocumentHistory().loadTransmitHistory(asapCases)
         for asapCase in asapCases:
             self.__currentCase = asapCase
             if self._isIndexedCaseReady():
@@ -0,0 +1,453 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      TransmitPipeline
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPTransmitPipeline class, which packages
+      and sends a batch of files as one stream: the zip output is fed
+      straight into the PGP encryptor, whose output is read by the upload.
+      Before, the zip was written to disk, CRLPGPEncrypt read it and wrote
+      a second file, and the upload read that file again.
+
+      The encryption is done by the gpg command line, reading from and
+      writing to pipes, with the keys already installed for CRLPGPEncrypt
+      (see ASAPPgpEncryptor).  zipfile cannot write to an unseekable
+      stream before Python 3.5, so on the Python 2.7 runtime the zip is
+      always spooled to one file on disk (which is kept for the sent
+      folder when archivePath is given), and only the encryption and
+      upload stream from it.  On Python 3.5 and later the zip is streamed
+      too, and the sent-folder copy is written as the stream passes.
+
+      The upload is written under a temporary name (ASAPUpload.TEMP_SUFFIX)
+      and only renamed to its final name once the zip and gpg have both
+      finished without error, so a failed run never leaves a truncated
+      file where the carrier picks its files up; the temporary file is
+      removed instead.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-038
+          Upload to a temporary name, renamed only after the zip and gpg
+          succeed (ASAPUpload).  State that the zip is always spooled on
+          Python 2.7.
+
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+import CRLUtility
+from .TransportPool import ASAPTransportSession
+from .ZipBuilder import isCompressed
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ASAPPgpEncryptor(object):
+    """
+    Runs gpg to encrypt a stream for a recipient, signed by the local user,
+    as CRLPGPEncrypt does for files.
+    """
+    DEFAULT_COMMAND = 'gpg'
+
+    def __init__(self, localUser, recipient, command=DEFAULT_COMMAND, fSign=True):
+        """
+
+        :param str localUser: key used to sign (the first argument to CRLPGPEncrypt)
+        :param str recipient: key the data is encrypted for
+        :param str command: gpg executable
+        :param bool fSign:
+        """
+        self.localUser = localUser
+        self.recipient = recipient
+        self.command = command
+        self.fSign = fSign
+
+    def getArgs(self):
+        args = [self.command, '--batch', '--yes', '--trust-model', 'always',
+                '--local-user', self.localUser, '--recipient', self.recipient, '--encrypt']
+        if self.fSign:
+            args.append('--sign')
+        return args
+
+    def start(self, stderr):
+        """ Start gpg reading plain data on stdin and writing the encrypted
+        data to stdout.
+
+        :param stderr: file object that receives gpg's messages
+        :rtype: subprocess.Popen
+        """
+        return subprocess.Popen(self.getArgs(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr)
+
+
+class ASAPPipelineResult(object):
+    """
+    Byte counts and timings for one run of the pipeline.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.zipBytes = 0
+        self.sentBytes = 0
+        self.elapsed = 0.0
+        self.fSpooled = False
+
+    def __repr__(self):
+        return ('<ASAPPipelineResult {files:d} files, {zipBytes:d} bytes zipped, {sentBytes:d} bytes sent '
+                'in {elapsed:.3f}s{spooled!s:s}>'.format(files=self.files, zipBytes=self.zipBytes,
+                                                          sentBytes=self.sentBytes, elapsed=self.elapsed,
+                                                          spooled=' (spooled)' if self.fSpooled else ''))
+
+
+class _StreamWriter(object):
+    """
+    Write-only, unseekable file object that copies everything written to
+    each of its targets and counts the bytes.
+    """
+
+    def __init__(self, targets):
+        self.__targets = [target for target in targets if target is not None]
+        self.count = 0
+
+    def write(self, data):
+        for target in self.__targets:
+            target.write(data)
+        self.count += len(data)
+        return len(data)
+
+    def flush(self):
+        for target in self.__targets:
+            target.flush()
+
+
+class _CountingReader(object):
+    """
+    Wraps a readable file object and counts the bytes read from it.
+    """
+
+    def __init__(self, source):
+        self.__source = source
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.__source.read(size)
+        self.count += len(data)
+        return data
+
+
+class ASAPUpload(object):
+    """
+    Upload target for the pipeline.  Calling it with a readable file object
+    stores the stream under a temporary name; commit gives the file its
+    final name once the pipeline knows the stream was complete, and abort
+    removes the temporary file.
+    """
+    TEMP_SUFFIX = '.part'
+
+    def __call__(self, stream):
+        self.send(stream)
+
+    def send(self, stream):
+        raise NotImplementedError
+
+    def commit(self):
+        raise NotImplementedError
+
+    def abort(self):
+        raise NotImplementedError
+
+
+class _PoolUpload(ASAPUpload):
+    """
+    Upload over a pooled FTP or SFTP session.
+    """
+
+    def __init__(self, transportPool, host, user, password, remotePath, port, protocol):
+        self.__transportPool = transportPool
+        self.__args = (host, user, password, port, protocol)
+        self.__remotePath = remotePath
+        self.__tempPath = remotePath + self.TEMP_SUFFIX
+
+    def send(self, stream):
+        with self.__transportPool.session(*self.__args) as session:
+            session.putStream(stream, self.__tempPath)
+
+    def commit(self):
+        with self.__transportPool.session(*self.__args) as session:
+            session.rename(self.__tempPath, self.__remotePath)
+
+    def abort(self):
+        with self.__transportPool.session(*self.__args) as session:
+            session.delete(self.__tempPath)
+
+
+class _FileUpload(ASAPUpload):
+    """
+    Upload to a local file (used in place of the upload on development instances).
+    """
+
+    def __init__(self, filePath):
+        self.__filePath = filePath
+        self.__tempPath = filePath + self.TEMP_SUFFIX
+
+    def send(self, stream):
+        ptr = open(self.__tempPath, 'wb')
+        try:
+            shutil.copyfileobj(stream, ptr, CHUNK_SIZE)
+        finally:
+            ptr.close()
+
+    def commit(self):
+        if os.path.isfile(self.__filePath):
+            os.remove(self.__filePath)
+        os.rename(self.__tempPath, self.__filePath)
+
+    def abort(self):
+        if os.path.isfile(self.__tempPath):
+            os.remove(self.__tempPath)
+
+
+class ASAPTransmitPipeline(object):
+    """
+    Zip -> PGP -> upload, as one stream.  The upload is an ASAPUpload (see
+    ftpUploader, sftpUploader and fileUploader), or any callable that takes
+    a readable file object and reads it to the end (which is then written
+    under its final name as it goes).
+    """
+
+    def __init__(self, encryptor=None, spoolDir=None, fSpool=False, logger=None):
+        """
+
+        :param ASAPPgpEncryptor encryptor: None to send the zip as it is
+        :param str spoolDir: folder for the spooled zip (default is the system temp folder)
+        :param bool fSpool: always spool the zip to disk
+        :param logger:
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__encryptor = encryptor
+        self.__spoolDir = spoolDir
+        self.__fSpool = fSpool or not self.canStreamZip()
+
+    @staticmethod
+    def canStreamZip():
+        """
+        True if zipfile can write to an unseekable stream (Python 3.5 and later).
+        """
+        return sys.version_info >= (3, 5)
+
+    @staticmethod
+    def ftpUploader(transportPool, host, user, password, remotePath, port=None):
+        """ Return an upload that stores the stream over a pooled FTP session.
+
+        :rtype: ASAPUpload
+        """
+        return _PoolUpload(transportPool, host, user, password, remotePath, port, ASAPTransportSession.PROTOCOL_FTP)
+
+    @staticmethod
+    def sftpUploader(transportPool, host, user, password, remotePath, port=None):
+        """ Return an upload that stores the stream over a pooled SFTP session.
+
+        :rtype: ASAPUpload
+        """
+        return _PoolUpload(transportPool, host, user, password, remotePath, port, ASAPTransportSession.PROTOCOL_SFTP)
+
+    @staticmethod
+    def fileUploader(filePath):
+        """ Return an upload that writes the stream to a local file
+        (used in place of the upload on development instances).
+
+        :rtype: ASAPUpload
+        """
+        return _FileUpload(filePath)
+
+    @staticmethod
+    def __writeZip(sourcePaths, fileObj):
+        zf = zipfile.ZipFile(fileObj, 'w', zipfile.ZIP_DEFLATED, True)
+        try:
+            for sourcePath in sourcePaths:
+                zf.write(sourcePath, os.path.basename(sourcePath),
+                         zipfile.ZIP_STORED if isCompressed(sourcePath) else zipfile.ZIP_DEFLATED)
+        finally:
+            zf.close()
+
+    def __spool(self, sourcePaths, spoolPath):
+        ptr = open(spoolPath, 'wb')
+        try:
+            self.__writeZip(sourcePaths, ptr)
+        finally:
+            ptr.close()
+
+    def run(self, sourcePaths, upload, archivePath=None, fZip=True):
+        """ Zip the source files, encrypt the zip and upload it.  Raises if
+        any stage fails; archivePath is only written if the zip was
+        complete.  With fZip False, the single source file is encrypted
+        and uploaded as it is.
+
+        :param list[str] sourcePaths:
+        :param upload: callable taking a readable file object
+        :param str archivePath: where to keep a copy of the zip (optional)
+        :param bool fZip:
+        :rtype: ASAPPipelineResult
+        """
+        result = ASAPPipelineResult()
+        result.files = len(sourcePaths)
+        beginTime = time.time()
+        if not fZip:
+            if len(sourcePaths) != 1:
+                raise ValueError('Exactly one file can be sent without zipping it.')
+            result.zipBytes = os.path.getsize(sourcePaths[0])
+            self.__sendFile(sourcePaths[0], upload, result)
+        elif self.__fSpool:
+            result.fSpooled = True
+            if archivePath:
+                spoolPath = archivePath + '.tmp'
+            else:
+                fd, spoolPath = tempfile.mkstemp('.zip', 'asap', self.__spoolDir)
+                os.close(fd)
+            try:
+                self.__spool(sourcePaths, spoolPath)
+                result.zipBytes = os.path.getsize(spoolPath)
+                if archivePath:
+                    shutil.move(spoolPath, archivePath)
+                    spoolPath = archivePath
+                self.__sendFile(spoolPath, upload, result)
+            finally:
+                if spoolPath != archivePath and os.path.isfile(spoolPath):
+                    os.remove(spoolPath)
+        else:
+            self.__sendStream(sourcePaths, upload, archivePath, result)
+        result.elapsed = time.time() - beginTime
+        self.__logger.debug('Pipeline sent {result!r:s}.'.format(result=result))
+        return result
+
+    def __sendFile(self, filePath, upload, result):
+        """
+        Encrypt (if needed) and upload a file, streaming it from disk.
+        """
+        def produce(sink):
+            ptr = open(filePath, 'rb')
+            try:
+                shutil.copyfileobj(ptr, sink, CHUNK_SIZE)
+            finally:
+                ptr.close()
+        self.__transfer(produce, upload, result)
+
+    def __sendStream(self, sourcePaths, upload, archivePath, result):
+        """
+        Zip straight into the encryptor (or the upload), keeping a copy at archivePath.
+        """
+        archiveTmp = archivePath + '.tmp' if archivePath else None
+        archivePtr = open(archiveTmp, 'wb') if archiveTmp else None
+        writers = []
+
+        def produce(sink):
+            writer = _StreamWriter([sink, archivePtr])
+            writers.append(writer)
+            self.__writeZip(sourcePaths, writer)
+
+        try:
+            self.__transfer(produce, upload, result)
+        except Exception:
+            if archivePtr:
+                archivePtr.close()
+                os.remove(archiveTmp)
+            raise
+        if writers:
+            result.zipBytes = writers[0].count
+        if archivePtr:
+            archivePtr.close()
+            shutil.move(archiveTmp, archivePath)
+
+    def __transfer(self, produce, upload, result):
+        """
+        Run produce(sink) on a thread, writing into the encryptor (or a
+        pipe), while upload reads the other end on this thread.  The upload
+        is committed only if the producer and gpg both succeeded, and
+        aborted otherwise.
+        """
+        try:
+            self.__stream(produce, upload, result)
+        except Exception:
+            if isinstance(upload, ASAPUpload):
+                try:
+                    upload.abort()
+                except Exception:
+                    self.__logger.warn('Unable to remove the partial upload:', exc_info=True)
+            raise
+        if isinstance(upload, ASAPUpload):
+            upload.commit()
+
+    def __stream(self, produce, upload, result):
+        errors = []
+        stderr = None
+        process = None
+        if self.__encryptor:
+            stderr = tempfile.TemporaryFile()
+            process = self.__encryptor.start(stderr)
+            sink, source = process.stdin, process.stdout
+        else:
+            readFd, writeFd = os.pipe()
+            sink, source = os.fdopen(writeFd, 'wb'), os.fdopen(readFd, 'rb')
+
+        def run():
+            try:
+                produce(sink)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                try:
+                    sink.close()
+                except Exception:
+                    pass
+
+        producer = threading.Thread(target=run, name='ASAPTransmitPipeline')
+        producer.daemon = True
+        producer.start()
+        reader = _CountingReader(source)
+        try:
+            upload(reader)
+            # drain anything the upload left unread, so the producer is never stuck on a full pipe
+            while reader.read(CHUNK_SIZE):
+                pass
+        except Exception:
+            if process:
+                process.kill()
+            source.close()
+            producer.join()
+            raise
+        finally:
+            result.sentBytes = reader.count
+        source.close()
+        producer.join()
+        if errors:
+            if process:
+                process.wait()
+            raise errors[0]
+        if process:
+            iRet = process.wait()
+            if iRet != 0:
+                stderr.seek(0)
+                raise IOError('{command!s:s} returned {iRet:d}: {message!s:s}'.format(
+                    command=self.__encryptor.command, iRet=iRet, message=stderr.read().decode('latin-1').strip()))
+            stderr.close()
@@ -0,0 +1,358 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      TransportPool
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPTransportPool class, which keeps
+      authenticated SFTP and FTP sessions open for reuse across files and
+      contacts during a run, keyed by protocol, host, port and user.
+      Sessions are checked before they are handed out again, SFTP
+      transports send keepalives while idle, and the number of sessions
+      in use per host is capped.  Each transmit handler sets the cap for
+      its host with setHostLimit before its first upload; contacts that
+      share a host share its cap.  A host with no cap set is not limited.
+      The cap is counted per thread: a thread that already holds a session
+      to a host is not held back when it asks for another one, so it
+      cannot wait on itself.  Also included is the ASAPTransportSession
+      class that is returned by the pool.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-038
+          Added ASAPTransportSession.putStream.
+
+      19-Oct-2026   ilsdev  user-038
+          Added ASAPTransportSession.rename and delete.
+
+      19-Oct-2026   ilsdev  user-035
+          Do not cap the sessions per host unless setHostLimit is called, and
+          let a thread that already holds a session to a host acquire another.
+
+      19-Oct-2026   ilsdev  user-035
+          setHostLimit may be called by each contact that uses a host (the
+          first call sets the cap), and no more than DEFAULT_MAX_IDLE idle
+          sessions are kept for a host with no cap.
+
+"""
+
+import ftplib
+import threading
+import time
+from contextlib import contextmanager
+
+import CRLUtility
+
+
+class ASAPTransportSession(object):
+    """
+    An open SFTP or FTP session.  For SFTP, sftp is the paramiko SFTPClient;
+    for FTP, ftp is the logged-in ftplib.FTP object (which can be passed
+    to CRLUtility.CRLFTPPut in place of a host name).
+    """
+    PROTOCOL_SFTP = 'sftp'
+    PROTOCOL_FTP = 'ftp'
+
+    def __init__(self, key, keepaliveSeconds):
+        protocol, host, port, user, password = key
+        self.key = key[:4]
+        self.protocol = protocol
+        self.host = host
+        self.lastUsed = time.time()
+        self.transport = None
+        self.sftp = None
+        self.ftp = None
+        if protocol == self.PROTOCOL_SFTP:
+            import paramiko
+            # noinspection PyTypeChecker
+            self.transport = paramiko.Transport((host, port))
+            try:
+                self.transport.connect(username=user, password=password)
+                self.transport.set_keepalive(keepaliveSeconds)
+                self.sftp = paramiko.SFTPClient.from_transport(self.transport)
+            except Exception:
+                self.transport.close()
+                raise
+        elif protocol == self.PROTOCOL_FTP:
+            self.ftp = ftplib.FTP()
+            try:
+                self.ftp.connect(host, port or ftplib.FTP_PORT)
+                self.ftp.login(user, password)
+            except Exception:
+                self.ftp.close()
+                raise
+        else:
+            raise ValueError('Unknown transport protocol: {protocol!s:s}'.format(protocol=protocol))
+
+    def __repr__(self):
+        return '<{protocol!s:s} session {user!s:s}@{host!s:s}:{port!s:s}>'.format(
+            protocol=self.protocol, user=self.key[3], host=self.host, port=self.key[2])
+
+    def put(self, localPath, remotePath):
+        """ Upload a file, returning the SFTP attributes (SFTP) or the
+        server response (FTP).
+
+        :param str localPath:
+        :param str remotePath:
+        """
+        self.lastUsed = time.time()
+        if self.sftp:
+            return self.sftp.put(localPath, remotePath)
+        ptr = open(localPath, 'rb')
+        try:
+            return self.ftp.storbinary('STOR {remotePath!s:s}'.format(remotePath=remotePath), ptr)
+        finally:
+            ptr.close()
+
+    def putStream(self, stream, remotePath):
+        """ Upload everything read from a file object.
+
+        :param stream: readable file object
+        :param str remotePath:
+        """
+        self.lastUsed = time.time()
+        if self.sftp:
+            return self.sftp.putfo(stream, remotePath)
+        return self.ftp.storbinary('STOR {remotePath!s:s}'.format(remotePath=remotePath), stream)
+
+    def rename(self, fromPath, toPath):
+        """ Rename a remote file, replacing any file already at toPath.
+
+        :param str fromPath:
+        :param str toPath:
+        """
+        self.lastUsed = time.time()
+        if self.sftp:
+            try:
+                self.sftp.remove(toPath)
+            except IOError:
+                pass
+            return self.sftp.rename(fromPath, toPath)
+        try:
+            self.ftp.delete(toPath)
+        except ftplib.error_perm:
+            pass
+        return self.ftp.rename(fromPath, toPath)
+
+    def delete(self, remotePath):
+        """ Remove a remote file.
+
+        :param str remotePath:
+        """
+        self.lastUsed = time.time()
+        if self.sftp:
+            return self.sftp.remove(remotePath)
+        return self.ftp.delete(remotePath)
+
+    def isHealthy(self):
+        """
+        True if the session still answers the server.
+        """
+        try:
+            if self.sftp:
+                if not self.transport.is_active():
+                    return False
+                self.transport.send_ignore()
+                return True
+            self.ftp.voidcmd('NOOP')
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        for closer in (self.sftp, self.transport, self.ftp):
+            if closer:
+                try:
+                    if closer is self.ftp:
+                        closer.quit()
+                    else:
+                        closer.close()
+                except Exception:
+                    try:
+                        closer.close()
+                    except Exception:
+                        pass
+        self.sftp = self.transport = self.ftp = None
+
+
+class _HostSlots(object):
+    """
+    Limit on the sessions in use at once for one host (no limit if
+    maxSessions is None).  The limit is counted per thread: a thread that
+    already holds a slot gets further ones without waiting, and its slot
+    is given back when it has released them all.
+    """
+
+    def __init__(self, maxSessions):
+        self.__semaphore = threading.BoundedSemaphore(maxSessions) if maxSessions else None
+        self.__local = threading.local()
+
+    def acquire(self):
+        depth = getattr(self.__local, 'depth', 0)
+        if not depth and self.__semaphore:
+            self.__semaphore.acquire()
+        self.__local.depth = depth + 1
+
+    def release(self):
+        self.__local.depth -= 1
+        if not self.__local.depth and self.__semaphore:
+            self.__semaphore.release()
+
+
+class ASAPTransportPool(object):
+    """
+    Pool of ASAPTransportSession objects.  Use session() in a with
+    statement, or acquire() and release() in pairs.
+    """
+    DEFAULT_MAX_PER_HOST = None
+    DEFAULT_MAX_IDLE = 2
+    DEFAULT_KEEPALIVE_SECONDS = 30
+    DEFAULT_IDLE_SECONDS = 300
+
+    def __init__(self, logger=None, maxPerHost=DEFAULT_MAX_PER_HOST,
+                 keepaliveSeconds=DEFAULT_KEEPALIVE_SECONDS, idleSeconds=DEFAULT_IDLE_SECONDS,
+                 maxIdle=DEFAULT_MAX_IDLE):
+        """
+
+        :param logger:
+        :param int|None maxPerHost: sessions that may be in use at once per host,
+            for hosts without setHostLimit (None for no limit)
+        :param int keepaliveSeconds: interval for SFTP keepalives
+        :param int idleSeconds: idle sessions older than this are closed instead of reused
+        :param int maxIdle: idle sessions kept per host and user, for hosts with no limit
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__maxPerHost = max(1, int(maxPerHost)) if maxPerHost else None
+        self.__keepaliveSeconds = keepaliveSeconds
+        self.__idleSeconds = idleSeconds
+        self.__maxIdle = max(1, int(maxIdle))
+        self.__lock = threading.Lock()
+        self.__idle = {}         # type: dict[tuple, list[ASAPTransportSession]]
+        self.__hostLimits = {}   # type: dict[str, int|None]
+        self.__hostSlots = {}    # type: dict[str, _HostSlots]
+
+    def setHostLimit(self, host, maxSessions):
+        """ Set the number of sessions that may be in use at once for a host.
+        Must be called before the first session to the host is acquired;
+        later calls with the same limit are ignored.
+
+        :param str host:
+        :param int maxSessions:
+        """
+        key = host.lower()
+        limit = max(1, int(maxSessions))
+        with self.__lock:
+            if key in self.__hostSlots:
+                if self.__hostLimits.get(key, self.__maxPerHost) != limit:
+                    self.__logger.warn('Session limit for {host!s:s} is already in use and was not changed.'
+                                       .format(host=host))
+                return
+            self.__hostLimits[key] = limit
+
+    def __getHostSlots(self, host):
+        host = host.lower()
+        with self.__lock:
+            slots = self.__hostSlots.get(host)
+            if slots is None:
+                slots = _HostSlots(self.__hostLimits.get(host, self.__maxPerHost))
+                self.__hostSlots[host] = slots
+            return slots
+
+    def acquire(self, host, user, password, port=None, protocol=ASAPTransportSession.PROTOCOL_SFTP):
+        """ Return a session for (protocol, host, port, user), reusing an idle
+        one if it is still healthy.  Blocks while the host is at its limit,
+        unless this thread already holds a session to the host.
+
+        :param str host:
+        :param str user:
+        :param str password:
+        :param int|None port:
+        :param str protocol: ASAPTransportSession.PROTOCOL_SFTP or PROTOCOL_FTP
+        :rtype: ASAPTransportSession
+        """
+        if port is None and protocol == ASAPTransportSession.PROTOCOL_SFTP:
+            port = 22
+        key = (protocol, host, port, user)
+        slots = self.__getHostSlots(host)
+        slots.acquire()
+        try:
+            while True:
+                with self.__lock:
+                    idle = self.__idle.get(key)
+                    session = idle.pop() if idle else None
+                if session is None:
+                    break
+                if time.time() - session.lastUsed < self.__idleSeconds and session.isHealthy():
+                    self.__logger.debug('Reusing {session!r:s}.'.format(session=session))
+                    return session
+                self.__logger.debug('Closing stale {session!r:s}.'.format(session=session))
+                session.close()
+            session = ASAPTransportSession(key + (password,), self.__keepaliveSeconds)
+            self.__logger.debug('Opened {session!r:s}.'.format(session=session))
+            return session
+        except Exception:
+            slots.release()
+            raise
+
+    def release(self, session, fDiscard=False):
+        """ Return a session to the pool.  Set fDiscard if the session failed,
+        so it is closed rather than reused.
+
+        :param ASAPTransportSession session:
+        :param bool fDiscard:
+        """
+        host = session.host
+        try:
+            fKeep = False
+            if not fDiscard:
+                session.lastUsed = time.time()
+                with self.__lock:
+                    idle = self.__idle.setdefault(session.key, [])
+                    # keep no more idle sessions than the host may use at once
+                    maxSessions = self.__hostLimits.get(host.lower(), self.__maxPerHost) or self.__maxIdle
+                    if len(idle) < maxSessions:
+                        idle.append(session)
+                        fKeep = True
+            if not fKeep:
+                session.close()
+        finally:
+            self.__getHostSlots(host).release()
+
+    @contextmanager
+    def session(self, host, user, password, port=None, protocol=ASAPTransportSession.PROTOCOL_SFTP):
+        """ Context manager for acquire/release.  If the block raises, the
+        session is closed instead of being returned to the pool.
+        """
+        session = self.acquire(host, user, password, port, protocol)
+        try:
+            yield session
+        except Exception:
+            self.release(session, True)
+            raise
+        self.release(session)
+
+    def closeAll(self):
+        """
+        Close every idle session.  Sessions in use are closed when released.
+        """
+        with self.__lock:
+            sessions = [session for idle in self.__idle.values() for session in idle]
+            self.__idle.clear()
+        for session in sessions:
+            session.close()
+        if sessions:
+            self.__logger.debug('Closed {count:d} pooled transport sessions.'.format(count=len(sessions)))
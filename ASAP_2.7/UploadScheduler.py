@@ -0,0 +1,271 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      UploadScheduler
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPUploadScheduler class, which runs file
+      uploads on a fixed pool of worker threads fed from one queue.  Each
+      destination host has a limit on the uploads running at once and, if
+      the host requires it, a minimum pause between uploads; these replace
+      the module-level locks the transmit handlers used to serialise their
+      uploads.  A worker only takes a job whose host has a free slot, so a
+      busy host does not hold up the others.
+
+      Each upload can be given a timeout, after which wait() stops waiting
+      for it.  An upload cannot be stopped once it has started, so a job
+      that timed out is still running: it is neither a success nor a
+      failure until it finishes (see isFinished and waitFinished), and
+      the file must not be moved or sent again before then.  Also included
+      is the ASAPUploadJob class that is returned for each upload.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+      19-Oct-2026   ilsdev  user-036
+          Run the uploads on a fixed pool of workers instead of two threads
+          per job, and do not report a timed-out upload as failed while it
+          is still running.
+
+"""
+
+import threading
+import time
+import traceback
+
+import CRLUtility
+
+
+class ASAPUploadJob(object):
+    """
+    One scheduled upload.  After wait() returns, error holds the exception
+    raised by the upload (None on success), and fTimedOut is set if the
+    upload had not finished within its timeout; it may then still be
+    running (isFinished is False).
+    """
+
+    def __init__(self, host, name, func, args, timeout):
+        self.host = host
+        self.name = name
+        self.func = func
+        self.args = args
+        self.timeout = timeout
+        self.result = None
+        self.error = None           # type: Exception|None
+        self.errorText = ''
+        self.fTimedOut = False
+        self.beginTime = None       # type: float|None
+        self.elapsed = 0.0
+        self.__started = threading.Event()
+        self.__finished = threading.Event()
+
+    def __repr__(self):
+        if not self.__started.is_set():
+            sState = 'queued'
+        elif not self.isFinished():
+            sState = 'timed out, still running' if self.fTimedOut else 'running'
+        elif self.error is not None:
+            sState = 'failed'
+        else:
+            sState = 'done'
+        return '<upload {name!s:s} to {host!s:s}: {state!s:s}>'.format(name=self.name, host=self.host, state=sState)
+
+    def isFinished(self):
+        """
+        True once the upload has ended, whether it succeeded or not.
+        """
+        return self.__finished.is_set()
+
+    def _start(self):
+        self.beginTime = time.time()
+        self.__started.set()
+
+    def _finish(self):
+        self.__finished.set()
+
+    def wait(self):
+        """ Wait for the upload to finish, or for its timeout to pass once it
+        has started.  Return True if it finished and succeeded; False if it
+        failed, or if it timed out (see isFinished).
+
+        :rtype: bool
+        """
+        self.__started.wait()
+        if self.timeout is None:
+            self.__finished.wait()
+        elif not self.__finished.wait(max(0.0, self.beginTime + self.timeout - time.time())):
+            self.fTimedOut = True
+        return self.succeeded()
+
+    def waitFinished(self):
+        """ Wait until the upload has ended, however long it takes.  Return
+        True if it succeeded.
+
+        :rtype: bool
+        """
+        self.__finished.wait()
+        return self.succeeded()
+
+    def succeeded(self):
+        return self.isFinished() and self.error is None
+
+
+class ASAPUploadScheduler(object):
+    """
+    Runs uploads concurrently on a pool of workers, within the limits set
+    for each host.
+    """
+    DEFAULT_HOST_LIMIT = 2
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, logger=None, defaultHostLimit=DEFAULT_HOST_LIMIT, workers=DEFAULT_WORKERS):
+        """
+
+        :param logger:
+        :param int defaultHostLimit: uploads running at once for a host with no limit set
+        :param int workers: uploads running at once in all
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__defaultHostLimit = max(1, int(defaultHostLimit))
+        self.__workerCount = max(1, int(workers))
+        self.__lock = threading.Lock()
+        self.__condition = threading.Condition(self.__lock)
+        self.__queue = []          # type: list[ASAPUploadJob]
+        self.__workers = []        # type: list[threading.Thread]
+        self.__hostLimits = {}     # type: dict[str, tuple[int, float]]
+        self.__running = {}        # type: dict[str, int]
+        self.__nextStart = {}      # type: dict[str, float]
+
+    def setHostLimit(self, host, maxUploads, minInterval=0.0):
+        """ Set the uploads that may run at once for a host, and the pause in
+        seconds required after one upload finishes before the next starts.
+        Must be called before the first upload to the host is submitted;
+        later calls with the same values are ignored.
+
+        :param str host:
+        :param int maxUploads:
+        :param float minInterval:
+        """
+        key = host.lower()
+        limit = (max(1, int(maxUploads)), float(minInterval))
+        with self.__lock:
+            if key in self.__running:
+                if self.__hostLimits.get(key, (self.__defaultHostLimit, 0.0)) != limit:
+                    self.__logger.warn('Upload limit for {host!s:s} is already in use and was not changed.'
+                                       .format(host=host))
+                return
+            self.__hostLimits[key] = limit
+
+    def __getLimit(self, key):
+        return self.__hostLimits.get(key, (self.__defaultHostLimit, 0.0))
+
+    def __nextJob(self):
+        """
+        Take the first queued job whose host has a free slot and whose pause
+        has passed, waiting until there is one.  Called with the lock held.
+        """
+        while True:
+            now = time.time()
+            wakeAt = None
+            for job in self.__queue:
+                key = job.host.lower()
+                maxUploads, minInterval = self.__getLimit(key)
+                if self.__running.get(key, 0) >= maxUploads:
+                    continue
+                startAt = self.__nextStart.get(key, 0.0)
+                if startAt == float('inf'):
+                    # waiting for a running upload to the host to finish
+                    continue
+                if startAt > now:
+                    wakeAt = startAt if wakeAt is None else min(wakeAt, startAt)
+                    continue
+                self.__queue.remove(job)
+                self.__running[key] = self.__running.get(key, 0) + 1
+                if minInterval:
+                    # no other upload to the host starts until this one has finished and paused
+                    self.__nextStart[key] = float('inf')
+                return job
+            if wakeAt is None:
+                self.__condition.wait()
+            else:
+                self.__condition.wait(max(0.0, wakeAt - now))
+
+    def __work(self):
+        while True:
+            with self.__condition:
+                job = self.__nextJob()
+            key = job.host.lower()
+            try:
+                self.__call(job)
+            finally:
+                with self.__condition:
+                    self.__running[key] -= 1
+                    maxUploads, minInterval = self.__getLimit(key)
+                    if minInterval:
+                        self.__nextStart[key] = time.time() + minInterval
+                    self.__condition.notify_all()
+                job._finish()
+                if job.fTimedOut:
+                    self.__logger.info('Upload of {name!s:s} to {host!s:s} finished after its timeout, in '
+                                       '{elapsed:.1f} seconds.'.format(name=job.name, host=job.host,
+                                                                      elapsed=job.elapsed))
+
+    @staticmethod
+    def __call(job):
+        job._start()
+        try:
+            job.result = job.func(*job.args)
+        except Exception as e:
+            job.error = e
+            job.errorText = traceback.format_exc()
+        job.elapsed = time.time() - job.beginTime
+
+    def submit(self, host, name, func, *args, **kwargs):
+        """ Schedule func(*args) as an upload to host and return its job.
+        Pass timeout=<seconds> to stop waiting for it that long after it starts.
+
+        :param str host: destination host, used for the limits (a host and folder,
+            such as 'server/folder', may be used to limit only part of a server)
+        :param str name: name for logging (usually the file name)
+        :param func: callable that performs the upload and raises on failure
+        :rtype: ASAPUploadJob
+        """
+        job = ASAPUploadJob(host, name, func, args, kwargs.get('timeout'))
+        with self.__condition:
+            self.__running.setdefault(host.lower(), 0)
+            self.__queue.append(job)
+            if len(self.__workers) < self.__workerCount:
+                worker = threading.Thread(target=self.__work,
+                                          name='ASAPUploadWorker-{count:d}'.format(count=len(self.__workers) + 1))
+                worker.daemon = True
+                worker.start()
+                self.__workers.append(worker)
+            self.__condition.notify_all()
+        return job
+
+    @staticmethod
+    def waitAll(jobs):
+        """ Wait for all of the jobs.  Return True if every one succeeded
+        (False if any failed or timed out).
+
+        :param list[ASAPUploadJob] jobs:
+        :rtype: bool
+        """
+        fSuccess = True
+        for job in jobs:
+            if not job.wait():
+                fSuccess = False
+        return fSuccess
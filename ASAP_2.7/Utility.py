@@ -34,11 +34,44 @@
           Upgrade to Python 2.7
           Added lots of additional objects to the purview of the ASAPUtility class
           Made object creation as lazy as possible
+
+      19-Oct-2026   ilsdev  user-026
+          Added getLabReportRenderer.
+
+      19-Oct-2026   ilsdev  user-027
+          Added getAcordDocumentCache.
+
+      19-Oct-2026   ilsdev  user-035
+          Added getTransportPool.
+
+      19-Oct-2026   ilsdev  user-036
+          Added getUploadScheduler.
+
+      19-Oct-2026   ilsdev  user-039
+          Added getOutbox.
+
+      19-Oct-2026   ilsdev  user-041
+          Added getIndexPrefetch.
+
+      19-Oct-2026   ilsdev  user-047
+          Added getIndexFingerprints.
+
+      19-Oct-2026   ilsdev  user-048
+          Added getHandlerRegistry.
+
+      19-Oct-2026   ilsdev  user-050
+          Added getContactScan.
+
+      19-Oct-2026   ilsdev  user-036
+          The objects shared by the contact threads (upload scheduler,
+          transport pool, outbox and the other caches) are created under a
+          lock, so threads that ask for one at the same time get the same one.
 """
 
 
 import os
 import datetime
+import threading
 import traceback
 from ..ASAP import asapLogger, devState
 from CRL.DBCursor import CRLDBCursor
@@ -56,6 +89,15 @@ from .ViableCaseFactory import ViableCaseFactory
 from .FileManager import ASAPFileManager
 from .Contact import ASAPContact
 from .AcordRequest import ASAPAcordRequest
+from .LabReportRenderer import ASAPLabReportRenderer
+from .AcordDocumentCache import ASAPAcordDocumentCache
+from .TransportPool import ASAPTransportPool
+from .UploadScheduler import ASAPUploadScheduler
+from .Outbox import ASAPOutbox
+from .IndexPrefetch import ASAPIndexPrefetch
+from .IndexFingerprint import ASAPIndexFingerprints
+from .HandlerRegistry import ASAPHandlerRegistry
+from .ContactScan import ASAPContactScan
 from ILS.ilshelp import addComment
 import DeltaUtility
 
@@ -100,6 +142,17 @@ except NameError:
             self._asap_file_manager = {}           # type: dict[str, ASAPFileManager]
             self._asap_acord_request = None        # type: ASAPAcordRequest
             self._lims_sample_factory = None       # type: LimsSampleFactory
+            self._lab_report_renderer = {}         # type: dict[str, ASAPLabReportRenderer]
+            self._acord_document_cache = None      # type: ASAPAcordDocumentCache
+            self._transport_pool = None            # type: ASAPTransportPool
+            self._upload_scheduler = None          # type: ASAPUploadScheduler
+            self._outbox = None                    # type: ASAPOutbox
+            self._index_prefetch = None            # type: ASAPIndexPrefetch
+            self._index_fingerprints = None        # type: ASAPIndexFingerprints
+            self._handler_registry = None          # type: ASAPHandlerRegistry
+            self._contact_scan = None              # type: ASAPContactScan
+            # guards the creation of the objects shared by the contact threads
+            self._shared_lock = threading.RLock()
             self.devState = devState
             self.asapLogger = asapLogger
 
@@ -107,6 +160,21 @@ except NameError:
         def xmitConfig(self):
             return self._xmit_config
 
+        def __getShared(self, name, create):
+            """
+            Return the object in attribute name, creating it with create() if
+            there is none yet.  The contact threads share these objects, so
+            it is created under the lock, and only once.
+            """
+            obj = getattr(self, name)
+            if obj is None:
+                with self._shared_lock:
+                    obj = getattr(self, name)
+                    if obj is None:
+                        obj = create()
+                        setattr(self, name, obj)
+            return obj
+
         def getConfig(self):
             """
             Return the ASAPTransmitConfig object.
@@ -265,6 +333,76 @@ except NameError:
                 self._lims_sample_factory = LimsSampleFactory()
             return self._lims_sample_factory
 
+        def getLabReportRenderer(self, cacheDir=None):
+            """ Return the ASAPLabReportRenderer object for a lab report cache folder.
+
+            :param str|None cacheDir: folder for cached lab report images
+            :rtype: ASAPLabReportRenderer
+            """
+            key = cacheDir or ''
+            with self._shared_lock:
+                if key not in self._lab_report_renderer:
+                    self._lab_report_renderer[key] = ASAPLabReportRenderer(cacheDir, self.asapLogger)
+                return self._lab_report_renderer[key]
+
+        def getAcordDocumentCache(self):
+            """ Return the process-wide cache of parsed ACORD XML files.
+
+            :rtype: ASAPAcordDocumentCache
+            """
+            return self.__getShared('_acord_document_cache', ASAPAcordDocumentCache)
+
+        def getTransportPool(self):
+            """ Return the pool of SFTP/FTP sessions shared by the transmit handlers.
+
+            :rtype: ASAPTransportPool
+            """
+            return self.__getShared('_transport_pool', lambda: ASAPTransportPool(self.asapLogger))
+
+        def getUploadScheduler(self):
+            """ Return the scheduler that runs uploads for the transmit handlers,
+            within the limits set for each host.
+
+            :rtype: ASAPUploadScheduler
+            """
+            return self.__getShared('_upload_scheduler', lambda: ASAPUploadScheduler(self.asapLogger))
+
+        def getOutbox(self):
+            """ Return the queue of failed uploads that are retried with backoff.
+
+            :rtype: ASAPOutbox
+            """
+            return self.__getShared('_outbox', lambda: ASAPOutbox(logger=self.asapLogger))
+
+        def getIndexPrefetch(self):
+            """ Return the batch reader of index data for the cases of a contact.
+
+            :rtype: ASAPIndexPrefetch
+            """
+            return self.__getShared('_index_prefetch', lambda: ASAPIndexPrefetch(self.asapLogger))
+
+        def getIndexFingerprints(self):
+            """ Return the store of index input fingerprints, used to skip
+            rebuilding indexes whose inputs have not changed.
+
+            :rtype: ASAPIndexFingerprints
+            """
+            return self.__getShared('_index_fingerprints', lambda: ASAPIndexFingerprints(self.asapLogger))
+
+        def getHandlerRegistry(self):
+            """ Return the process-wide registry of the contacts' custom handler classes.
+
+            :rtype: ASAPHandlerRegistry
+            """
+            return self.__getShared('_handler_registry', lambda: ASAPHandlerRegistry(self.asapLogger))
+
+        def getContactScan(self):
+            """ Return the scan that finds the contacts with pending work.
+
+            :rtype: ASAPContactScan
+            """
+            return self.__getShared('_contact_scan', lambda: ASAPContactScan(self.asapLogger))
+
         def getLIMSCursorForSid(self, sid, restrictToDbs=None):
             """
             Figure out whether to use sip or snip for sample
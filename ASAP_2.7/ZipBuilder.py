@@ -0,0 +1,287 @@
+"""
+
+  Facility:         ILS
+
+  Module Name:      ZipBuilder
+
+  Version:
+      Software Version:          Python version 2.7
+
+      Copyright 2026, Clinical Reference Laboratory.  All Rights Reserved.
+
+  Abstract:
+      This script contains the ASAPZipBuilder class, which writes the files
+      of a case or a batch into a zip archive in one pass with zipfile,
+      instead of calling CRLAddToZIPFile once per file (which opens and
+      rewrites the archive through the external zip tool on every call).
+      TIFF images that are already compressed (CCITT G3/G4, LZW, JPEG,
+      PackBits...) and other compressed formats are stored as they are
+      rather than deflated again.  The time taken by each entry is kept
+      for logging.  Also included is the ASAPZipEntry class that records
+      each entry written.
+
+  Author:
+      ILS Development
+
+  Creation Date:
+      19-Oct-2026
+
+  Modification History:
+
+"""
+
+import os
+import shutil
+import struct
+import time
+import zipfile
+
+import CRLUtility
+
+# TIFF tag holding the compression scheme, and the value for uncompressed data
+TIFF_TAG_COMPRESSION = 259
+TIFF_COMPRESSION_NONE = 1
+
+# formats that are compressed already, so deflating them again only costs time
+STORED_EXTENSIONS = ('.zip', '.pgp', '.gpg', '.jpg', '.jpeg', '.png', '.gif')
+
+
+def getTiffCompression(filePath):
+    """ Return the compression value from the first image directory of a
+    TIFF file, or None if the file is not a (classic) TIFF.
+
+    :param str filePath:
+    :rtype: int|None
+    """
+    ptr = open(filePath, 'rb')
+    try:
+        header = ptr.read(8)
+        if len(header) < 8:
+            return None
+        if header[:2] == b'II':
+            endian = '<'
+        elif header[:2] == b'MM':
+            endian = '>'
+        else:
+            return None
+        magic, offset = struct.unpack(endian + 'HI', header[2:8])
+        if magic != 42:
+            return None
+        ptr.seek(offset)
+        countData = ptr.read(2)
+        if len(countData) < 2:
+            return None
+        for i in range(struct.unpack(endian + 'H', countData)[0]):
+            entry = ptr.read(12)
+            if len(entry) < 12:
+                break
+            tag, fieldType = struct.unpack(endian + 'HH', entry[:4])
+            if tag == TIFF_TAG_COMPRESSION:
+                if fieldType == 3:  # SHORT
+                    return struct.unpack(endian + 'H', entry[8:10])[0]
+                return struct.unpack(endian + 'I', entry[8:12])[0]
+        # no compression tag means the default, uncompressed
+        return TIFF_COMPRESSION_NONE
+    finally:
+        ptr.close()
+
+
+def isCompressed(filePath):
+    """
+    True if the file's data is compressed already and should be stored
+    in a zip without deflating it.
+    """
+    ext = os.path.splitext(filePath)[1].lower()
+    if ext in ('.tif', '.tiff'):
+        try:
+            compression = getTiffCompression(filePath)
+        except (IOError, OSError, struct.error):
+            return False
+        return compression is not None and compression != TIFF_COMPRESSION_NONE
+    return ext in STORED_EXTENSIONS
+
+
+class ASAPZipEntry(object):
+    """
+    One file written to the archive.
+    """
+
+    def __init__(self, sourcePath, arcName, fStored, size, compressedSize, elapsed):
+        self.sourcePath = sourcePath
+        self.arcName = arcName
+        self.fStored = fStored
+        self.size = size
+        self.compressedSize = compressedSize
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<ASAPZipEntry {arcName!s:s} {method!s:s} {size:d}->{compressedSize:d} bytes in {elapsed:.3f}s>'.format(
+            arcName=self.arcName, method='stored' if self.fStored else 'deflated',
+            size=self.size, compressedSize=self.compressedSize, elapsed=self.elapsed)
+
+
+class ASAPZipBuilder(object):
+    """
+    Writes files into one zip archive.  Entries are streamed to the archive
+    as they are added; the archive is complete once close() returns.  Use
+    it in a with statement, or call close() when all files are added.
+
+    Entries are named by the base name of the file, as CRLAddToZIPFile
+    does.  If the archive already exists the new files are added to it,
+    replacing any entries with the same names.  Source files added with
+    fDeleteSource are deleted by close(), once the archive is written.
+    """
+
+    def __init__(self, zipPath, logger=None):
+        """
+
+        :param str zipPath:
+        :param logger:
+        """
+        if not logger:
+            self.__logger = CRLUtility.CRLGetLogger()
+        else:
+            self.__logger = logger
+        self.__zipPath = zipPath
+        self.__entries = []         # type: list[ASAPZipEntry]
+        self.__toDelete = []        # type: list[str]
+        self.__arcNames = set()
+        self.__zip = None           # type: zipfile.ZipFile
+        self.__tmpPath = None
+        self.__beginTime = None
+        self.__elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def getZipPath(self):
+        return self.__zipPath
+
+    def getEntries(self):
+        """ Return the entries written so far, with their sizes and timings.
+
+        :rtype: list[ASAPZipEntry]
+        """
+        return list(self.__entries)
+
+    def getSourcePaths(self):
+        """
+        Return the source path of every entry written so far.
+        """
+        return [entry.sourcePath for entry in self.__entries]
+
+    def getElapsed(self):
+        """
+        Return the seconds spent writing the archive, from the first entry to close().
+        """
+        return self.__elapsed
+
+    def __open(self):
+        if self.__zip is not None:
+            return
+        self.__beginTime = time.time()
+        zipDir = os.path.dirname(self.__zipPath)
+        if zipDir and not os.path.isdir(zipDir):
+            os.makedirs(zipDir)
+        # write to a temporary file, so a failed build never leaves a partial archive behind
+        self.__tmpPath = self.__zipPath + '.tmp'
+        self.__zip = zipfile.ZipFile(self.__tmpPath, 'w', zipfile.ZIP_DEFLATED, True)
+
+    def addFile(self, filePath, arcName=None, fDeleteSource=False):
+        """ Write a file to the archive.
+
+        :param str filePath:
+        :param str arcName: entry name (default is the base name of the file)
+        :param bool fDeleteSource: delete the file once the archive is written
+        :rtype: ASAPZipEntry
+        """
+        if not arcName:
+            arcName = os.path.basename(filePath)
+        if arcName.lower() in self.__arcNames:
+            raise ValueError('{arcName!s:s} was already added to {zipPath!s:s}'
+                             .format(arcName=arcName, zipPath=self.__zipPath))
+        self.__open()
+        fStored = isCompressed(filePath)
+        beginTime = time.time()
+        self.__zip.write(filePath, arcName, zipfile.ZIP_STORED if fStored else zipfile.ZIP_DEFLATED)
+        info = self.__zip.filelist[-1]
+        entry = ASAPZipEntry(filePath, arcName, fStored, info.file_size, info.compress_size,
+                             time.time() - beginTime)
+        self.__entries.append(entry)
+        self.__arcNames.add(arcName.lower())
+        if fDeleteSource:
+            self.__toDelete.append(filePath)
+        return entry
+
+    def addFiles(self, filePaths, fDeleteSource=False):
+        """ Write several files to the archive.
+
+        :param list[str] filePaths:
+        :param bool fDeleteSource:
+        """
+        for filePath in filePaths:
+            self.addFile(filePath, fDeleteSource=fDeleteSource)
+
+    def __copyExisting(self):
+        """
+        Copy the entries of an existing archive that were not replaced.
+        """
+        existing = zipfile.ZipFile(self.__zipPath, 'r')
+        try:
+            for info in existing.infolist():
+                if info.filename.lower() in self.__arcNames:
+                    self.__logger.debug('Replacing {arcName!s:s} in {zipPath!s:s}.'
+                                        .format(arcName=info.filename, zipPath=self.__zipPath))
+                    continue
+                src = existing.open(info)
+                try:
+                    self.__zip.writestr(info, src.read(), info.compress_type)
+                finally:
+                    src.close()
+        finally:
+            existing.close()
+
+    def close(self):
+        """
+        Finish the archive, move it into place and delete the sources that
+        were added with fDeleteSource.
+        """
+        if self.__zip is None:
+            return
+        try:
+            if os.path.isfile(self.__zipPath):
+                self.__copyExisting()
+            self.__zip.close()
+            self.__zip = None
+            shutil.move(self.__tmpPath, self.__zipPath)
+        except Exception:
+            self.abort()
+            raise
+        self.__elapsed = time.time() - self.__beginTime
+        for filePath in self.__toDelete:
+            CRLUtility.CRLDeleteFile(filePath)
+        self.__toDelete = []
+        self.__logger.debug('Wrote {count:d} entries to {zipPath!s:s} in {elapsed:.3f} seconds ({stored:d} stored).'
+                            .format(count=len(self.__entries), zipPath=self.__zipPath, elapsed=self.__elapsed,
+                                    stored=len([entry for entry in self.__entries if entry.fStored])))
+
+    def abort(self):
+        """
+        Discard the archive being written.  Source files are left in place.
+        """
+        if self.__zip is not None:
+            try:
+                self.__zip.close()
+            except Exception:
+                pass
+            self.__zip = None
+        if self.__tmpPath and os.path.isfile(self.__tmpPath):
+            os.remove(self.__tmpPath)
+        self.__toDelete = []